@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+"""Action State Benchmark - count action ok predicate evaluations
+
+    Binds a typical set of action widgets with the real machine and
+    program action ok and bindOk handlers, the way bindWidget does, to a
+    stub status plugin. Then steps through a scripted machine session
+    (E-Stop reset, power on, homing, running and pausing a program, MDI,
+    power off ...). Each step is one status poll and may change several
+    channels at once.
+
+    For every step it reports how many ok predicates were evaluated and
+    how many widget enable/tooltip updates were made, both through the
+    shared ACTION_STATE engine and with a per-widget lambda connected to
+    each channel, the way the bindOk handlers used to. Each runs in its
+    own forked process with a stub linuxcnc, so it needs neither a
+    running LinuxCNC nor a display.
+
+    python benchmarks/action_state_bench.py
+
+Usage:
+  action_state_bench [options]
+  action_state_bench -h
+
+Options:
+  --scale=<n>   Multiply the number of widgets bound to each action.
+                [default: 1]
+  --cycles=<n>  Times to run the session when timing. [default: 200]
+"""
+
+import sys
+import time
+import types
+import multiprocessing
+
+from docopt import docopt
+
+import stubs
+
+# linuxcnc constants, as in the stub module
+STATE_ESTOP, STATE_ESTOP_RESET, STATE_ON = 1, 2, 4
+INTERP_IDLE, INTERP_READING, INTERP_PAUSED, INTERP_WAITING = 1, 2, 3, 4
+RCS_DONE, RCS_EXEC, RCS_ERROR = 1, 2, 3
+MODE_MANUAL, MODE_AUTO, MODE_MDI = 1, 2, 3
+
+INITIAL_STAT = {
+    'estop': 1,
+    'task_state': STATE_ESTOP,
+    'on': False,
+    'enabled': False,
+    'interp_state': INTERP_IDLE,
+    'state': RCS_DONE,
+    'paused': False,
+    'task_mode': MODE_MANUAL,
+    'homed': (0, 0, 0),
+    'all_axes_homed': False,
+    'limit': (0, 0, 0),
+    'file': '',
+    'block_delete': False,
+    'optional_stop': False,
+    'feed_override_enabled': True,
+    'joint': [{'override_limits': False}] * 3,
+}
+
+# each step is the set of channels changed by one status poll
+SESSION = [
+    ('estop reset', {'estop': 0, 'task_state': STATE_ESTOP_RESET}),
+    ('power on', {'task_state': STATE_ON, 'on': True, 'enabled': True}),
+    ('home x', {'homed': (1, 0, 0)}),
+    ('home y', {'homed': (1, 1, 0)}),
+    ('home z', {'homed': (1, 1, 1), 'all_axes_homed': True}),
+    ('load file', {'file': 'part.ngc', 'task_mode': MODE_AUTO}),
+    ('run', {'state': RCS_EXEC, 'interp_state': INTERP_READING}),
+    ('interp waiting', {'interp_state': INTERP_WAITING}),
+    ('interp reading', {'interp_state': INTERP_READING}),
+    ('pause', {'paused': True, 'interp_state': INTERP_PAUSED}),
+    ('resume', {'paused': False, 'interp_state': INTERP_READING}),
+    ('program end', {'state': RCS_DONE, 'interp_state': INTERP_IDLE}),
+    ('mdi', {'task_mode': MODE_MDI, 'state': RCS_EXEC,
+             'interp_state': INTERP_READING}),
+    ('mdi done', {'state': RCS_DONE, 'interp_state': INTERP_IDLE}),
+    ('manual mode', {'task_mode': MODE_MANUAL}),
+    ('on limit', {'limit': (1, 0, 0)}),
+    ('off limit', {'limit': (0, 0, 0)}),
+    ('power off', {'task_state': STATE_ESTOP_RESET, 'on': False,
+                   'enabled': False}),
+    ('estop', {'estop': 1, 'task_state': STATE_ESTOP}),
+]
+
+# (action, widgets) for a typical VCP, in bindWidget syntax
+ACTIONS = [
+    ('program.run', 2),
+    ('program.step', 1),
+    ('program.pause', 2),
+    ('program.resume', 2),
+    ('program.abort', 2),
+    ('program.block_delete.toggle', 1),
+    ('program.optional_stop.toggle', 1),
+    ('machine.power.toggle', 1),
+    ('machine.mode.manual', 1),
+    ('machine.mode.auto', 1),
+    ('machine.mode.mdi', 1),
+    ('machine.rapid_override.reset', 1),
+    ('machine.max_velocity.reset', 1),
+    ('machine.issue_mdi:G0 X0', 6),
+    ('machine.issue_mdi:M6 T1', 6),
+    ('machine.home.all', 1),
+    ('machine.home.axis:x', 1),
+    ('machine.home.axis:y', 1),
+    ('machine.home.axis:z', 1),
+    ('machine.jog.axis:x,pos', 1),
+    ('machine.jog.axis:x,neg', 1),
+    ('machine.jog.axis:y,pos', 1),
+    ('machine.jog.axis:y,neg', 1),
+    ('machine.jog.axis:z,pos', 1),
+    ('machine.jog.axis:z,neg', 1),
+    ('machine.override_limits', 1),
+]
+
+
+class Channel(object):
+    # the subset of DataChannel used by the action handlers
+    def __init__(self, value=None):
+        self.value = value
+        self._slots = []
+
+    def getValue(self):
+        return self.value
+
+    def getString(self):
+        return str(self.value)
+
+    def notify(self, slot, *args):
+        self._slots.append(slot)
+
+    onValueChanged = notify
+
+    def setValue(self, value):
+        self.value = value
+        for slot in self._slots:
+            slot(value)
+
+
+class Widget(object):
+    # records the state the engine or the handlers push to it
+    updates = 0
+
+    def __init__(self):
+        self.enabled = None
+        self.tip = None
+
+    def setEnabled(self, enabled):
+        Widget.updates += 1
+        self.enabled = enabled
+
+    def setStatusTip(self, tip):
+        self.tip = tip
+
+    def setToolTip(self, tip):
+        self.tip = tip
+
+    def __getattr__(self, name):
+        # setChecked, setValue ... that some handlers call
+        return lambda *args, **kwargs: None
+
+
+class LegacyState(object):
+    # stands in for ACTION_STATE, connecting a lambda per widget to
+    # each channel, as the bindOk handlers used to
+    def __init__(self):
+        self.evaluations = 0
+
+    def bind(self, widget, ok_func, channels, *args, **kwargs):
+        def check(*value):
+            self.evaluations += 1
+            ok_func(*args, widget=widget, **kwargs)
+
+        for channel in channels:
+            channel.onValueChanged(check)
+
+
+def _register_status():
+    from qtpyvcp.plugins import registerPlugin, DataPlugin
+
+    class BenchStatus(DataPlugin):
+        stat = types.SimpleNamespace(**INITIAL_STAT)
+        old = {}
+        no_force_homing = False
+
+        def __getattr__(self, name):
+            # any other status channel the actions connect to
+            if name.startswith('_'):
+                raise AttributeError(name)
+            channel = Channel(INITIAL_STAT.get(name))
+            setattr(self, name, channel)
+            return channel
+
+        def allHomed(self):
+            return all(self.stat.homed)
+
+    status = BenchStatus()
+    registerPlugin('status', status)
+    return status
+
+
+def _resolve(action):
+    # the ok and bindOk handlers and arguments, as bindWidget finds them
+    from qtpyvcp import actions
+
+    action, sep, args = action.partition(':')
+    method = actions
+    for item in action.split('.'):
+        method = getattr(method, item)
+    args = [int(arg) if arg.isdigit() else arg for arg in args.split(',') if arg]
+    return method, args
+
+
+def _setup(scale, engine):
+    from qtpy.QtCore import QCoreApplication
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    status = _register_status()
+
+    from qtpyvcp.actions import base_actions, machine_actions, program_actions
+
+    state = base_actions.ACTION_STATE
+    if not engine:
+        state = LegacyState()
+        machine_actions.ACTION_STATE = program_actions.ACTION_STATE = state
+
+    widgets = []
+    for action, count in ACTIONS:
+        method, args = _resolve(action)
+        for i in range(count * scale):
+            widget = Widget()
+            widgets.append(widget)
+            method.ok(*args, widget=widget)
+            method.bindOk(*args, widget=widget)
+
+    def step(changes):
+        status.stat.__dict__.update(changes)
+        for name, value in changes.items():
+            getattr(status, name).setValue(value)
+        # the engine re-evaluates from a zero-delay timer
+        app.processEvents()
+
+    return step, state, widgets
+
+
+def run_session(step, state, widgets):
+    """Run SESSION once with the handlers bound by _setup.
+
+    Returns:
+        tuple : A (step, evaluations, widget updates) tuple for each step,
+            and the final enabled state and tooltip of every widget.
+    """
+    results = []
+    for name, changes in SESSION:
+        evals = state.evaluations
+        Widget.updates = 0
+        step(changes)
+        results.append((name, state.evaluations - evals, Widget.updates))
+
+    return results, [(w.enabled, w.tip) for w in widgets]
+
+
+def time_session(step, cycles=200):
+    """Return the mean seconds per status poll over `cycles` sessions."""
+    start = time.time()
+    for i in range(cycles):
+        step(INITIAL_STAT)
+        for name, changes in SESSION:
+            step(changes)
+    return (time.time() - start) / (cycles * (len(SESSION) + 1))
+
+
+def _run_case(engine, scale, cycles, conn):
+    # runs in a forked child, as the actions can only be bound to one
+    # status plugin per process
+    stubs.init_logger('ActionStateBench')
+    step, state, widgets = _setup(scale, engine)
+    results, final = run_session(step, state, widgets)
+    conn.send((results, final, time_session(step, cycles)))
+    conn.close()
+
+
+def _run_forked(engine, scale, cycles):
+    ctx = multiprocessing.get_context('fork')
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_case, args=(engine, scale, cycles, send))
+    proc.start()
+    send.close()
+    try:
+        return recv.recv()
+    except EOFError:
+        raise RuntimeError('Benchmark case failed')
+    finally:
+        proc.join()
+
+
+def main():
+    opts = docopt(__doc__)
+    scale = int(opts['--scale'])
+    cycles = int(opts['--cycles'])
+
+    legacy, legacy_final, legacy_time = _run_forked(False, scale, cycles)
+    shared, shared_final, shared_time = _run_forked(True, scale, cycles)
+
+    print('{} widgets, {} actions'.format(
+        sum(a[1] for a in ACTIONS) * scale, len(ACTIONS)))
+    print('{:<16} {:>12} {:>12} {:>12} {:>12}'.format(
+        'step', 'legacy evals', 'engine evals', 'legacy upd', 'engine upd'))
+
+    totals = [0, 0, 0, 0]
+    for (name, l_evals, l_upd), (_, e_evals, e_upd) in zip(legacy, shared):
+        print('{:<16} {:>12} {:>12} {:>12} {:>12}'.format(
+            name, l_evals, e_evals, l_upd, e_upd))
+        for i, v in enumerate((l_evals, e_evals, l_upd, e_upd)):
+            totals[i] += v
+
+    print('{:<16} {:>12} {:>12} {:>12} {:>12}'.format('total', *totals))
+    steps = float(len(SESSION))
+    print('per transition   {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+        *[t / steps for t in totals]))
+
+    print('mean time per poll: legacy {:.1f} us, engine {:.1f} us'.format(
+        legacy_time * 1e6, shared_time * 1e6))
+
+    if legacy_final != shared_final:
+        print('Final widget states DIFFER')
+        return 1
+
+    print('Final widget states match')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
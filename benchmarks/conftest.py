@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+import stubs
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+stubs.init_logger('Tests')
+
+# registered before the tests import any module that looks it up
+STATUS = stubs.register_status()
+
+
+@pytest.fixture
+def status():
+    """The stub status plugin, reset to an idle machine."""
+    STATUS.stat.__dict__.update(stubs.STAT)
+    return STATUS
+
+
+
+@pytest.fixture
+def mdi_log():
+    """The MDI commands sent through the stub linuxcnc.command."""
+    del stubs.MDI_LOG[:]
+    return stubs.MDI_LOG
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""DB Tool Table Benchmark - load and save cost of the DBToolTable plugin
+
+    Fills an in-memory SQLite tool database with --tools tools and times
+    loading the tool table and saving it after typical edits, both the
+    way DBToolTable used to and with the current plugin:
+
+      legacy   loads Tool objects through the ORM, compares the whole
+               table and queries and commits each changed row on its
+               own. DeepDiff is replaced by a plain dict comparison,
+               which makes the legacy times a lower bound.
+      bulk     the current DBToolTable
+
+    With --file the database is a temporary SQLite file instead, which
+    includes the cost of syncing each commit to disk.
+
+    Each save starts from a freshly filled database and is checked
+    against the expected tools. It uses stub linuxcnc and a fake status
+    plugin, so needs neither a running LinuxCNC nor a display.
+
+    python benchmarks/db_tool_table_bench.py
+
+Usage:
+  db_tool_table_bench [options]
+  db_tool_table_bench -h
+
+Options:
+  --tools=<n>    Number of tools in the database. [default: 5000]
+  --repeat=<n>   Times to run each case, the best time is shown. [default: 3]
+  --file         Use a temporary database file instead of an in-memory one.
+"""
+
+import os
+import sys
+import time
+import types
+import tempfile
+
+from docopt import docopt
+
+import stubs
+
+# (name, tools edited, tools added, tools removed, edited columns)
+CASES = [
+    ('unchanged', 0, 0, 0, ''),
+    ('edit 1', 1, 0, 0, 'ZR'),
+    ('edit 100', 100, 0, 0, 'ZR'),
+    ('edit IJQ', 10, 0, 0, 'IJQ'),
+    ('add 50', 0, 50, 0, ''),
+    ('remove 50', 0, 0, 50, ''),
+    ('mixed', 100, 50, 50, 'ZR'),
+]
+
+
+def _register_plugins():
+    from qtpyvcp.plugins import registerPlugin, DataPlugin
+
+    class BenchChannel(object):
+        value = 0
+
+        def getValue(self):
+            return self.value
+
+        def notify(self, *args, **kwargs):
+            pass
+
+        onValueChanged = notify
+
+    class BenchStatus(DataPlugin):
+        stat = types.SimpleNamespace(tool_in_spindle=0)
+
+        def __getattr__(self, name):
+            # any status channel the actions connect to at import
+            if name.startswith('_'):
+                raise AttributeError(name)
+            return BenchChannel()
+
+    registerPlugin('status', BenchStatus())
+
+
+def _use_bench_db(db_file=None):
+    from sqlalchemy.pool import StaticPool
+
+    from qtpyvcp.lib.db_tool import base
+
+    if db_file is not None:
+        engine = base.configureEngine('sqlite:///' + db_file)
+    else:
+        # one connection shared by all sessions, so they see the same database
+        engine = base.configureEngine('sqlite://', poolclass=StaticPool,
+                                      connect_args={'check_same_thread': False})
+    base.Base.metadata.create_all(engine)
+    return engine
+
+
+def _fill_db(session, tools):
+    from qtpyvcp.lib.db_tool.tool_table import Tool
+
+    session.query(Tool).delete()
+    session.bulk_insert_mappings(Tool, [
+        dict(tool_no=tnum, pocket=tnum, remark='Tool {}'.format(tnum),
+             in_use=False, tool_table_id=1, diameter=tnum / 1000.0,
+             x_offset=0.0, y_offset=0.0, z_offset=tnum / 100.0,
+             a_offset=0.0, b_offset=0.0, c_offset=0.0, i_offset=0.0,
+             j_offset=0.0, q_offset=1, u_offset=0.0, v_offset=0.0,
+             w_offset=0.0)
+        for tnum in range(tools + 1)])
+    session.commit()
+
+
+def _edited_table(table, edited, added, removed, columns):
+    """Return a copy of table with the edits of a case applied."""
+    table = {tnum: tool.copy() for tnum, tool in table.items()}
+    tnums = sorted(table)
+    for tnum in tnums[1:edited + 1]:
+        for key in columns:
+            if key == 'R':
+                table[tnum][key] = 'Edited'
+            else:
+                table[tnum][key] += 1
+    for tnum in tnums[-removed:] if removed else []:
+        del table[tnum]
+    start = tnums[-1] + 1
+    for tnum in range(start, start + added):
+        table[tnum] = dict(table[0], T=tnum, P=tnum, R='Added')
+    return table
+
+
+def legacy_load(plugin):
+    # DBToolTable.loadToolTable before the column projection, but with
+    # I, J and Q read from the database so the results compare
+    from qtpyvcp.lib.db_tool.tool_table import Tool
+
+    table = {}
+    for tool in plugin.session.query(Tool).all():
+        table[tool.tool_no] = {'A': tool.a_offset, 'B': tool.b_offset,
+                               'C': tool.c_offset, 'D': tool.diameter,
+                               'I': tool.i_offset, 'J': tool.j_offset,
+                               'P': tool.pocket, 'Q': int(tool.q_offset),
+                               'R': tool.remark, 'T': tool.tool_no,
+                               'U': tool.u_offset, 'V': tool.v_offset,
+                               'W': tool.w_offset, 'X': tool.x_offset,
+                               'Y': tool.y_offset, 'Z': tool.z_offset}
+    return table
+
+
+def legacy_save(plugin, tool_table):
+    # DBToolTable.saveToolTable before the bulk diff-apply
+    from qtpyvcp.lib.db_tool.tool_table import Tool
+
+    session = plugin.session
+    db_table = legacy_load(plugin)
+    columns = {'R': 'remark', 'T': 'tool_no', 'P': 'pocket', 'X': 'x_offset',
+               'Y': 'y_offset', 'Z': 'z_offset', 'A': 'a_offset',
+               'B': 'b_offset', 'C': 'c_offset', 'I': 'i_offset',
+               'J': 'j_offset', 'Q': 'q_offset', 'U': 'u_offset',
+               'V': 'v_offset', 'W': 'w_offset', 'D': 'diameter'}
+
+    for tnum, tool in tool_table.items():
+        if tnum not in db_table:
+            session.add(Tool(in_use=False, tool_table_id=1,
+                             **{columns[k]: v for k, v in tool.items()}))
+            session.commit()
+        elif tool != db_table[tnum]:
+            row = session.query(Tool).filter(Tool.tool_no == tnum).one()
+            for key, value in tool.items():
+                setattr(row, columns[key], value)
+            session.commit()
+
+    for tnum in db_table:
+        if tnum not in tool_table:
+            row = session.query(Tool).filter(Tool.tool_no == tnum).one()
+            session.delete(row)
+            session.commit()
+
+
+def _best(func, repeat, setup=None):
+    best = None
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(opts):
+    """Run each case, yielding (name, legacy s, bulk s, ok) for each."""
+    stubs.init_logger('DBToolTableBench', log_file=os.devnull, log_level='ERROR')
+
+    _register_plugins()
+
+    if opts['file']:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _use_bench_db(os.path.join(tmp_dir, 'tools.sqlite'))
+            for result in _run_cases(opts):
+                yield result
+    else:
+        _use_bench_db()
+        for result in _run_cases(opts):
+            yield result
+
+
+def _run_cases(opts):
+
+    from qtpyvcp.plugins.db_tool_table import DBToolTable
+
+    plugin = DBToolTable()
+    plugin.initialise()
+    tools, repeat = opts['tools'], opts['repeat']
+
+    def fill():
+        _fill_db(plugin.session, tools)
+
+    fill()
+    yield ('load',
+           _best(lambda: legacy_load(plugin), repeat),
+           _best(plugin.loadToolTable, repeat),
+           legacy_load(plugin) == plugin.getToolTable())
+
+    base_table = plugin.getToolTable()
+    for name, edited, added, removed, columns in CASES:
+        table = _edited_table(base_table, edited, added, removed, columns)
+
+        legacy = _best(lambda: legacy_save(plugin, table), repeat, fill)
+        legacy_ok = legacy_load(plugin) == table
+
+        bulk = _best(lambda: plugin.saveToolTable(table), repeat, fill)
+        bulk_ok = plugin.queryTools() == table
+
+        yield name, legacy, bulk, legacy_ok and bulk_ok
+
+    plugin.terminate()
+
+
+def main():
+    args = docopt(__doc__)
+    opts = {'tools': int(args['--tools']),
+            'repeat': int(args['--repeat']),
+            'file': args['--file']}
+
+    print('{} tools in {} database, best of {}, times in ms'.format(
+        opts['tools'], 'a file' if opts['file'] else 'an in-memory', opts['repeat']))
+    print('{:<12} {:>10} {:>10} {:>9}  {}'.format(
+        'case', 'legacy', 'bulk', 'speedup', 'result'))
+
+    failed = 0
+    for name, legacy, bulk, ok in run_benchmarks(opts):
+        if not ok:
+            failed += 1
+        print('{:<12} {:10.1f} {:10.1f} {:8.1f}x  {}'.format(
+            name, legacy * 1e3, bulk * 1e3, legacy / bulk,
+            'ok' if ok else 'WRONG'), flush=True)
+
+    if failed:
+        print('{} case(s) did not give the expected tools'.format(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
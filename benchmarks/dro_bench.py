@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+"""DRO Benchmark - count DRO redraws during a simulated jog
+
+    Shows a window of 9 DROLabels, one per axis, and feeds them position
+    updates at the status poll rate while a single axis jogs. Reports the
+    number of setText calls, parent layout requests and the CPU time used
+    by each update mode:
+
+      legacy    every DRO formats and sets its text on every update,
+                like the DROs used to
+      filtered  the per axis DROUpdater and the text cache
+      fixed     filtered, with fixedTextWidth set
+      capped    fixed, with maxRefreshRate set to --cap
+
+    It uses stub linuxcnc and fake status/position plugins, so needs
+    neither a running LinuxCNC nor a display. Each mode runs in its own
+    forked process, paced in real time so the refresh cap sees the real
+    update rate.
+
+    python benchmarks/dro_bench.py
+
+Usage:
+  dro_bench [options]
+  dro_bench -h
+
+Options:
+  --rate=<hz>      Position updates per second. [default: 1000]
+  --seconds=<s>    Length of the jog. [default: 2]
+  --axis=<n>       Axis number to jog. [default: 0]
+  --feed=<f>       Jog speed in units/min. [default: 600]
+  --cap=<hz>       maxRefreshRate for the capped mode. [default: 30]
+  --modes=<modes>  Comma separated modes. [default: legacy,filtered,fixed,capped]
+"""
+
+import os
+import sys
+import time
+import multiprocessing
+
+from docopt import docopt
+
+import stubs
+
+MODES = ('legacy', 'filtered', 'fixed', 'capped')
+
+
+def _register_plugins():
+    # the channels of the status and position plugins the DROs use
+    from qtpyvcp.plugins import registerPlugin, DataPlugin, DataChannel
+
+    class BenchStatus(DataPlugin):
+        program_units = DataChannel(data='mm')
+        gcodes = DataChannel(data='')
+
+    class BenchPosition(DataPlugin):
+        rel = DataChannel(data=(0.0,) * 9)
+        abs = DataChannel(data=(0.0,) * 9)
+        dtg = DataChannel(data=(0.0,) * 9)
+
+        Relative = rel
+        Absolute = abs
+        DistanceToGo = dtg
+
+        report_actual_pos = False
+
+    registerPlugin('status', BenchStatus())
+    position = BenchPosition()
+    registerPlugin('position', position)
+    return position
+
+
+def _run_case(mode, opts, conn):
+    # runs in a forked child, so each mode gets its own QApplication,
+    # plugins and DRO updaters
+    from qtpy.QtCore import QObject, QEvent
+    from qtpy.QtWidgets import QApplication, QWidget, QGridLayout, QLabel
+
+    app = QApplication([])
+    position = _register_plugins()
+
+    from qtpyvcp.widgets.display_widgets.dro_label import DROLabel
+
+    class CountingDROLabel(DROLabel):
+        set_text_calls = 0
+
+        def setText(self, text):
+            CountingDROLabel.set_text_calls += 1
+            super(CountingDROLabel, self).setText(text)
+
+    class LayoutCounter(QObject):
+        requests = 0
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.LayoutRequest:
+                LayoutCounter.requests += 1
+            return False
+
+    window = QWidget()
+    layout = QGridLayout(window)
+    dros = []
+    for anum in range(9):
+        dro = CountingDROLabel()
+        dro.useGlobalDroFormatSettings = False
+        dro.axisNumber = anum
+        layout.addWidget(QLabel('XYZABCUVW'[anum]), anum, 0)
+        layout.addWidget(dro, anum, 1)
+        dros.append(dro)
+
+        if mode == 'legacy':
+            position.rel.notify(
+                lambda pos, d=dro: d.setText(d._fmt % pos[d._anum]))
+        else:
+            dro.initialize()
+            dro.fixedTextWidth = mode in ('fixed', 'capped')
+            if mode == 'capped':
+                dro.maxRefreshRate = opts['cap']
+
+    counter = LayoutCounter()
+    window.installEventFilter(counter)
+    window.show()
+    app.processEvents()
+
+    CountingDROLabel.set_text_calls = 0
+    LayoutCounter.requests = 0
+
+    rate = opts['rate']
+    ticks = int(opts['seconds'] * rate)
+    step = opts['feed'] / 60.0 / rate
+    pos = [0.0] * 9
+
+    cpu = time.process_time()
+    start = time.time()
+    for tick in range(ticks):
+        pos[opts['axis']] += step
+        position.rel.setValue(tuple(pos))
+        app.processEvents()
+
+        delay = start + (tick + 1) / float(rate) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    # let a capped DRO show the final position
+    time.sleep(0.1)
+    app.processEvents()
+    cpu = time.process_time() - cpu
+
+    final_ok = all(dro.text() == dro._fmt % pos[dro._anum] for dro in dros)
+
+    conn.send({'updates': ticks,
+               'set_text': CountingDROLabel.set_text_calls,
+               'layouts': LayoutCounter.requests,
+               'cpu': cpu,
+               'final_ok': final_ok})
+    conn.close()
+
+
+def run_benchmarks(modes, opts):
+    """Run each mode, yielding a result dict for each."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    stubs.init_logger('DROBench', log_file=os.devnull, log_level='WARNING')
+
+    ctx = multiprocessing.get_context('fork')
+    for mode in modes:
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_run_case, args=(mode, opts, send))
+        proc.start()
+        send.close()
+        try:
+            result = recv.recv()
+        except EOFError:
+            raise RuntimeError(f'Benchmark mode {mode} failed')
+        finally:
+            proc.join()
+        result.update(mode=mode)
+        yield result
+
+
+def main():
+    args = docopt(__doc__)
+    opts = {'rate': int(args['--rate']),
+            'seconds': float(args['--seconds']),
+            'axis': int(args['--axis']),
+            'feed': float(args['--feed']),
+            'cap': int(args['--cap'])}
+
+    modes = args['--modes'].split(',')
+    for mode in modes:
+        if mode not in MODES:
+            print(f'Unknown mode: {mode}', file=sys.stderr)
+            return 2
+
+    print('{:<9} {:>8} {:>9} {:>8} {:>8} {:>9}  {}'.format(
+        'mode', 'updates', 'setText', 'layouts', 'cpu s', 'cpu %', 'final'))
+
+    failed = 0
+    for result in run_benchmarks(modes, opts):
+        if not result['final_ok']:
+            failed += 1
+        print('{mode:<9} {updates:>8} {set_text:>9} {layouts:>8} {cpu:8.3f}'.format(**result),
+              '{:8.1f}%'.format(100 * result['cpu'] / opts['seconds']),
+              ' ok' if result['final_ok'] else ' WRONG', flush=True)
+
+    if failed:
+        print(f'{failed} mode(s) did not show the final position')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
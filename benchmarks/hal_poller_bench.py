@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""HAL Poller Benchmark - cost of a HALPoller poll cycle
+
+    Creates a stub hal module with --pins synthetic HAL pins, subscribes
+    to --subscribed of them through HALPoller.getHALPin and times a poll
+    cycle, with a few of the subscribed pins changing each cycle:
+
+      legacy   runs a process printing the whole `halcmd -s show pin`
+               output, splits it and diffs every pin in the system, like
+               HALPoller used to
+      hal      the current HALPoller, which reads only the subscribed
+               pins through the hal module
+
+    Both wall time and CPU time, including that of child processes, are
+    reported per cycle. `cat` starts much faster than halcmd, which has
+    to attach to HAL, so the legacy times are a lower bound. The pins
+    each cycle reports as changed, and the values the HALPin objects
+    emit, are checked against the changes made.
+
+    It uses stub linuxcnc and hal modules, so needs neither a running
+    LinuxCNC nor a display.
+
+    python benchmarks/hal_poller_bench.py
+
+Usage:
+  hal_poller_bench [options]
+  hal_poller_bench -h
+
+Options:
+  --pins=<n>        Number of HAL pins. [default: 5000]
+  --subscribed=<n>  Number of pins subscribed to. [default: 20]
+  --cycles=<n>      Number of poll cycles to time. [default: 50]
+"""
+
+import os
+import sys
+import time
+import types
+import random
+import resource
+import tempfile
+import subprocess
+
+from docopt import docopt
+
+import stubs
+
+HAL_BIT, HAL_FLOAT, HAL_S32, HAL_U32 = 1, 2, 3, 4
+HAL_IN, HAL_OUT, HAL_IO = 16, 32, 48
+
+TYPE_NAMES = {HAL_BIT: 'bit', HAL_FLOAT: 'float', HAL_S32: 's32', HAL_U32: 'u32'}
+DIR_NAMES = {HAL_IN: 'IN', HAL_OUT: 'OUT', HAL_IO: 'I/O'}
+
+
+class StubHAL(object):
+    """Synthetic HAL pins, with the hal module functions HALPoller uses."""
+
+    def __init__(self, pins, seed=1):
+        rand = random.Random(seed)
+        self.pins = {}
+        for i in range(pins):
+            pin_type = rand.choice(list(TYPE_NAMES))
+            name = 'comp{}.{}.pin-{}'.format(i // 50, TYPE_NAMES[pin_type], i)
+            self.pins[name] = [pin_type, rand.choice(list(DIR_NAMES)),
+                               self._value(pin_type, rand)]
+        self.names = list(self.pins)
+        self.reads = 0
+
+    @staticmethod
+    def _value(pin_type, rand):
+        if pin_type == HAL_BIT:
+            return rand.random() < 0.5
+        if pin_type == HAL_FLOAT:
+            return round(rand.uniform(-100, 100), 4)
+        return rand.randint(0, 1000)
+
+    def change(self, name, rand):
+        pin = self.pins[name]
+        if pin[0] == HAL_BIT:
+            pin[2] = not pin[2]
+        elif pin[0] == HAL_FLOAT:
+            pin[2] = round(pin[2] + rand.uniform(0.1, 1), 4)
+        else:
+            pin[2] += 1
+
+    def get_value(self, name):
+        self.reads += 1
+        return self.pins[name][2]
+
+    def get_info_pins(self):
+        return [{'NAME': name, 'VALUE': value, 'TYPE': pin_type, 'DIRECTION': direction}
+                for name, (pin_type, direction, value) in self.pins.items()]
+
+    def set_p(self, name, value):
+        pin_type = self.pins[name][0]
+        self.pins[name][2] = value.lower() in ('true', '1') if pin_type == HAL_BIT \
+            else float(value) if pin_type == HAL_FLOAT else int(value)
+        return True
+
+    def show_pin(self):
+        """The pins as printed by `halcmd -s show pin`."""
+        lines = []
+        for name, (pin_type, direction, value) in self.pins.items():
+            if pin_type == HAL_BIT:
+                value = 'TRUE' if value else 'FALSE'
+            elif pin_type == HAL_FLOAT:
+                value = '{:.7g}'.format(value)
+            elif pin_type == HAL_U32:
+                value = '0x{:08X}'.format(value)
+            lines.append('    {:>2}  {:<5} {:<3} {:>14}  {}  <== sig-{}'.format(
+                7, TYPE_NAMES[pin_type], DIR_NAMES[direction], value, name, name))
+        return '\n'.join(lines) + '\n'
+
+
+def _stub_hal(stub_hal):
+    # minimal hal module, enough for obj_status
+    hal = types.ModuleType('hal')
+    hal.HAL_BIT, hal.HAL_FLOAT, hal.HAL_S32, hal.HAL_U32 = HAL_BIT, HAL_FLOAT, HAL_S32, HAL_U32
+    hal.HAL_IN, hal.HAL_OUT, hal.HAL_IO = HAL_IN, HAL_OUT, HAL_IO
+    hal.get_value = stub_hal.get_value
+    hal.get_info_pins = stub_hal.get_info_pins
+    hal.set_p = stub_hal.set_p
+    return hal
+
+
+class LegacyPoller(object):
+    # HALPoller.hal_poll_thread before the in-process snapshot, with
+    # `cat` of the halcmd output in place of halcmd
+    def __init__(self, show_pin_file, status_items):
+        self.show_pin_file = show_pin_file
+        self.status_items = status_items
+        self.pin_dict = {}
+        self.sig_dict = {}
+
+    def poll(self):
+        p = subprocess.Popen(['cat', self.show_pin_file], stderr=subprocess.PIPE,
+                             stdout=subprocess.PIPE)
+        rawtuple = p.communicate()
+        raw = rawtuple[0].decode().split('\n')
+
+        pins = [[a for a in [x.strip() for x in line.split(' ')] if a != ''] for line in raw]
+
+        pin_dict = {}
+        sig_dict = {}
+        for p in pins:
+            if len(p) > 5:
+                sig_dict[p[6]] = p[3]
+            if len(p) >= 5:
+                pin_dict[p[4]] = p[3]
+
+        changed_items = set(pin_dict.items()) - set(self.pin_dict.items())
+
+        self.pin_dict = pin_dict
+        self.sig_dict = sig_dict
+
+        changed = []
+        for changed_item in changed_items:
+            if changed_item[0] in self.status_items:
+                changed.append(changed_item[0])
+        return changed
+
+
+def _cpu_time():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _run_cycles(poller, stub_hal, subscribed, cycles, seed, show_pin_file=None):
+    """Poll `cycles` times, changing 3 subscribed pins before each.
+
+    Returns (wall s per cycle, cpu s per cycle, ok).
+    """
+    rand = random.Random(seed)
+    poller.poll()
+
+    ok = True
+    wall = cpu = 0.0
+    for i in range(cycles):
+        changed = set(rand.sample(subscribed, 3))
+        for name in changed:
+            stub_hal.change(name, rand)
+        if show_pin_file is not None:
+            with open(show_pin_file, 'w') as fh:
+                fh.write(stub_hal.show_pin())
+
+        start_wall, start_cpu = time.perf_counter(), _cpu_time()
+        result = poller.poll()
+        wall += time.perf_counter() - start_wall
+        cpu += _cpu_time() - start_cpu
+
+        ok &= set(result) == changed
+
+    return wall / cycles, cpu / cycles, ok
+
+
+def main():
+    args = docopt(__doc__)
+    pins = int(args['--pins'])
+    subscribed_count = int(args['--subscribed'])
+    cycles = int(args['--cycles'])
+
+    stub_hal = StubHAL(pins)
+    stubs.install(hal=_stub_hal(stub_hal))
+    stubs.init_logger('HALPollerBench', log_file=os.devnull, log_level='ERROR')
+
+    from qtpy.QtCore import QCoreApplication
+    app = QCoreApplication([])
+
+    from qtpyvcp.utilities.obj_status import HALPoller
+
+    rand = random.Random(2)
+    subscribed = rand.sample(stub_hal.names, subscribed_count)
+
+    poller = HALPoller(start=False)
+    emitted = {}
+    for name in subscribed:
+        hal_pin = poller.getHALPin(name)
+        hal_pin.connect(lambda value, name=name: emitted.__setitem__(name, value))
+
+    failed = 0
+    checks = []
+
+    # lookups of pins that don't exist, a name only one pin starts with
+    # gets a suggestion
+    for name in ('no-such-comp.pin', subscribed[0][:-1]):
+        try:
+            poller.getHALPin(name)
+            checks.append(False)
+        except ValueError as e:
+            suggested = 'did you mean' in str(e)
+            checks.append(suggested == (len(poller.findPins(name)) == 1))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        show_pin_file = os.path.join(tmp_dir, 'show_pin')
+        legacy = LegacyPoller(show_pin_file, set(subscribed))
+        with open(show_pin_file, 'w') as fh:
+            fh.write(stub_hal.show_pin())
+        legacy_wall, legacy_cpu, legacy_ok = _run_cycles(
+            legacy, stub_hal, subscribed, cycles, 3, show_pin_file)
+
+    stub_hal.reads = 0
+    hal_wall, hal_cpu, hal_ok = _run_cycles(poller, stub_hal, subscribed, cycles, 4)
+    reads = stub_hal.reads / (cycles + 1)
+
+    # the HALPin objects were updated with the current, typed values
+    for name in subscribed:
+        pin_type, direction, value = stub_hal.pins[name]
+        hal_pin = poller.getHALPin(name)
+        checks.append(hal_pin.value == value and type(hal_pin.value) is hal_pin.type
+                      and emitted.get(name, value) == value)
+
+    print('{} pins, {} subscribed, {} cycles, times in ms per cycle'.format(
+        pins, subscribed_count, cycles))
+    print('{:<8} {:>10} {:>10} {:>12}  {}'.format('poller', 'wall', 'cpu', 'pins read', 'result'))
+    for name, wall, cpu, read, ok in (('legacy', legacy_wall, legacy_cpu, pins, legacy_ok),
+                                      ('hal', hal_wall, hal_cpu, reads, hal_ok)):
+        if not ok:
+            failed += 1
+        print('{:<8} {:10.3f} {:10.3f} {:>12g}  {}'.format(
+            name, wall * 1e3, cpu * 1e3, read, 'ok' if ok else 'WRONG'), flush=True)
+
+    if not all(checks):
+        failed += 1
+        print('HALPin values or pin lookups WRONG')
+
+    if failed:
+        print('{} check(s) failed'.format(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+"""Import Time Benchmark - guard against heavy imports in the widgets
+
+    Imports each module in a fresh interpreter run with
+    `python -X importtime` and reports the cumulative time the import
+    took, how many modules it imported and the slowest of them.
+
+    It also checks that none of the heavy optional packages below were
+    imported, which only the widgets that use them should do. Python
+    logs an import it tried even if the package is not installed, so
+    the check works without them. It exits with status 1 if any of
+    them was imported, so an eager import coming back is caught:
+
+      VTK, SQLAlchemy, PyOpenGL, pyqtgraph and QScintilla
+
+    The modules are imported with a stub linuxcnc and hal, and with HOME
+    and CONFIG_DIR set to a temporary directory, so it needs neither a
+    running LinuxCNC nor a display, and does not touch the user's log.
+
+    python benchmarks/import_time_bench.py
+
+Usage:
+  import_time_bench [options]
+  import_time_bench -h
+
+Options:
+  --modules=<list>  Comma separated modules to import.
+                    [default: qtpyvcp.widgets,qtpyvcp.widgets.display_widgets]
+  --repeat=<n>      Times to import each module, the best time is shown.
+                    [default: 3]
+  --top=<n>         Number of the slowest imports to show. [default: 5]
+"""
+
+import os
+import sys
+import tempfile
+import subprocess
+
+from docopt import docopt
+
+# heavy packages, by the names of the modules they are imported as
+HEAVY_PACKAGES = {
+    'VTK': ('vtk', 'vtkmodules'),
+    'SQLAlchemy': ('sqlalchemy',),
+    'PyOpenGL': ('OpenGL',),
+    'pyqtgraph': ('pyqtgraph',),
+    'QScintilla': ('PyQt5.Qsci', 'PyQt6.Qsci', 'qtpy.Qsci', 'QScintilla'),
+}
+
+# written to stderr by the child before the import, the imports logged
+# before it are the interpreter's own
+MARKER = '-- import_time_bench --'
+
+# run in the child, installs the stub linuxcnc and hal modules and
+# imports the module given as the first argument
+BOOTSTRAP = '''
+import sys
+sys.path.insert(0, {benchmarks_dir!r})
+
+import stubs
+stubs.install()
+
+sys.stderr.write({marker!r} + '\\n')
+sys.stderr.flush()
+
+import importlib
+importlib.import_module(sys.argv[1])
+'''.format(benchmarks_dir=os.path.dirname(os.path.abspath(__file__)), marker=MARKER)
+
+
+def parse_importtime(stderr):
+    """Parse the `-X importtime` output logged after MARKER.
+
+    Returns:
+        list : (module, self us, cumulative us, depth) for each import.
+    """
+    imports = []
+    started = False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            started = True
+            continue
+        if not started or not line.startswith('import time:'):
+            continue
+
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+
+        name = fields[2]
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((module, int(fields[0]), int(fields[1]), depth))
+
+    return imports
+
+
+def heavy_imports(imports):
+    """Returns the names of the HEAVY_PACKAGES among the imports."""
+    found = []
+    for package, modules in HEAVY_PACKAGES.items():
+        for module, self_us, cumulative_us, depth in imports:
+            if any(module == name or module.startswith(name + '.') for name in modules):
+                found.append(package)
+                break
+    return found
+
+
+def time_import(module, env):
+    """Import the module in a new interpreter.
+
+    Returns:
+        tuple : The parsed imports, see parse_importtime, and the error
+            output if the import failed, otherwise None.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOTSTRAP, module],
+                          env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    error = None
+    if proc.returncode != 0:
+        error = '\n'.join(line for line in proc.stderr.splitlines()
+                          if not line.startswith('import time:') and line != MARKER)
+    return parse_importtime(proc.stderr), error
+
+
+def main():
+    args = docopt(__doc__)
+    modules = [module.strip() for module in args['--modules'].split(',') if module.strip()]
+    repeat = int(args['--repeat'])
+    top = int(args['--top'])
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, HOME=tmp_dir, CONFIG_DIR=tmp_dir)
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+        for module in modules:
+            best = None
+            for i in range(repeat):
+                imports, error = time_import(module, env)
+                total = sum(cumulative_us for name, self_us, cumulative_us, depth
+                            in imports if depth == 0)
+                if best is None or total < best[0]:
+                    best = (total, imports)
+                if error is not None:
+                    break
+
+            total, imports = best
+            heavy = heavy_imports(imports)
+            if heavy or error is not None:
+                failed += 1
+
+            print('{}: {:.1f} ms, {} modules, heavy imports: {}'.format(
+                module, total / 1e3, len(imports),
+                ', '.join(heavy) + ' WRONG' if heavy else 'none'))
+
+            # a heavy package that is not installed fails the import,
+            # it has been reported above
+            if error is not None:
+                print('  import FAILED:')
+                print('\n'.join('    ' + line for line in error.splitlines()[-3:]))
+                continue
+
+            slowest = sorted(imports, key=lambda i: i[1], reverse=True)[:top]
+            for name, self_us, cumulative_us, depth in slowest:
+                print('  {:>8.1f} ms self {:>8.1f} ms cumulative  {}'.format(
+                    self_us / 1e3, cumulative_us / 1e3, name))
+
+    if failed:
+        print('{} module(s) failed to import or imported heavy packages'.format(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
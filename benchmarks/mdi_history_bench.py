@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+"""MDI History Benchmark - search and save cost of the MDI history
+
+    Fills an MDI history file with synthetic commands and, for each
+    history size, times loading it, adding a command and searching it:
+
+      legacy   a newest first list, searched by scanning every command,
+               with the whole file rewritten to save it, like the
+               Status plugin used to
+      store    the current MDIHistoryStore
+
+    Search latency is the mean over a set of prefix and substring
+    queries, returning all matches and, like the MDIEntry completer, the
+    newest 100. The time to build the search index, which the Status
+    plugin does after loading, is shown separately. Each store search is checked against the linear
+    scan, before and after the adds, and the file against the history
+    after the adds and a reload.
+
+    It only needs the qtpyvcp.lib.mdi_history module and a stub linuxcnc
+    for the logger, so needs neither a running LinuxCNC nor a display.
+
+    python benchmarks/mdi_history_bench.py
+
+Usage:
+  mdi_history_bench [options]
+  mdi_history_bench -h
+
+Options:
+  --sizes=<list>   Comma separated history sizes. [default: 1000,10000,100000]
+  --queries=<n>    Number of queries of each kind. [default: 20]
+  --adds=<n>       Number of commands to add. [default: 100]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+from docopt import docopt
+
+import stubs
+
+PREFIXES = ['G0', 'G1', 'G2', 'G3', 'G10 L20', 'G53', 'M3', 'M6', 'T', 'F', 'O']
+
+
+def synthetic_command(rand):
+    word = rand.choice(PREFIXES)
+    if word == 'T':
+        return 'T{} M6 G43'.format(rand.randint(1, 200))
+    if word == 'M3':
+        return 'M3 S{}'.format(rand.randint(100, 24000))
+    if word == 'F':
+        return 'F{}'.format(rand.randint(1, 5000))
+    if word == 'O':
+        return 'O<sub{}> CALL [{}]'.format(rand.randint(1, 50), rand.randint(1, 99))
+    return '{} X{:.3f} Y{:.3f} Z{:.3f}'.format(
+        word, rand.uniform(-500, 500), rand.uniform(-500, 500), rand.uniform(-100, 10))
+
+
+def synthetic_history(size, seed=1):
+    """Returns a list of `size` unique commands, oldest first."""
+    rand = random.Random(seed)
+    cmds = dict()
+    while len(cmds) < size:
+        cmds[synthetic_command(rand)] = None
+    return list(cmds)
+
+
+def legacy_load(fname, max_length):
+    # Status.loadMdiHistory before the history store, without the limit
+    # of 100 commands it used to keep
+    mdi_history = []
+    with open(fname, 'r') as fh:
+        for line in fh.readlines():
+            mdi_history.append(line.strip())
+    mdi_history.reverse()
+    return mdi_history[:max_length]
+
+
+def legacy_add(cmds, cmd, fname):
+    # the mdi_history setter, then saveMdiHistory to keep the file current
+    if cmd in cmds:
+        cmds.remove(cmd)
+    cmds.insert(0, cmd)
+    with open(fname, 'w') as fh:
+        for cmd in reversed(cmds):
+            fh.write(cmd + '\n')
+
+
+def legacy_search(cmds, text, prefix):
+    text = text.casefold()
+    if prefix:
+        return [cmd for cmd in cmds if cmd.casefold().startswith(text)]
+    return [cmd for cmd in cmds if text in cmd.casefold()]
+
+
+def _queries(history, count, seed=2):
+    rand = random.Random(seed)
+    prefixes = [rand.choice(PREFIXES).lower() for i in range(count)]
+    # pieces of commands, so most substring queries match something
+    substrings = []
+    for i in range(count):
+        cmd = rand.choice(history)
+        start = rand.randint(0, max(len(cmd) - 4, 0))
+        substrings.append(cmd[start:start + 4])
+    return prefixes, substrings
+
+
+def _mean(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return (time.perf_counter() - start) / len(args)
+
+
+def run_benchmark(size, opts, tmp_dir):
+    """Time one history size, returns a dict of results."""
+    from qtpyvcp.lib.mdi_history import MDIHistoryStore
+
+    history = synthetic_history(size)
+    fname = os.path.join(tmp_dir, 'mdi_history_{}'.format(size))
+    with open(fname, 'w') as fh:
+        fh.write(''.join(cmd + '\n' for cmd in history))
+
+    results = {'size': size}
+    ok = True
+
+    start = time.perf_counter()
+    legacy = legacy_load(fname, size)
+    results['legacy_load'] = time.perf_counter() - start
+
+    store = MDIHistoryStore(fname, max_entries=size)
+    start = time.perf_counter()
+    store.load()
+    results['store_load'] = time.perf_counter() - start
+    ok &= store.recent() == legacy
+
+    start = time.perf_counter()
+    store.buildIndex()
+    results['index'] = time.perf_counter() - start
+
+    prefixes, substrings = _queries(history, opts['queries'])
+
+    for name, queries, prefix in (('prefix', prefixes, True),
+                                  ('substring', substrings, False)):
+        results['legacy_' + name] = _mean(lambda q: legacy_search(legacy, q, prefix), queries)
+        results['store_' + name] = _mean(lambda q: store.search(q, prefix=prefix, limit=None), queries)
+        results['limit_' + name] = _mean(lambda q: store.search(q, prefix=prefix, limit=100), queries)
+        for query in queries:
+            ok &= store.search(query, prefix=prefix, limit=None) == legacy_search(legacy, query, prefix)
+
+    # adds, half new commands and half repeats of older ones
+    rand = random.Random(3)
+    adds = []
+    for i in range(opts['adds']):
+        adds.append(history[rand.randrange(size)] if i % 2 else 'G0 X{} (new {})'.format(i, i))
+
+    legacy_fname = fname + '.legacy'
+    results['legacy_add'] = _mean(lambda cmd: legacy_add(legacy, cmd, legacy_fname), adds)
+    results['store_add'] = _mean(store.add, adds)
+
+    # the search index kept up with the adds, which pushed out the oldest
+    legacy = legacy[:size]
+    for query in prefixes[:5]:
+        ok &= store.search(query, prefix=True, limit=None) == legacy_search(legacy, query, True)
+    for query in substrings[:5] + ['(new']:
+        ok &= store.search(query, limit=None) == legacy_search(legacy, query, False)
+
+    # the file reloads to the same history
+    results['file_lines'] = store.file_lines
+    reloaded = MDIHistoryStore(fname, max_entries=size)
+    reloaded.load()
+    ok &= reloaded.recent() == store.recent() == legacy
+
+    results['ok'] = ok
+    return results
+
+
+def main():
+    args = docopt(__doc__)
+    opts = {'queries': int(args['--queries']),
+            'adds': int(args['--adds'])}
+    sizes = [int(size) for size in args['--sizes'].split(',')]
+
+    stubs.init_logger('MDIHistoryBench', log_file=os.devnull, log_level='ERROR')
+
+    print('mean times in ms')
+    print('{:>8} {:>17} {:>26} {:>26} {:>17} {:>8}'.format(
+        '', 'load', 'prefix search', 'substring search', 'add', 'index'))
+    print('{:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8}  {}'.format(
+        'size', 'legacy', 'store', 'legacy', 'store', 'newest', 'legacy', 'store',
+        'newest', 'legacy', 'store', 'build', 'result'))
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            r = run_benchmark(size, opts, tmp_dir)
+            if not r['ok']:
+                failed += 1
+            print('{:>8} {:8.2f} {:8.2f} {:8.3f} {:8.3f} {:8.3f} {:8.3f} {:8.3f} '
+                  '{:8.3f} {:8.3f} {:8.3f} {:8.2f}  {}'.format(
+                      size, r['legacy_load'] * 1e3, r['store_load'] * 1e3,
+                      r['legacy_prefix'] * 1e3, r['store_prefix'] * 1e3,
+                      r['limit_prefix'] * 1e3, r['legacy_substring'] * 1e3,
+                      r['store_substring'] * 1e3, r['limit_substring'] * 1e3,
+                      r['legacy_add'] * 1e3, r['store_add'] * 1e3,
+                      r['index'] * 1e3, 'ok' if r['ok'] else 'WRONG'), flush=True)
+
+    if failed:
+        print('{} size(s) gave wrong results'.format(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
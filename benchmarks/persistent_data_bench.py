@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+"""Persistent Data Benchmark - flush and startup cost of persistent data
+
+    Fills a PersistentDataManager with --keys keys and times writing and
+    loading them, the way the data manager used to (legacy) and with the
+    current pack file:
+
+      legacy   dumps all the data to one file on terminate, without an
+               fsync, and loads the whole file at startup
+      pack     serializes only the changed keys and writes the pack file,
+               fsynced, and deserializes each key the first time it is
+               asked for
+
+    Flush times are for one changed key, for ten, and for all the keys.
+    Startup times are for reading the pack, and then for getting one key
+    and all the keys. The data is checked to load back unchanged,
+    including from a legacy file, and with pickle non-str keys too.
+
+    It uses a stub linuxcnc, so needs neither a running LinuxCNC nor a
+    display.
+
+    python benchmarks/persistent_data_bench.py
+
+Usage:
+  persistent_data_bench [options]
+  persistent_data_bench -h
+
+Options:
+  --keys=<list>    Comma separated numbers of keys. [default: 10,100,1000,10000]
+  --method=<name>  Serialization method, pickle or json. [default: pickle]
+  --repeat=<n>     Times to run each case, the best time is shown. [default: 3]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from docopt import docopt
+
+import stubs
+
+
+def synthetic_data(keys):
+    """Returns a dict of `keys` keys of settings like data."""
+    return {'key-{}'.format(i): {'value': i * 1.5,
+                                 'name': 'Key {}'.format(i),
+                                 'items': list(range(i % 20))}
+            for i in range(keys)}
+
+
+def legacy_dump(manager, data):
+    # PersistentDataManager.terminate before the per-key files
+    if manager.serialization_method == 'json':
+        str_data = manager.serializer.dumps(data, indent=4, sort_keys=True)
+        write_method = "w"
+    else:
+        str_data = manager.serializer.dumps(data, protocol=manager.serializer.HIGHEST_PROTOCOL)
+        write_method = "wb"
+
+    with open(manager.persistence_file, write_method) as fh:
+        fh.write(str_data)
+
+
+def legacy_load(manager):
+    # PersistentDataManager.ioInitialise before the per-key files
+    with open(manager.persistence_file, 'rb') as fh:
+        return manager.serializer.loads(fh.read())
+
+
+def _best(func, repeat, setup=None):
+    best = None
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def check_keys(tmp_dir):
+    """Check non-str keys of a legacy pickle file survive conversion."""
+    from qtpyvcp.plugins.persistent_data_manager import PersistentDataManager
+
+    def new_manager():
+        return PersistentDataManager(persistence_file=persistence_file)
+
+    data = {1: 'int', (2, 'tuple'): 'tuple', 'str': 'str'}
+    persistence_file = os.path.join(tmp_dir, 'keys.pickle')
+    manager = new_manager()
+    legacy_dump(manager, data)
+
+    manager.ioInitialise()
+    manager.setData('str', 'changed')
+    manager.terminate()
+
+    started = new_manager()
+    started.ioInitialise()
+    return all(started.getData(name) == manager.data[name] for name in data)
+
+
+def run_benchmark(keys, opts, tmp_dir):
+    """Time one number of keys, returns a dict of results."""
+    from qtpyvcp.plugins.persistent_data_manager import PersistentDataManager
+
+    def new_manager():
+        return PersistentDataManager(serialization_method=opts['method'],
+                                     persistence_file=persistence_file)
+
+    data = synthetic_data(keys)
+    names = sorted(data)
+    results = {}
+    ok = True
+
+    # legacy, and a legacy file to convert
+    persistence_file = os.path.join(tmp_dir, 'legacy_{}.{}'.format(keys, opts['method']))
+    manager = new_manager()
+    results['legacy_dump'] = _best(lambda: legacy_dump(manager, data), opts['repeat'])
+    results['legacy_load'] = _best(lambda: legacy_load(manager), opts['repeat'])
+
+    manager.ioInitialise()
+    ok &= all(manager.getData(name) == data[name] for name in names)
+
+    # the first change writes all the converted keys to the pack
+    manager.setData(names[0], data[names[0]])
+    manager.flush()
+    ok &= os.path.isfile(manager.pack_file)
+
+    # changes to an existing store
+    for name, count in (('flush_one', 1), ('flush_ten', 10), ('flush_all', keys)):
+        changed = names[:count]
+        counter = [0]
+
+        def change():
+            counter[0] += 1
+            for name in changed:
+                manager.setData(name, dict(data[name], value=counter[0]))
+
+        results[name] = _best(manager.flush, opts['repeat'], change)
+        ok &= not manager._dirty
+
+    manager._flush_timer.stop()
+
+    # startup of the converted store
+    def startup():
+        started[0] = new_manager()
+        started[0].ioInitialise()
+
+    started = [None]
+    results['start_pack'] = _best(startup, opts['repeat'])
+    results['start_one'] = _best(lambda: started[0].getData(names[-1]), opts['repeat'], startup)
+    results['start_all'] = _best(lambda: [started[0].getData(name) for name in names],
+                                 opts['repeat'], startup)
+
+    expected = dict(manager.data)
+    ok &= all(started[0].getData(name) == expected[name] for name in names)
+    ok &= started[0].getData('missing', 'default') == 'default'
+
+    if opts['method'] == 'pickle':
+        ok &= check_keys(tmp_dir)
+
+    results['ok'] = ok
+    return results
+
+
+def main():
+    args = docopt(__doc__)
+    opts = {'method': args['--method'],
+            'repeat': int(args['--repeat'])}
+    sizes = [int(keys) for keys in args['--keys'].split(',')]
+
+    if opts['method'] not in ('pickle', 'json'):
+        print('Unknown serialization method: {}'.format(opts['method']), file=sys.stderr)
+        return 2
+
+    stubs.init_logger('PersistentDataBench', log_file=os.devnull, log_level='ERROR')
+
+    from qtpy.QtCore import QCoreApplication
+    app = QCoreApplication([])
+
+    print('{} serialization, best of {}, times in ms'.format(opts['method'], opts['repeat']))
+    print('{:>6} {:>17} {:>26} {:>26}'.format('', 'legacy', 'pack flush', 'pack startup'))
+    print('{:>6} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8}  {}'.format(
+        'keys', 'dump', 'load', '1 key', '10 keys', 'all', 'read', '1 key', 'all', 'result'))
+
+    failed = 0
+    for keys in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            r = run_benchmark(keys, opts, tmp_dir)
+        if not r['ok']:
+            failed += 1
+        print('{:>6} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:8.2f}  {}'.format(
+            keys, r['legacy_dump'] * 1e3, r['legacy_load'] * 1e3,
+            r['flush_one'] * 1e3, r['flush_ten'] * 1e3, r['flush_all'] * 1e3,
+            r['start_pack'] * 1e3, r['start_one'] * 1e3, r['start_all'] * 1e3,
+            'ok' if r['ok'] else 'WRONG'), flush=True)
+
+    if failed:
+        print('{} store(s) did not load back unchanged'.format(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
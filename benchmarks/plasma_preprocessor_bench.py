@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+"""Plasma GCode Preprocessor Benchmark - time and fingerprint the filter
+
+    Runs the plasma_gcode_preprocessor pipeline over synthetic nests
+    of several sizes in each of its hole/pierce modes. It uses stub hal
+    and linuxcnc modules and an in-memory SQLite cut chart DB, so it
+    needs neither a machine config nor a running LinuxCNC.
+    Each case runs in its own forked process and reports lines/s,
+    peak RSS and a hash of the output. Save the results of one version
+    and compare another against them to check that an optimisation is
+    byte-identical and faster.
+
+    python benchmarks/plasma_preprocessor_bench.py --save=before.json
+    ... make changes ...
+    python benchmarks/plasma_preprocessor_bench.py --compare=before.json
+
+Usage:
+  plasma_preprocessor_bench [options]
+  plasma_preprocessor_bench -h
+
+Options:
+  --sizes=<lines>   Comma separated nest sizes, in lines.
+                    [default: 1000,10000,100000]
+  --modes=<modes>   Comma separated modes out of plain, holes, marking,
+                    pierce and hidef. [default: plain,holes,marking,pierce,hidef]
+  --repeat=<n>      Runs per case, the fastest is reported. [default: 3]
+  --seed=<n>        Seed for the nest generator. [default: 1]
+  --save=<file>     Save the results as JSON.
+  --compare=<file>  Compare with results saved by --save. Exits with
+                    status 1 if any output differs.
+  --keep=<dir>      Write the nests and outputs to <dir> and keep them.
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import random
+import hashlib
+import shutil
+import tempfile
+import resource
+import importlib
+import multiprocessing
+
+from docopt import docopt
+
+import stubs
+
+
+# HAL pin values for each mode, on top of COMMON_HAL_VALUES
+COMMON_HAL_VALUES = {
+    'qtpyvcp.plasma-hole-detect-enable.checked': False,
+    'qtpyvcp.plasma-pierce-only-enable.checked': False,
+    'qtpyvcp.plasma-hole-thickness-ratio.out': 2.5,
+    'qtpyvcp.plasma-max-hole-size.out': 32.0,
+    'qtpyvcp.plasma-arc1-percent.out': 100.0,
+    'qtpyvcp.plasma-arc2-distance.out': 2.0,
+    'qtpyvcp.plasma-arc2-percent.out': 60.0,
+    'qtpyvcp.plasma-arc3-distance.out': 1.5,
+    'qtpyvcp.plasma-arc3-percent.out': 50.0,
+    'qtpyvcp.plasma-leadin-percent.out': 50.0,
+    'qtpyvcp.plasma-leadin-radius.out': 0.0,
+    'qtpyvcp.param-kirfwidth.out': 1.5,
+    'qtpyvcp.plasma-torch-off-distance.out': 1.0,
+    'qtpyvcp.plasma-small-hole-detect.checked': False,
+    'qtpyvcp.plasma-small-hole-threshold.out': 5.0,
+    'qtpyvcp.spot-threshold.out': 50.0,
+    'qtpyvcp.spot-delay.out': 0.1,
+}
+
+MODES = {
+    'plain': {},
+    'holes': {'qtpyvcp.plasma-hole-detect-enable.checked': True},
+    'marking': {'qtpyvcp.plasma-hole-detect-enable.checked': True,
+                'qtpyvcp.plasma-small-hole-detect.checked': True,
+                'qtpyvcp.plasma-leadin-radius.out': 1.2},
+    'pierce': {'qtpyvcp.plasma-pierce-only-enable.checked': True},
+    'hidef': {'qtpyvcp.plasma-hole-detect-enable.checked': True},
+}
+
+# hole diameters in the nests, the smallest are marked rather than cut
+# and the largest are above the max hole size so are left alone
+HOLE_SIZES = (2, 4, 6, 8, 12, 20, 40, 80)
+
+# hidef hole data, as (hole size, leadin radius, kerf), added for the
+# hidef mode only
+HIDEF_HOLES = ((3.0, 0.75, 1.2), (10.0, 2.5, 1.4), (25.0, 6.0, 1.5), (50.0, 12.0, 1.6))
+
+HAL_VALUES = {}
+HAL_PINS = {}
+
+
+def _stub_hal():
+    # minimal hal module, enough for the preprocessor
+    hal = types.ModuleType('hal')
+
+    class component:
+        def __init__(self, name):
+            self.name = name
+
+        def ready(self):
+            pass
+
+    def get_value(name):
+        return HAL_VALUES[name]
+
+    def set_p(name, value):
+        HAL_PINS[name] = value
+        return 0
+
+    hal.component = component
+    hal.get_value = get_value
+    hal.set_p = set_p
+    return hal
+
+
+def generate_nest(size, seed=1):
+    """Return the text of a SheetCam style nest of about `size` lines.
+
+    Parts are outer contours of lines and arcs, holes of HOLE_SIZES,
+    spot marks and the odd tool change between the two cut charts in
+    the benchmark DB.
+    """
+    r = random.Random(seed)
+    out = ['(Benchmark nest)', 'G21 G90 G64 P0.1', 'G91.1', 'G40', 'T1 M6',
+           'F#<_hal[plasmac.cut-feed-rate]>', 'M52 P1']
+    while len(out) < size:
+        k = r.random()
+        x, y = round(r.uniform(0, 1200), 3), round(r.uniform(0, 1200), 3)
+        if k < 0.4:
+            d = r.choice(HOLE_SIZES)
+            top = round(y + d / 2, 3)
+            out += ['(hole)', f'G0 X{x} Y{y}', 'M3 $0 S1', f'G1 X{x} Y{top}',
+                    f'G3 X{x} Y{top} I0 J{-d / 2}', 'M5 $0']
+        elif k < 0.75:
+            w, h = round(r.uniform(20, 200), 3), round(r.uniform(20, 200), 3)
+            out += ['(part)', f'G0 X{x} Y{y}', 'M3 $0 S1',
+                    f'G1 X{round(x + w, 3)} Y{y}',
+                    f'G3 X{round(x + w + 5, 3)} Y{round(y + 5, 3)} I0 J5',
+                    f'G1 Y{round(y + h, 3)}',
+                    f'G2 X{round(x + w, 3)} Y{round(y + h + 5, 3)} I-5 J0 ; corner',
+                    f'G1 X{x}', f'G1 Y{y}', 'M5 $0']
+        elif k < 0.85:
+            out += ['(mark)', f'G0 X{x} Y{y}', 'M3 $2 S1', 'G91', 'G1 X0.001',
+                    'G90', 'M5 $2']
+        elif k < 0.88:
+            out += [f'T{r.choice((1, 2))} M6', 'F1500']
+        else:
+            out += [f'G1 X{x} Y{y}', f'G1 X{x} Y{y} F2000', f'G0 X{x}']
+    out += ['M5 $-1', 'M30']
+    return '\n'.join(out) + '\n'
+
+
+def _memory_db(pp, hidef):
+    # an in-memory SQLite PlasmaProcesses with two cut charts
+    from qtpyvcp.plugins import plasma_processes as db
+
+    plasma_db = pp.PlasmaProcesses(db_type='memory', connect_string='sqlite://')
+    session = plasma_db._session
+    linear = db.LinearSystem(name='mm', unit_per_inch=25.4)
+    pressure = db.PressureSystem(name='bar', unit_per_psi=0.0689)
+    machine = db.Machine(name='Bench', service_height=45)
+    material = db.Material(name='Mild Steel')
+    session.add_all([linear, pressure, machine, material])
+    session.flush()
+    for name, thick, speed in (('3mm', 3.0, 3000.0), ('6mm', 6.0, 1800.0)):
+        thickness = db.Thickness(name=name, thickness=thick, linearsystemid=linear.id)
+        session.add(thickness)
+        session.flush()
+        session.add(db.Cutchart(linearsystemid=linear.id, pressuresystemid=pressure.id,
+                                machineid=machine.id, materialid=material.id,
+                                thicknessid=thickness.id, name=f'Bench {name}',
+                                pierce_height=3.8, pierce_delay=0.5, cut_height=1.5,
+                                cut_speed=speed, volts=120.0, kerf_width=1.5,
+                                plunge_rate=1000.0, puddle_height=0.0, puddle_delay=0.0,
+                                amps=45.0, pressure=5.5, pause_at_end=0.0))
+        if hidef:
+            for hole_size, leadin_radius, kerf in HIDEF_HOLES:
+                session.add(db.HoleCut(machineid=machine.id, materialid=material.id,
+                                       thicknessid=thickness.id, amps=45.0,
+                                       hole_size=hole_size, leadin_radius=leadin_radius,
+                                       kerf=kerf, cut_height=1.5, speed1=speed * 0.6,
+                                       speed2=speed * 0.4, speed2_distance=2.0,
+                                       plasma_off_distance=1.0, over_cut=1.5))
+    session.commit()
+    return plasma_db
+
+
+class HashWriter:
+    # hashes the text written to it, optionally copying it to a file
+    def __init__(self, copy_to=None):
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.copy_to = copy_to
+
+    def write(self, text):
+        data = text.encode()
+        self.hash.update(data)
+        self.size += len(data)
+        if self.copy_to is not None:
+            self.copy_to.write(text)
+
+    def flush(self):
+        pass
+
+
+def _run_case(pp, nest_file, mode, repeat, out_file, conn):
+    # runs in a forked child so every case starts from the same state
+    # and the peak RSS is its own
+    HAL_VALUES.update(COMMON_HAL_VALUES)
+    HAL_VALUES.update(MODES[mode])
+    pp.PLASMADB = _memory_db(pp, hidef=mode == 'hidef')
+
+    stderr = sys.stderr
+    best = None
+    for run in range(repeat):
+        # start cold each run, like a fresh filter process
+        pp.PLASMADB.invalidate_cache()
+        pp.HoleBuilder.templates.clear()
+        copy_to = open(out_file, 'w') if out_file and run == 0 else None
+        writer = HashWriter(copy_to)
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            start = time.perf_counter()
+            p = pp.PreProcessor(nest_file, progress=False)
+            p.dump_parsed(pp._pipeline(p, pp.PhaseTimer()), writer)
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+            if copy_to is not None:
+                copy_to.close()
+        if best is None or elapsed < best:
+            best = elapsed
+
+    conn.send({'lines': p._line_num,
+               'seconds': best,
+               'lines_per_s': p._line_num / best if best else 0,
+               'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+               'bytes': writer.size,
+               'errors': p.errors,
+               'sha256': writer.hash.hexdigest()})
+    conn.close()
+
+
+def run_benchmarks(sizes, modes, work_dir, repeat=3, seed=1, keep=False):
+    """Run every size/mode case, yielding a result dict for each.
+
+    The nests, and the outputs if `keep` is True, are written to
+    `work_dir`, which also serves as the preprocessor's CONFIG_DIR.
+    """
+    os.environ['CONFIG_DIR'] = work_dir
+    os.environ['INI_FILE_NAME'] = os.path.join(work_dir, 'bench.ini')
+    os.environ['QTPYVCP_PREPROCESSOR_CACHE'] = '0'
+    os.environ.setdefault('QTPYVCP_PREPROCESSOR_LOG_LEVEL', 'WARNING')
+
+    stubs.install(hal=_stub_hal())
+    stubs.init_logger('PlasmaBench', log_file=os.path.join(work_dir, 'bench.log'),
+                      log_level='WARNING')
+
+    pp = importlib.import_module('qtpyvcp.tools.plasma_gcode_preprocessor')
+
+    ctx = multiprocessing.get_context('fork')
+    results = []
+    for size in sizes:
+        nest_file = os.path.join(work_dir, f'nest{size}.ngc')
+        with open(nest_file, 'w') as fh:
+            fh.write(generate_nest(size, seed))
+
+        for mode in modes:
+            out_file = os.path.join(work_dir, f'nest{size}.{mode}.out.ngc') if keep else None
+            recv, send = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_run_case,
+                               args=(pp, nest_file, mode, repeat, out_file, send))
+            proc.start()
+            send.close()
+            try:
+                result = recv.recv()
+            except EOFError:
+                raise RuntimeError(f'Benchmark case {size} {mode} failed')
+            finally:
+                proc.join()
+            result.update(size=size, mode=mode)
+            results.append(result)
+            yield result
+
+        if not keep:
+            os.remove(nest_file)
+
+
+def _print_result(result, baseline=None):
+    line = '{size:>8} {mode:<8} {lines:>8} {seconds:8.3f}s {lines_per_s:>10.0f} {rss_mb:8.1f} {sha256:.16}'.format(**result)
+    if baseline is not None:
+        same = 'same' if baseline['sha256'] == result['sha256'] else 'DIFFERENT'
+        line += '  {:6.2f}x  {}'.format(baseline['seconds'] / result['seconds'], same)
+    print(line, flush=True)
+
+
+def main():
+    opts = docopt(__doc__)
+    sizes = [int(s) for s in opts['--sizes'].split(',')]
+    modes = opts['--modes'].split(',')
+    for mode in modes:
+        if mode not in MODES:
+            print(f'Unknown mode: {mode}', file=sys.stderr)
+            return 2
+
+    baselines = {}
+    if opts['--compare']:
+        with open(opts['--compare']) as fh:
+            for result in json.load(fh)['results']:
+                baselines[(result['size'], result['mode'])] = result
+
+    header = '{:>8} {:<8} {:>8} {:>9} {:>10} {:>8} {}'.format(
+        'size', 'mode', 'lines', 'time', 'lines/s', 'rss MB', 'sha256')
+    if baselines:
+        header += '  speedup  output'
+    print(header)
+
+    keep = opts['--keep'] is not None
+    if keep:
+        work_dir = opts['--keep']
+        os.makedirs(work_dir, exist_ok=True)
+    else:
+        work_dir = tempfile.mkdtemp(prefix='plasma_bench_')
+
+    results = []
+    different = 0
+    try:
+        for result in run_benchmarks(sizes, modes, work_dir, int(opts['--repeat']),
+                                     int(opts['--seed']), keep):
+            baseline = baselines.get((result['size'], result['mode']))
+            if baseline is not None and baseline['sha256'] != result['sha256']:
+                different += 1
+            _print_result(result, baseline)
+            results.append(result)
+    finally:
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if opts['--save']:
+        with open(opts['--save'], 'w') as fh:
+            json.dump({'python': sys.version.split()[0],
+                       'created': time.time(),
+                       'results': results}, fh, indent=2)
+
+    if different:
+        print(f'{different} case(s) produced different output')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
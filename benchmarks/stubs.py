@@ -0,0 +1,145 @@
+"""Stub LinuxCNC and HAL modules for the benchmarks and tests
+
+The benchmarks and tests run without LinuxCNC installed. `install` puts
+minimal `linuxcnc` and `hal` modules in sys.modules, enough to import the
+qtpyvcp modules they exercise, and `init_logger` sets up the qtpyvcp base
+logger so it does not write to the user's log file.
+"""
+
+import os
+import sys
+import types
+
+# import qtpyvcp from this checkout, also when it is not installed
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# the linuxcnc constants the plugins and actions compare against, with
+# their real values, any other constant is 0
+CONSTANTS = {
+    'STATE_ESTOP': 1,
+    'STATE_ESTOP_RESET': 2,
+    'STATE_OFF': 3,
+    'STATE_ON': 4,
+    'INTERP_IDLE': 1,
+    'INTERP_READING': 2,
+    'INTERP_PAUSED': 3,
+    'INTERP_WAITING': 4,
+    'RCS_DONE': 1,
+    'RCS_EXEC': 2,
+    'RCS_ERROR': 3,
+    'MODE_MANUAL': 1,
+    'MODE_AUTO': 2,
+    'MODE_MDI': 3,
+}
+
+# the linuxcnc.stat fields of the stub status plugin, an idle machine
+STAT = {
+    'estop': 0,
+    'enabled': True,
+    'task_state': CONSTANTS['STATE_ON'],
+    'task_mode': CONSTANTS['MODE_MANUAL'],
+    'interp_state': CONSTANTS['INTERP_IDLE'],
+    'state': CONSTANTS['RCS_DONE'],
+    'paused': False,
+    'homed': (1, 1, 1),
+    'limit': (0, 0, 0),
+    'file': '',
+    'g5x_index': 1,
+    'tool_in_spindle': 0,
+}
+
+# MDI commands sent through linuxcnc.command, oldest first
+MDI_LOG = []
+
+
+class ini(object):
+    def __init__(self, ini_file):
+        self.ini_file = ini_file
+
+    def find(self, section, option):
+        return None
+
+
+class stat(object):
+    def __init__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class command(stat):
+    def mdi(self, cmd):
+        MDI_LOG.append(cmd)
+
+
+def _constant(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    return 0
+
+
+def install(hal=None):
+    """Install the stub linuxcnc module.
+
+    Args:
+        hal (module) : The hal module to install, a bare module if None.
+    """
+    linuxcnc = types.ModuleType('linuxcnc')
+    linuxcnc.ini = ini
+    linuxcnc.stat = stat
+    linuxcnc.command = command
+    linuxcnc.error_channel = stat
+    linuxcnc.__dict__.update(CONSTANTS)
+    linuxcnc.__getattr__ = _constant
+    sys.modules['linuxcnc'] = linuxcnc
+
+    sys.modules['hal'] = hal or types.ModuleType('hal')
+
+
+def register_status(**stat):
+    """Register a stub status plugin.
+
+    Its `stat` holds the given linuxcnc.stat fields. Its channels are
+    DataChannels, made on first use, that start with the value of the stat
+    field of the same name.
+
+    Returns:
+        DataPlugin : The status plugin.
+    """
+    from qtpyvcp.plugins import registerPlugin, DataPlugin, DataChannel
+
+    class StubStatus(DataPlugin):
+        old = {}
+        no_force_homing = False
+
+        def __getattr__(self, name):
+            if name.startswith('_') or name in ('stat', 'channels'):
+                raise AttributeError(name)
+            channel = DataChannel(data=getattr(self.stat, name, None))
+            setattr(self, name, channel)
+            return channel
+
+        def allHomed(self):
+            return all(self.stat.homed)
+
+    status = StubStatus()
+    status.stat = types.SimpleNamespace(**dict(STAT, **stat))
+    registerPlugin('status', status)
+    return status
+
+
+def init_logger(name, log_file=os.devnull, log_level='ERROR'):
+    """Install the stubs and set up the qtpyvcp base logger.
+
+    Call this before importing any other qtpyvcp module, the first one to
+    import the logger would otherwise set up the default base logger, which
+    truncates the user's log file.
+    """
+    if 'linuxcnc' not in sys.modules:
+        install()
+
+    from qtpyvcp.utilities.logger import initBaseLogger
+    return initBaseLogger(name, log_file=log_file, log_level=log_level)
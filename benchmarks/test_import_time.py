@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+import import_time_bench
+
+
+@pytest.mark.parametrize('module', [
+    'qtpyvcp.widgets',
+    'qtpyvcp.widgets.display_widgets',
+])
+def test_no_heavy_imports(module, tmp_path):
+    env = dict(os.environ, HOME=str(tmp_path), CONFIG_DIR=str(tmp_path))
+
+    imports, error = import_time_bench.time_import(module, env)
+
+    assert import_time_bench.heavy_imports(imports) == []
+    assert error is None
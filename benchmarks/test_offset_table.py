@@ -0,0 +1,150 @@
+"""Var file reads and G10 saves of the OffsetTable plugin
+
+The plugin reads a synthetic var file. Its saves go through the stub
+linuxcnc.command, which records the MDI commands. The commands are applied
+to a copy of the var file parameters, the way LinuxCNC would, to check
+they set the edited offsets.
+"""
+
+import re
+import time
+import random
+
+import pytest
+
+from qtpyvcp.plugins import offset_table
+
+COLUMNS = 'XYZABCUVWR'
+
+# (name, [(row, column), ...] of the cells edited, rows sent)
+CASES = [
+    ('unchanged', [], 0),
+    ('one cell', [(0, 'X')], 1),
+    ('one row', [(1, 'X'), (1, 'Y'), (1, 'Z')], 1),
+    ('three rows', [(0, 'Z'), (2, 'X'), (8, 'A')], 3),
+    ('whole row', [(3, c) for c in COLUMNS], 1),
+    ('everything', [(row, c) for row in range(9) for c in COLUMNS], 9),
+]
+
+
+def synthetic_var_file(path, extra=500, seed=1):
+    """Write a var file with all offsets set, and return its parameters."""
+    rand = random.Random(seed)
+    params = {}
+    for param in range(31, 31 + extra):
+        params[param] = round(rand.uniform(-100, 100), 6)
+    for param in list(range(5161, 5170)) + list(range(5181, 5190)) + list(range(5210, 5221)):
+        params[param] = 0.0
+    params[5220] = 1.0
+    for param in range(5221, 5391):
+        params[param] = round(rand.uniform(-100, 100), 6)
+
+    with open(path, 'w') as fh:
+        for param in sorted(params):
+            fh.write('{}\t{:.6f}\n'.format(param, params[param]))
+    return params
+
+
+def offsets(params):
+    """Return the G5x offset table held by var file parameters."""
+    return {row: [params[5221 + 20 * row + col] for col in range(10)]
+            for row in range(9)}
+
+
+def apply_g10(params, commands):
+    """Apply G10 L2 commands to var file parameters, like LinuxCNC."""
+    params = params.copy()
+    for cmd in commands:
+        row = int(re.search(r'P(\d+)', cmd).group(1)) - 1
+        for char, value in re.findall(r'([XYZABCUVWR])([-+0-9.e]+)', cmd.split('P', 1)[1]):
+            params[5221 + 20 * row + COLUMNS.index(char)] = round(float(value), 6)
+    return params
+
+
+@pytest.fixture
+def var_file(tmp_path):
+    path = str(tmp_path / 'sim.var')
+    return path, synthetic_var_file(path)
+
+
+@pytest.fixture
+def plugin(status, var_file, monkeypatch):
+    plugin = offset_table.OffsetTable()
+    plugin.parameter_file = var_file[0]
+    plugin.loadOffsetTable()
+
+    plugin.issued = []
+    issue_mdi = offset_table.issue_mdi
+
+    def counting_issue_mdi(command, reset=True):
+        plugin.issued.append(command)
+        issue_mdi(command, reset)
+
+    monkeypatch.setattr(offset_table, 'issue_mdi', counting_issue_mdi)
+    return plugin
+
+
+def edited(table, cells):
+    table = {row: list(offsets) for row, offsets in table.items()}
+    for row, char in cells:
+        table[row][COLUMNS.index(char)] += 1.25
+    return table
+
+
+def test_read(plugin, var_file, record_property):
+    path, params = var_file
+    assert offset_table.readVarFile(path) == offsets(params)
+    assert plugin.getOffsetTable() == offsets(params)
+
+    start = time.perf_counter()
+    for i in range(100):
+        offset_table.readVarFile(path)
+    record_property('read_us', round((time.perf_counter() - start) * 1e4, 1))
+
+
+def test_reload_unchanged_file(plugin, var_file):
+    assert not plugin.readVarFileIfChanged()
+
+    path, params = var_file
+    params[5221] += 1
+    with open(path, 'a') as fh:
+        fh.write('5221\t{:.6f}\n'.format(params[5221]))
+
+    assert plugin.readVarFileIfChanged()
+    assert plugin.file_offsets == offsets(params)
+
+
+@pytest.mark.parametrize('name, cells, rows', CASES, ids=[c[0] for c in CASES])
+def test_save(plugin, var_file, mdi_log, name, cells, rows):
+    params = var_file[1]
+    table = edited(plugin.getOffsetTable(), cells)
+
+    plugin.saveOffsetTable(table, list(COLUMNS))
+
+    assert len(plugin.issued) == (1 if rows else 0)
+    assert len(mdi_log) == rows
+    assert offsets(apply_g10(params, mdi_log)) == \
+        {row: [round(v, 6) for v in values] for row, values in table.items()}
+    assert plugin.offsetCommands(table, COLUMNS) == []
+
+
+def test_save_sends_edited_rows_in_full(plugin, var_file, mdi_log):
+    params = var_file[1]
+    # a G10 L20 touch off changes X and Y of G54 without the var file
+    # being rewritten
+    linuxcnc = dict(params)
+    linuxcnc.update({5221: 1.0, 5222: 2.0})
+
+    # the user edits Z, X and Y are sent too
+    table = edited(plugin.getOffsetTable(), [(0, 'Z')])
+    plugin.saveOffsetTable(table, list(COLUMNS))
+    assert offsets(apply_g10(linuxcnc, mdi_log)) == offsets(apply_g10(params, mdi_log))
+
+    # the user types the old X back in, the row is sent though unchanged
+    del mdi_log[:]
+    linuxcnc = dict(params)
+    linuxcnc[5221] = 1.0
+    plugin.saveOffsetTable(table, list(COLUMNS), rows={0})
+    assert len(mdi_log) == 1
+    assert offsets(apply_g10(linuxcnc, mdi_log))[0] == \
+        [round(v, 6) for v in table[0]]
@@ -0,0 +1,166 @@
+"""Paint and scroll cost of the ToolTable widget with 1000 tools
+
+The times are recorded as test properties, see `pytest --junitxml`. The
+tests assert on what the times depend on: how often the model is asked
+for data, that it never sorts the tool table to answer, and that edits
+and spindle changes update only the rows they touch.
+"""
+
+import time
+import random
+
+import pytest
+
+from qtpy.QtCore import Qt, Signal
+
+from qtpyvcp.plugins import registerPlugin, Plugin
+from qtpyvcp.widgets.input_widgets import tool_table
+
+TOOLS = 1000
+
+COLUMNS = 'TPXYZABCUVWDIJQR'
+
+
+def synthetic_tool_table(tools, seed=1):
+    """Return a tool table dict of `tools` tools, plus the T0 entry."""
+    rand = random.Random(seed)
+    table = {0: dict({c: 0.0 for c in 'XYZABCUVWDIJ'},
+                     T=0, P=0, Q=1, R='No Tool Loaded')}
+    for tnum in range(1, tools + 1):
+        tool = {c: 0.0 for c in 'XYZABCUVWDIJ'}
+        tool.update(T=tnum, P=tnum, Q=1, R='Tool {}'.format(tnum),
+                    Z=round(rand.uniform(-5, 5), 4),
+                    D=round(rand.uniform(0.1, 1), 4))
+        table[tnum] = tool
+    return table
+
+
+class StubToolTable(Plugin):
+    tool_table_changed = Signal(dict)
+
+    columns = COLUMNS
+    COLUMN_LABELS = {c: c for c in COLUMNS}
+
+    def __init__(self, tools):
+        super(StubToolTable, self).__init__()
+        self.table = synthetic_tool_table(tools)
+
+    def getToolTable(self):
+        return self.table.copy()
+
+    def newTool(self, tnum):
+        return dict(self.table[0], T=tnum, P=tnum, R='')
+
+
+def counted(func):
+    """Wrap func, counting its calls in the wrapper's `calls`."""
+    def wrapper(*args, **kwargs):
+        wrapper.calls += 1
+        return func(*args, **kwargs)
+
+    wrapper.calls = 0
+    return wrapper
+
+
+@pytest.fixture
+def view(qtbot, status, monkeypatch):
+    registerPlugin('tooltable', StubToolTable(TOOLS))
+
+    view = tool_table.ToolTable()
+    qtbot.addWidget(view)
+    view.resize(1200, 800)
+    view.show()
+    qtbot.waitExposed(view)
+
+    view.data_calls = counted(tool_table.ToolModel.data)
+    monkeypatch.setattr(tool_table.ToolModel, 'data', view.data_calls)
+    view.sorts = counted(sorted)
+    monkeypatch.setattr(tool_table, 'sorted', view.sorts, raising=False)
+    return view
+
+
+def timed(view, func, count):
+    """Return the mean seconds and data() calls of func(i) for i < count."""
+    view.data_calls.calls = 0
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter() - start) / count, view.data_calls.calls // count
+
+
+def visible_cells(view):
+    rows = view.rowAt(view.viewport().height() - 1) - view.rowAt(0) + 1
+    return rows * len(COLUMNS)
+
+
+def test_paint(view, record_property):
+    viewport = view.viewport()
+    seconds, calls = timed(view, lambda i: viewport.repaint(), 20)
+    record_property('paint_ms', round(seconds * 1e3, 2))
+
+    # a few roles per visible cell, whatever the size of the table
+    assert 0 < calls < 10 * visible_cells(view)
+    assert view.sorts.calls == 0
+
+
+def test_scroll(view, record_property):
+    viewport = view.viewport()
+    scrollbar = view.verticalScrollBar()
+    assert scrollbar.maximum() > 0
+
+    def scroll(i):
+        scrollbar.setValue(i)
+        viewport.repaint()
+
+    seconds, calls = timed(view, scroll, scrollbar.maximum() + 1)
+    record_property('scroll_ms', round(seconds * 1e3, 2))
+
+    assert 0 < calls < 10 * visible_cells(view)
+    assert view.sorts.calls == 0
+
+    last = view.proxy_model.index(view.proxy_model.rowCount() - 1, COLUMNS.index('T'))
+    assert view.proxy_model.data(last) == TOOLS
+
+
+def test_edit_updates_one_cell(view, qtbot):
+    model = view.tool_model
+    changed = []
+    model.dataChanged.connect(lambda first, last, roles: changed.append(
+        (first.row(), last.row(), first.column(), last.column())))
+
+    index = view.proxy_model.index(5, COLUMNS.index('Z'))
+    with qtbot.assertNotEmitted(model.modelReset):
+        view.proxy_model.setData(index, 1.5, Qt.EditRole)
+
+    column = COLUMNS.index('Z')
+    assert changed == [(5, 5, column, column)]
+    assert model.toolDataFromRow(5)['Z'] == 1.5
+    assert view.sorts.calls == 0
+
+
+def test_spindle_change_updates_two_rows(view, status, qtbot, record_property):
+    model = view.tool_model
+    changed = []
+    model.dataChanged.connect(lambda first, last, roles: changed.append(
+        (first.row(), last.row())))
+
+    viewport = view.viewport()
+    paint_seconds, paint_calls = timed(view, lambda i: viewport.repaint(), 5)
+
+    def spindle(i):
+        status.stat.tool_in_spindle = i % 20 + 1
+        status.tool_in_spindle.setValue(i % 20 + 1)
+        viewport.repaint()
+
+    with qtbot.assertNotEmitted(model.modelReset):
+        seconds, calls = timed(view, spindle, 20)
+    record_property('spindle_ms', round(seconds * 1e3, 2))
+
+    # T0 -> T1: row 0, then T1 -> T2: rows 0 and 1 ...
+    assert changed[0] == (0, 0)
+    assert sorted(changed[1:3]) == [(0, 0), (1, 1)]
+    assert len(changed) == 1 + 2 * 19
+    assert all(first == last for first, last in changed)
+    # no more than a repaint costs, a model reset re-reads every row
+    assert calls <= paint_calls * 1.1
+    assert view.sorts.calls == 0
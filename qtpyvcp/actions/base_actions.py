@@ -2,6 +2,7 @@ import linuxcnc
 from qtpyvcp.utilities import logger
 from qtpyvcp.utilities.info import Info
 from qtpyvcp.plugins import getPlugin
+from qtpyvcp.lib.action_state import ActionState
 
 STATUS = getPlugin('status')
 STAT = STATUS.stat
@@ -9,6 +10,9 @@ STAT = STATUS.stat
 INFO = Info()
 CMD = linuxcnc.command()
 
+# shared enable-state engine used by the action bindOk handlers
+ACTION_STATE = ActionState()
+
 
 # Set up logging
 LOG = logger.getLogger(__name__)
@@ -8,7 +8,7 @@ from qtpyvcp.utilities import logger
 from abc import abstractstaticmethod
 LOG = logger.getLogger(__name__)
 
-from qtpyvcp.actions.base_actions import setTaskMode
+from qtpyvcp.actions.base_actions import setTaskMode, ACTION_STATE
 from qtpyvcp.plugins import getPlugin
 
 STATUS = getPlugin('status')
@@ -148,9 +148,8 @@ def _power_ok(widget=None):
     return ok
 
 def _power_bindOk(widget):
-    _power_ok(widget)
+    ACTION_STATE.bind(widget, _power_ok, (STATUS.estop,))
     widget.setChecked(STAT.task_state == linuxcnc.STATE_ON)
-    STATUS.estop.onValueChanged(lambda: _power_ok(widget))
     STATUS.on.notify(lambda v: widget.setChecked(v))
 
 power.on.ok = power.off.ok = power.toggle.ok = _power_ok
@@ -232,10 +231,9 @@ def _issue_mdi_ok(mdi_cmd='', widget=None):
     return ok
 
 def _issue_mdi_bindOk(mdi_cmd='', widget=None):
-    _issue_mdi_ok(mdi_cmd=mdi_cmd, widget=widget)
-    STATUS.task_state.onValueChanged(lambda: _issue_mdi_ok(mdi_cmd=mdi_cmd, widget=widget))
-    STATUS.interp_state.onValueChanged(lambda: _issue_mdi_ok(mdi_cmd=mdi_cmd, widget=widget))
-    STATUS.homed.onValueChanged(lambda: _issue_mdi_ok(mdi_cmd=mdi_cmd, widget=widget))
+    # the result does not depend on the command, so all MDI widgets share it
+    ACTION_STATE.bind(widget, _issue_mdi_ok,
+                      (STATUS.task_state, STATUS.interp_state, STATUS.homed))
 
 issue_mdi.ok = _issue_mdi_ok
 issue_mdi.bindOk = _issue_mdi_bindOk
@@ -355,8 +353,8 @@ def _feed_override_enable_ok(widget=None):
     return ok
 
 def _feed_override_enable_bindOk(widget):
-    STATUS.task_state.onValueChanged(lambda: _feed_override_enable_ok(widget))
-    STATUS.interp_state.onValueChanged(lambda: _feed_override_enable_ok(widget))
+    ACTION_STATE.bind(widget, _feed_override_enable_ok,
+                      (STATUS.task_state, STATUS.interp_state))
     STATUS.feed_override_enabled.onValueChanged(widget.setChecked)
 
 def _feed_override_ok(value=100, widget=None):
@@ -385,8 +383,8 @@ def _feed_override_ok(value=100, widget=None):
 def _feed_override_bindOk(value=100, widget=None):
 
     # This will work for any widget
-    STATUS.task_state.onValueChanged(lambda: _feed_override_ok(widget=widget))
-    STATUS.feed_override_enabled.onValueChanged(lambda: _feed_override_ok(widget=widget))
+    ACTION_STATE.bind(widget, _feed_override_ok,
+                      (STATUS.task_state, STATUS.feed_override_enabled))
 
     try:
         # these will only work for QSlider or QSpinBox
@@ -449,7 +447,7 @@ def _rapid_override_ok(value=100, widget=None):
 def _rapid_override_bindOk(value=100, widget=None):
 
     # This will work for any widget
-    STATUS.task_state.onValueChanged(lambda: _rapid_override_ok(widget=widget))
+    ACTION_STATE.bind(widget, _rapid_override_ok, (STATUS.task_state,))
 
     try:
         # these will only work for QSlider or QSpinBox
@@ -512,7 +510,7 @@ def _max_velocity_ok(value=100, widget=None):
 def _max_velocity_bindOk(value=100, widget=None):
 
     # This will work for any widget
-    STATUS.task_state.onValueChanged(lambda: _max_velocity_ok(widget=widget))
+    ACTION_STATE.bind(widget, _max_velocity_ok, (STATUS.task_state,))
 
     try:
         # these will only work for QSlider or QSpinBox
@@ -598,27 +596,24 @@ def _mode_ok(widget=None):
     return ok
 
 def _manual_bindOk(widget):
+    ACTION_STATE.bind(widget, _mode_ok, (STATUS.task_state, STATUS.interp_state))
     widget.setChecked(STAT.task_mode == linuxcnc.MODE_MANUAL)
-    STATUS.task_state.onValueChanged(lambda: _mode_ok(widget))
-    STATUS.interp_state.onValueChanged(lambda: _mode_ok(widget))
     STATUS.task_mode.onValueChanged(lambda m: widget.setChecked(m == linuxcnc.MODE_MANUAL))
 
 mode.manual.ok = _mode_ok
 mode.manual.bindOk = _manual_bindOk
 
 def _auto_bindOk(widget):
+    ACTION_STATE.bind(widget, _mode_ok, (STATUS.task_state, STATUS.interp_state))
     widget.setChecked(STAT.task_mode == linuxcnc.MODE_AUTO)
-    STATUS.task_state.onValueChanged(lambda: _mode_ok(widget))
-    STATUS.interp_state.onValueChanged(lambda: _mode_ok(widget))
     STATUS.task_mode.onValueChanged(lambda m: widget.setChecked(m == linuxcnc.MODE_AUTO))
 
 mode.auto.ok = _mode_ok
 mode.auto.bindOk = _auto_bindOk
 
 def _mdi_bindOk(widget):
+    ACTION_STATE.bind(widget, _mode_ok, (STATUS.task_state, STATUS.interp_state))
     widget.setChecked(STAT.task_mode == linuxcnc.MODE_MDI)
-    STATUS.task_state.onValueChanged(lambda: _mode_ok(widget))
-    STATUS.interp_state.onValueChanged(lambda: _mode_ok(widget))
     STATUS.task_mode.onValueChanged(lambda m: widget.setChecked(m == linuxcnc.MODE_MDI))
 
 mode.mdi.ok = _mode_ok
@@ -692,15 +687,13 @@ def _home_ok(jnum=-1, widget=None):
     return ok
 
 def _home_all_bindOk(widget):
-    STATUS.on.notify(lambda: _home_ok(widget=widget))
-    STATUS.homed.notify(lambda: _home_ok(widget=widget))
+    ACTION_STATE.bind(widget, _home_ok, (STATUS.on, STATUS.homed))
 
 home.all.ok = _home_ok
 home.all.bindOk = _home_all_bindOk
 
 def _home_joint_bindOk(jnum, widget):
-    STATUS.on.notify(lambda: _home_ok(jnum, widget=widget))
-    STATUS.homed.notify(lambda: _home_ok(jnum, widget=widget))
+    ACTION_STATE.bind(widget, _home_ok, (STATUS.on, STATUS.homed), jnum)
 
 home.joint.ok = _home_ok
 home.joint.bindOk = _home_joint_bindOk
@@ -715,7 +708,7 @@ def _home_axis_bindOk(axis, widget):
         return
 
     jnum = INFO.AXIS_LETTER_LIST.index(axis)
-    STATUS.on.notify(lambda: _home_ok(jnum, widget=widget))
+    ACTION_STATE.bind(widget, _home_ok, (STATUS.on,), jnum)
 
 home.axis.ok = _home_ok
 home.axis.bindOk = _home_axis_bindOk
@@ -839,7 +832,7 @@ def _override_limits_ok(widget=None):
     return ok
 
 def _override_limits_bindOk(widget):
-    STATUS.limit.onValueChanged(lambda: _override_limits_ok(widget))
+    ACTION_STATE.bind(widget, _override_limits_ok, (STATUS.limit,))
 
 override_limits.ok = _override_limits_ok
 override_limits.bindOk = _override_limits_bindOk
@@ -1149,10 +1142,9 @@ def _jog_axis_bindOk(axis, direction, widget):
         widget.setStatusTip(msg)
         return
 
-    STATUS.limit.onValueChanged(lambda: _jog_axis_ok(aletter, direction, widget))
-    STATUS.homed.onValueChanged(lambda: _jog_axis_ok(aletter, direction, widget))
-    STATUS.task_state.onValueChanged(lambda: _jog_axis_ok(aletter, direction, widget))
-    STATUS.interp_state.onValueChanged(lambda: _jog_axis_ok(aletter, direction, widget))
+    ACTION_STATE.bind(widget, _jog_axis_ok,
+                      (STATUS.limit, STATUS.homed, STATUS.task_state, STATUS.interp_state),
+                      aletter)
 
 jog.axis.ok = _jog_axis_ok
 jog.axis.bindOk = _jog_axis_bindOk
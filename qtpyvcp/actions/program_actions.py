@@ -14,7 +14,7 @@ STAT = STATUS.stat
 INFO = Info()
 CMD = linuxcnc.command()
 
-from qtpyvcp.actions.base_actions import setTaskMode
+from qtpyvcp.actions.base_actions import setTaskMode, ACTION_STATE
 
 
 #==============================================================================
@@ -140,11 +140,9 @@ def _run_ok(widget=None):
     return ok
 
 def _run_bindOk(widget):
-    STATUS.estop.onValueChanged(lambda: _run_ok(widget))
-    STATUS.enabled.onValueChanged(lambda: _run_ok(widget))
-    STATUS.all_axes_homed.onValueChanged(lambda: _run_ok(widget))
-    STATUS.interp_state.onValueChanged(lambda: _run_ok(widget))
-    STATUS.file.onValueChanged(lambda: _run_ok(widget))
+    ACTION_STATE.bind(widget, _run_ok,
+                      (STATUS.estop, STATUS.enabled, STATUS.all_axes_homed,
+                       STATUS.interp_state, STATUS.file))
 
 run.ok = _run_ok
 run.bindOk = _run_bindOk
@@ -227,8 +225,7 @@ def _pause_ok(widget=None):
     return ok
 
 def _pause_bindOk(widget):
-    STATUS.state.onValueChanged(lambda: _pause_ok(widget))
-    STATUS.paused.onValueChanged(lambda: _pause_ok(widget))
+    ACTION_STATE.bind(widget, _pause_ok, (STATUS.state, STATUS.paused))
 
 pause.ok = _pause_ok
 pause.bindOk = _pause_bindOk
@@ -247,7 +244,7 @@ def resume():
     LOG.debug("Resuming program execution")
     CMD.auto(linuxcnc.AUTO_RESUME)
 
-def _resume_ok(widget):
+def _resume_ok(widget=None):
     """Checks if it is OK to resume a paused program.
 
     Args:
@@ -275,8 +272,7 @@ def _resume_ok(widget):
     return ok
 
 def _resume_bindOk(widget):
-    STATUS.paused.onValueChanged(lambda: _resume_ok(widget))
-    STATUS.state.onValueChanged(lambda: _resume_ok(widget))
+    ACTION_STATE.bind(widget, _resume_ok, (STATUS.paused, STATUS.state))
 
 resume.ok = _resume_ok
 resume.bindOk = _resume_bindOk
@@ -324,7 +320,7 @@ def _abort_ok(widget=None):
     return ok
 
 def _abort_bindOk(widget):
-    STATUS.state.onValueChanged(lambda: _abort_ok(widget))
+    ACTION_STATE.bind(widget, _abort_ok, (STATUS.state,))
 
 abort.ok = _abort_ok
 abort.bindOk = _abort_bindOk
@@ -404,7 +400,7 @@ def _block_delete_ok(widget=None):
 
 def _block_delete_bindOk(widget):
     widget.setChecked(STAT.block_delete)
-    STATUS.task_state.onValueChanged(lambda: _block_delete_ok(widget))
+    ACTION_STATE.bind(widget, _block_delete_ok, (STATUS.task_state,))
     STATUS.block_delete.onValueChanged(lambda s: widget.setChecked(s))
 
 block_delete.on.ok = block_delete.off.ok = block_delete.toggle.ok = _block_delete_ok
@@ -485,7 +481,7 @@ def _optional_stop_ok(widget=None):
 
 def _optional_stop_bindOk(widget):
     widget.setChecked(STAT.block_delete)
-    STATUS.task_state.onValueChanged(lambda: _optional_stop_ok(widget))
+    ACTION_STATE.bind(widget, _optional_stop_ok, (STATUS.task_state,))
     STATUS.optional_stop.onValueChanged(lambda s: widget.setChecked(s))
 
 optional_stop.on.ok = optional_stop.off.ok = optional_stop.toggle.ok = _optional_stop_ok
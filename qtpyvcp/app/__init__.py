@@ -37,6 +37,8 @@ Application Options:
   --qt-api (pyqt5 | pyqt | pyside2 | pyside)
                        Specify the Qt Python binding to use.
   --perfmon            Monitor and log system performance.
+  --eager-plugins      Load all data plugins at startup, rather than
+                       deferring them until they are first used.
   --develop            Development mode. Enables live reloading of QSS styles.
   --command_line_args <args>...
                        Additional args passed to the QtApplication.
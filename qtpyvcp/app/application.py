@@ -17,7 +17,7 @@ import qtpyvcp
 
 from qtpyvcp.utilities.logger import initBaseLogger
 from qtpyvcp.plugins import initialisePlugins, terminatePlugins, getPlugin
-from qtpyvcp.widgets.base_widgets.base_widget import VCPPrimitiveWidget
+from qtpyvcp.widgets.base_widgets.base_widget import iterVCPWidgets
 from qtpyvcp.widgets.form_widgets.main_window import VCPMainWindow
 
 # initialize logging. If a base logger was already initialized in a startup
@@ -44,6 +44,9 @@ class VCPApplication(QApplication):
 
         self.status = getPlugin('status')
 
+        # widget name: widget, filled in as widgets are looked up
+        self._widget_index = {}
+
         # initialize plugins
         initialisePlugins()
 
@@ -221,9 +224,18 @@ class VCPApplication(QApplication):
 
         Returns: QWidget
         """
+        try:
+            return self._widget_index[name]
+        except KeyError:
+            pass
+
         for win_name, obj in list(qtpyvcp.WINDOWS.items()):
             if hasattr(obj, name):
-                return getattr(obj, name)
+                widget = getattr(obj, name)
+                self._widget_index[name] = widget
+                if hasattr(widget, 'destroyed'):
+                    widget.destroyed.connect(lambda *args: self._widget_index.pop(name, None))
+                return widget
 
         raise AttributeError("Could not find widget with name: %s" % name)
 
@@ -246,15 +258,15 @@ class VCPApplication(QApplication):
         terminatePlugins()
 
     def initialiseWidgets(self):
-        for w in self.allWidgets():
-            if isinstance(w, VCPPrimitiveWidget):
-                w.initialize()
+        # in creation order, so parents are initialized before their children
+        for w in iterVCPWidgets():
+            w.initialize()
 
     def terminateWidgets(self):
         LOG.debug("Terminating widgets")
-        for w in self.allWidgets():
-            if isinstance(w, VCPPrimitiveWidget):
-                try:
-                    w.terminate()
-                except Exception:
-                    LOG.exception('Error terminating %s widget', w)
+        # in reverse creation order, so children are terminated first
+        for w in reversed(iterVCPWidgets()):
+            try:
+                w.terminate()
+            except Exception:
+                LOG.exception('Error terminating %s widget', w)
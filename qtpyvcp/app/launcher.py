@@ -10,7 +10,7 @@ from qtpy.QtWidgets import QApplication
 import qtpyvcp
 from qtpyvcp import hal
 from qtpyvcp.utilities.logger import getLogger
-from qtpyvcp.plugins import registerPluginFromClass, postGuiInitialisePlugins
+from qtpyvcp.plugins import registerPluginFromClass, postGuiInitialisePlugins, deferredPlugins
 from qtpyvcp.widgets.dialogs.error_dialog import ErrorDialog, IGNORE_LIST
 
 from qtpyvcp.utilities.info import Info
@@ -63,8 +63,8 @@ def launch_application(opts, config):
     hal_comp = hal.component('qtpyvcp')
 
     LOG.debug('Loading data plugings')
-    loadPlugins(config['data_plugins'])
-    log_time('done loading data plugins')
+    loadPlugins(config['data_plugins'], eager=opts.get('eager_plugins', False))
+    log_time('done loading data plugins, deferred: {}'.format(', '.join(deferredPlugins()) or 'none'))
 
     LOG.debug('Initializing app')
     app = _initialize_object_from_dict(config['application'])
@@ -80,7 +80,7 @@ def launch_application(opts, config):
 
     LOG.debug('Initializing widgets')
     app.initialiseWidgets()
-    log_time('done initializing widgets')
+    log_time('done initializing widgets, still deferred: {}'.format(', '.join(deferredPlugins()) or 'none'))
 
     hal_comp.ready()
 
@@ -208,7 +208,12 @@ def _initialize_object_from_dict(object_dict, parent=None):
     return obj(*args, **kwargs)
 
 
-def loadPlugins(plugins):
+def loadPlugins(plugins, eager=False):
+    """Register the data plugins defined in the YAML config.
+
+    Plugins are deferred until first use unless ``eager`` is True or the
+    plugin's config sets ``eager: True``.
+    """
     for plugin_id, plugin_dict in list(plugins.items()):
 
         try:
@@ -219,7 +224,9 @@ def loadPlugins(plugins):
         args = plugin_dict.get('args', [])
         kwargs = plugin_dict.get('kwargs', {})
 
-        registerPluginFromClass(plugin_id=plugin_id, plugin_cls=cls, args=args, kwargs=kwargs)
+        lazy = not (eager or plugin_dict.get('eager', False))
+
+        registerPluginFromClass(plugin_id=plugin_id, plugin_cls=cls, args=args, kwargs=kwargs, lazy=lazy)
 
 
 def loadWindows(windows):
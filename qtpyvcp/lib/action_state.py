@@ -0,0 +1,123 @@
+"""
+Action State
+------------
+
+Central evaluator for action ``ok`` predicates.
+
+Rather than every bound widget connecting its own lambdas to the STATUS
+channels its action depends on, ``bindOk`` handlers register the widget
+here. Each distinct predicate (the ``ok`` function plus its arguments) is
+evaluated once per status update, no matter how many widgets share it or
+how many of its channels changed in the same poll, and the result is
+cached. Widgets are only updated when the cached ``(ok, msg)`` flips.
+"""
+
+from qtpy.QtCore import QTimer
+
+from qtpyvcp.utilities import logger
+LOG = logger.getLogger(__name__)
+
+
+class ActionState(object):
+    """Action enable-state engine.
+
+    Args:
+        deferred (bool) : If True (the default) predicates invalidated by a
+            channel change are re-evaluated from the event loop, so that all
+            the channels changed by a single status poll are handled in one
+            pass. If False :meth:`update` must be called explicitly.
+
+    Attributes:
+        evaluations (int) : Total number of predicate evaluations.
+        updates (int) : Total number of widget enable/tooltip updates.
+    """
+
+    def __init__(self, deferred=True):
+        self._deferred = deferred
+        self._predicates = {}   # key -> (ok_func, args, kwargs)
+        self._states = {}       # key -> (ok, msg)
+        self._widgets = {}      # key -> [widget, ...]
+        self._dependants = {}   # channel -> set of keys
+        self._dirty = set()
+        self._scheduled = False
+
+        self.evaluations = 0
+        self.updates = 0
+
+    def bind(self, widget, ok_func, channels, *args, **kwargs):
+        """Keep a widget's enabled state and tooltips in sync with an action.
+
+        Args:
+            widget (QWidget) : The widget to enable/disable.
+            ok_func (function) : The action's ``ok`` function. It is called
+                as ``ok_func(*args, **kwargs)`` and must set ``ok_func.msg``.
+            channels (list) : The STATUS DataChannels the result depends on.
+        """
+        key = (ok_func, args, tuple(sorted(kwargs.items())))
+        if key not in self._predicates:
+            self._predicates[key] = (ok_func, args, kwargs)
+            self._widgets[key] = []
+            self._states[key] = self._evaluate(key)
+
+        for channel in channels:
+            keys = self._dependants.get(channel)
+            if keys is None:
+                keys = self._dependants[channel] = set()
+                channel.notify(lambda *a, k=keys: self._invalidate(k))
+            keys.add(key)
+
+        self._widgets[key].append(widget)
+        self._apply(widget, *self._states[key])
+
+    def state(self, ok_func, *args, **kwargs):
+        """Returns the cached ``(ok, msg)`` of a bound predicate, or None."""
+        return self._states.get((ok_func, args, tuple(sorted(kwargs.items()))))
+
+    def update(self):
+        """Re-evaluate invalidated predicates and update flipped widgets.
+
+        Returns:
+            int : The number of predicates whose state changed.
+        """
+        self._scheduled = False
+        dirty, self._dirty = self._dirty, set()
+
+        changed = 0
+        for key in dirty:
+            state = self._evaluate(key)
+            if state == self._states[key]:
+                continue
+
+            self._states[key] = state
+            changed += 1
+
+            widgets = self._widgets[key]
+            for widget in widgets[:]:
+                if not self._apply(widget, *state):
+                    widgets.remove(widget)
+
+        return changed
+
+    def _invalidate(self, keys):
+        self._dirty.update(keys)
+        if self._deferred and not self._scheduled:
+            self._scheduled = True
+            QTimer.singleShot(0, self.update)
+
+    def _evaluate(self, key):
+        ok_func, args, kwargs = self._predicates[key]
+        self.evaluations += 1
+        ok = bool(ok_func(*args, **kwargs))
+        return ok, getattr(ok_func, 'msg', '') or ''
+
+    def _apply(self, widget, ok, msg):
+        self.updates += 1
+        try:
+            widget.setEnabled(ok)
+            widget.setStatusTip(msg)
+            widget.setToolTip(msg)
+        except RuntimeError:
+            # underlying C++ object has been deleted
+            LOG.debug("Dropping deleted widget from action state")
+            return False
+        return True
@@ -1,10 +1,87 @@
 # coding=utf-8
 
-from sqlalchemy import create_engine
+"""Tool database engine and session.
+
+The engine is created the first time it is needed rather than at import,
+by default for ``db.sqlite`` in the config dir. Set the ``QTPYVCP_TOOL_DB``
+environment variable to use a different database file, or call
+:func:`configureEngine` before the first session is made.
+"""
+
+import os
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-engine = create_engine('sqlite:///db.sqlite', echo=False)
-Session = sessionmaker(bind=engine)
+from qtpyvcp.utilities.misc import normalizePath
 
 Base = declarative_base()
+
+_engine = None
+
+
+def getDatabaseFile():
+    """Path of the tool database file used if none is configured."""
+    return normalizePath(path=os.getenv('QTPYVCP_TOOL_DB', 'db.sqlite'),
+                         base=os.getenv('CONFIG_DIR', os.getcwd()))
+
+
+def configureEngine(url=None, **kwargs):
+    """Create the tool database engine and bind new sessions to it.
+
+    Args:
+        url (str) : SQLAlchemy database URL. Defaults to the file
+            given by :func:`getDatabaseFile`.
+        kwargs : Passed on to ``create_engine``.
+
+    Returns:
+        The new engine.
+    """
+    global _engine
+
+    if url is None:
+        url = 'sqlite:///' + getDatabaseFile()
+
+    engine = create_engine(url, echo=False, **kwargs)
+
+    if engine.url.get_backend_name() == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+        event.listen(engine, 'connect', _enableWAL)
+
+    _engine = engine
+    Session.configure(bind=engine)
+    return engine
+
+
+def getEngine():
+    """Get the tool database engine, creating it on first use."""
+    if _engine is None:
+        configureEngine()
+    return _engine
+
+
+def _enableWAL(dbapi_connection, connection_record):
+    # readers don't block the writer and vice versa, so the GUI and the
+    # tool database backend can share the file
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+class _Sessionmaker(sessionmaker):
+    # binds to the default engine when the first session is made
+    def __call__(self, **local_kw):
+        if self.kw.get('bind') is None and 'bind' not in local_kw:
+            getEngine()
+        return super(_Sessionmaker, self).__call__(**local_kw)
+
+
+Session = _Sessionmaker()
+
+
+def __getattr__(name):
+    # `from qtpyvcp.lib.db_tool.base import engine` still works
+    if name == 'engine':
+        return getEngine()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
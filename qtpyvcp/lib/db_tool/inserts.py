@@ -3,7 +3,7 @@
 from datetime import date
 
 from qtpyvcp.lib.db_tool.tool_table import ToolTable, Tool
-from qtpyvcp.lib.db_tool.base import Session, engine, Base
+from qtpyvcp.lib.db_tool.base import Session, getEngine, Base
 
 from qtpyvcp.plugins import getPlugin
 #
@@ -12,7 +12,7 @@ from qtpyvcp.plugins import getPlugin
 # print(tooltable_plugin.getToolTable())
 
 
-Base.metadata.create_all(engine)
+Base.metadata.create_all(getEngine())
 
 session = Session()
 
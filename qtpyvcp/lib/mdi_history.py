@@ -0,0 +1,327 @@
+"""
+MDI History
+-----------
+
+Append-only store for the MDI command history.
+
+The history file keeps the AXIS format, one command per line with the
+oldest first, so it can still be shared with AXIS. Each new command is
+appended to the end of the file instead of rewriting it. A command that
+is issued again moves to the front of the history, the file then holds
+an older copy of it that is ignored when loading.
+
+Commands are kept in an insertion ordered dict, so checking for and moving
+duplicates does not scan the history. When the file holds many more
+lines than there are commands, or on save after entries have been
+removed or reordered, it is compacted by writing the history to a
+temporary file which replaces the old one.
+
+Searches run over a single newline joined, case folded copy of the
+history, so a prefix or substring search of 100k commands takes a few
+milliseconds. New commands are added to the end of it, the copies of
+repeated or removed commands are skipped until it is rebuilt.
+"""
+
+import os
+import shutil
+import tempfile
+import itertools
+
+from bisect import bisect_right
+
+from qtpyvcp.utilities import logger
+LOG = logger.getLogger(__name__)
+
+# compact once the file has this many more lines than there are commands
+COMPACT_SLACK = 1000
+
+
+class MDIHistoryStore(object):
+    """MDI command history backed by an append-only file.
+
+    Args:
+        fname (str) : Path of the history file, or None to only keep the
+            history in memory.
+        max_entries (int) : Maximum number of commands to keep, the
+            oldest are dropped.
+
+    Attributes:
+        file_lines (int) : Number of lines in the history file.
+        compactions (int) : Number of times the file has been rewritten.
+    """
+
+    def __init__(self, fname=None, max_entries=10000):
+        self.fname = fname
+        self.max_entries = max_entries
+
+        self.file_lines = 0
+        self.compactions = 0
+
+        self._entries = {}  # cmd -> None, oldest first
+        self._needs_compact = False
+
+        # search index, built by buildIndex or on the first search
+        self._text = None
+        self._offsets = None
+        self._cmds = None
+        self._positions = None  # cmd -> index in _cmds
+        self._stale = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, cmd):
+        return cmd in self._entries
+
+    def load(self):
+        """Load the history from the file, compacting it if needed."""
+        lines = []
+        if self.fname and os.path.isfile(self.fname):
+            with open(self.fname, 'r') as fh:
+                lines = fh.read().splitlines()
+
+        cmds = list(map(str.strip, lines))
+        entries = dict.fromkeys(cmds)
+        if len(entries) < len(cmds):
+            # the last copy of a repeated command is the one that counts
+            entries = dict.fromkeys(reversed(list(dict.fromkeys(reversed(cmds)))))
+        entries.pop('', None)
+
+        if len(entries) > self.max_entries:
+            entries = dict.fromkeys(itertools.islice(
+                entries, len(entries) - self.max_entries, None))
+
+        self._entries = entries
+        self.file_lines = len(lines)
+        self._needs_compact = False
+        self._changed()
+        self._compactIfNeeded()
+
+    def save(self):
+        """Write out any removals or reordering not in the file yet."""
+        if self._needs_compact:
+            self.compact()
+
+    def add(self, cmd):
+        """Add a command to the front of the history.
+
+        Returns:
+            bool : False if the command was already the newest one.
+        """
+        cmd = cmd.strip()
+        if not cmd or '\n' in cmd:
+            return False
+
+        if self._entries and next(reversed(self._entries)) == cmd:
+            return False
+
+        if cmd in self._entries:
+            del self._entries[cmd]
+            self._entries[cmd] = None
+            self._unindex(cmd)
+        else:
+            self._entries[cmd] = None
+            self._trim()
+
+        self._index(cmd)
+        self._append(cmd)
+        return True
+
+    def remove(self, cmd):
+        """Remove a command from the history."""
+        if cmd in self._entries:
+            del self._entries[cmd]
+            self._unindex(cmd)
+            self._needs_compact = True
+
+    def swap(self, cmd1, cmd2):
+        """Swap the positions of two commands in the history."""
+        if cmd1 == cmd2 or cmd1 not in self._entries or cmd2 not in self._entries:
+            return
+
+        swapped = {cmd1: cmd2, cmd2: cmd1}
+        self._entries = {swapped.get(cmd, cmd): None for cmd in self._entries}
+        self._needs_compact = True
+        self._changed()
+
+    def replace(self, cmds):
+        """Replace the history with a list of commands, newest first."""
+        self._entries.clear()
+        for cmd in reversed(cmds):
+            cmd = cmd.strip()
+            if cmd and '\n' not in cmd:
+                self._entries.pop(cmd, None)
+                self._entries[cmd] = None
+
+        self._changed()
+        self._trim()
+        self._needs_compact = True
+
+    def clear(self):
+        """Remove all commands from the history."""
+        self.replace([])
+
+    def recent(self, count=None):
+        """Returns a list of the newest commands, newest first."""
+        return list(itertools.islice(reversed(self._entries), count))
+
+    def search(self, text, prefix=False, limit=100):
+        """Search the history, ignoring case.
+
+        Args:
+            text (str) : The text to look for.
+            prefix (bool) : Only match commands starting with the text,
+                otherwise match it anywhere in the command.
+            limit (int) : Maximum number of matches to return, or None
+                for all of them.
+
+        Returns:
+            list : The matching commands, newest first.
+        """
+        text = text.casefold()
+        if not text.strip():
+            return self.recent(limit)
+        if '\n' in text:
+            return []
+
+        if self._text is None:
+            self.buildIndex()
+
+        history, offsets, cmds, positions = \
+            self._text, self._offsets, self._cmds, self._positions
+
+        # commands can not contain a newline, so a match never spans two,
+        # and a prefix match is one that follows the newline before a command
+        if prefix:
+            text = '\n' + text
+            skip = 1
+        else:
+            skip = 0
+
+        matches = []
+        end = len(history)
+        while limit is None or len(matches) < limit:
+            pos = history.rfind(text, 0, end)
+            if pos < 0:
+                break
+
+            index = bisect_right(offsets, pos + skip) - 1
+            cmd = cmds[index]
+            if positions.get(cmd) == index:
+                matches.append(cmd)
+
+            # carry on before the matched command
+            end = offsets[index] - 1
+
+        return matches
+
+    def buildIndex(self):
+        """Build the search index, else the first search builds it.
+
+        Building the index of 100k commands takes tens of milliseconds,
+        so it is best done while loading rather than on the first key
+        press of a search.
+        """
+        # one string of all the commands, oldest first, each preceded by a
+        # newline, and the offset of each command in it
+        cmds = list(self._entries)
+        text = ('\n' + '\n'.join(cmds)).casefold()
+        if len(text) != sum(map(len, cmds)) + len(cmds):
+            # some characters fold to more than one, fold each command
+            cmds_folded = [cmd.casefold() for cmd in cmds]
+            text = ''.join('\n' + cmd for cmd in cmds_folded)
+        else:
+            cmds_folded = cmds
+
+        offsets = list(itertools.accumulate((len(cmd) + 1 for cmd in cmds_folded), initial=1))
+        offsets.pop()
+
+        self._text = text
+        self._offsets = offsets
+        self._cmds = cmds
+        self._positions = dict(zip(cmds, range(len(cmds))))
+        self._stale = 0
+
+    def compact(self):
+        """Rewrite the file with only the current history."""
+        self._needs_compact = False
+        if not self.fname:
+            return
+
+        lines = ''.join(cmd + '\n' for cmd in self._entries)
+        fname = os.path.realpath(os.path.expanduser(self.fname))
+
+        try:
+            fd, tmp_name = tempfile.mkstemp(prefix='.mdi_history.',
+                                            dir=os.path.dirname(fname))
+            try:
+                with os.fdopen(fd, 'w') as fh:
+                    fh.write(lines)
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                if os.path.exists(fname):
+                    shutil.copymode(fname, tmp_name)
+                os.replace(tmp_name, fname)
+            except Exception:
+                os.unlink(tmp_name)
+                raise
+
+        except OSError as e:
+            LOG.error("Failed to write MDI history file {}: {}".format(self.fname, e))
+            self._needs_compact = True
+            return
+
+        self.file_lines = len(self._entries)
+        self.compactions += 1
+        LOG.debug("Compacted MDI history file to {} lines".format(self.file_lines))
+
+    def _append(self, cmd):
+        if not self.fname:
+            return
+
+        # after a removal the file still has the removed commands, they
+        # are dropped when it is compacted on save
+        try:
+            with open(self.fname, 'a') as fh:
+                fh.write(cmd + '\n')
+        except OSError as e:
+            LOG.error("Failed to append to MDI history file {}: {}".format(self.fname, e))
+            return
+
+        self.file_lines += 1
+        self._compactIfNeeded()
+
+    def _compactIfNeeded(self):
+        if self.file_lines > 2 * len(self._entries) + COMPACT_SLACK:
+            self.compact()
+
+    def _trim(self):
+        # drop the oldest commands over max_entries
+        for i in range(len(self._entries) - self.max_entries):
+            cmd = next(iter(self._entries))
+            del self._entries[cmd]
+            self._unindex(cmd)
+
+    def _changed(self):
+        self._text = self._offsets = self._cmds = self._positions = None
+
+    def _index(self, cmd):
+        # add a new command to the end of the search index
+        if self._text is None:
+            return
+
+        self._positions[cmd] = len(self._cmds)
+        self._offsets.append(len(self._text) + 1)
+        self._cmds.append(cmd)
+        self._text += '\n' + cmd.casefold()
+
+    def _unindex(self, cmd):
+        # the command's old copy stays in the index but no longer matches,
+        # rebuild it once half of it is stale
+        if self._text is None:
+            return
+
+        self._positions.pop(cmd, None)
+        self._stale += 1
+        if self._stale > len(self._entries):
+            self._changed()
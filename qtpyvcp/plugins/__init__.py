@@ -5,10 +5,16 @@ QtPyVCP Plugins
 These package level functions provide methods for registering and initializing
 plugins, as well as retrieving them for use and terminating them in the proper
 order.
+
+Plugins registered as lazy are not imported or instantiated until they are
+first requested via :py:func:`getPlugin` (e.g. by a widget rule URL), at which
+point they are created and brought up to the same initialisation stage as the
+rest of the plugins.
 """
 import importlib
 
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from qtpyvcp.utilities.logger import getLogger
 from qtpyvcp.plugins.base_plugins import Plugin, DataPlugin, DataChannel
@@ -16,6 +22,13 @@ from qtpyvcp.plugins.base_plugins import Plugin, DataPlugin, DataChannel
 LOG = getLogger(__name__)
 
 _PLUGINS = OrderedDict()  # Ordered dict so we can initialize/terminate in order
+_DEFERRED_PLUGINS = OrderedDict()  # plugin_id: (plugin_cls, args, kwargs)
+
+_INITIALISED = False
+_MAIN_WINDOW = None
+
+# max number of plugins to run ioInitialise for concurrently
+IO_INIT_WORKERS = 4
 
 
 def registerPlugin(plugin_id, plugin_inst):
@@ -33,7 +46,7 @@ def registerPlugin(plugin_id, plugin_inst):
     _PLUGINS[plugin_id] = plugin_inst
 
 
-def registerPluginFromClass(plugin_id, plugin_cls, args=[], kwargs={}):
+def registerPluginFromClass(plugin_id, plugin_cls, args=[], kwargs={}, lazy=False):
     """Register a plugin from a class.
 
     This is primarily used for registering plugins defined in the YAML config.
@@ -57,11 +70,20 @@ def registerPluginFromClass(plugin_id, plugin_cls, args=[], kwargs={}):
             the location of an importable :py:class:`.Plugin` subclass.
         args (list) : Arguments to pass to the plugin's __init__ method.
         kwargs (dict) : Keyword argument to pass to the plugin's __init__ method.
+        lazy (bool) : If True the plugin is not imported or instantiated until
+            it is first requested via :py:func:`getPlugin`.
 
     Returns:
-        The plugin instance
+        The plugin instance, or None if the plugin was deferred.
     """
 
+    if lazy:
+        LOG.debug("Deferring plugin '{}' until first use".format(plugin_id))
+        _DEFERRED_PLUGINS[plugin_id] = (plugin_cls, args, kwargs)
+        return None
+
+    _DEFERRED_PLUGINS.pop(plugin_id, None)
+
     if isinstance(plugin_cls, str):
         LOG.debug("Loading plugin '{}' from '{}'".format(plugin_id, plugin_cls))
 
@@ -96,12 +118,58 @@ def getPlugin(plugin_id):
     try:
         return _PLUGINS[plugin_id]
     except KeyError:
-        LOG.error("Failed to find plugin with ID '%s'", plugin_id)
-        return None
+        pass
+
+    if plugin_id in _DEFERRED_PLUGINS:
+        return _loadDeferredPlugin(plugin_id)
+
+    LOG.error("Failed to find plugin with ID '%s'", plugin_id)
+    return None
+
+
+def _loadDeferredPlugin(plugin_id):
+    # pop first so a plugin requesting itself while being created fails
+    # normally instead of recursing
+    plugin_cls, args, kwargs = _DEFERRED_PLUGINS.pop(plugin_id)
+
+    LOG.debug("Loading deferred '%s' plugin", plugin_id)
+    plugin_inst = registerPluginFromClass(plugin_id=plugin_id,
+                                          plugin_cls=plugin_cls,
+                                          args=args,
+                                          kwargs=kwargs)
+
+    # catch the plugin up with the rest of the plugins
+    if _INITIALISED:
+        _ioInitialisePlugins([(plugin_id, plugin_inst)])
+        LOG.debug("Initializing '%s' plugin", plugin_id)
+        plugin_inst.initialise()
+
+    if _MAIN_WINDOW is not None:
+        LOG.debug("Post GUI Initializing '%s' plugin", plugin_id)
+        plugin_inst.postGuiInitialise(_MAIN_WINDOW)
+
+    return plugin_inst
+
+
+def deferredPlugins():
+    """Returns a list of the IDs of plugins which have not been loaded yet."""
+    return list(_DEFERRED_PLUGINS.keys())
+
+
+def loadDeferredPlugins():
+    """Loads all deferred plugins, in the order they were registered in."""
+    for plugin_id in deferredPlugins():
+        if plugin_id in _DEFERRED_PLUGINS:
+            _loadDeferredPlugin(plugin_id)
 
 
 def iterPlugins():
-    """Returns an iterator for the plugins dict."""
+    """Returns an iterator for the plugins dict.
+
+    Any deferred plugins are loaded first, so the iterator covers
+    every registered plugin.
+    """
+    loadDeferredPlugins()
     return iter(_PLUGINS.items())
 
 
@@ -110,20 +178,84 @@ def initialisePlugins():
 
         Plugins are initialized in the order they were registered in.
         Plugins defined in the YAML file are registered in the order they
-        were defined.
+        were defined. Deferred plugins are initialized when they are loaded.
     """
+    global _INITIALISED
+    _INITIALISED = True
+
+    _ioInitialisePlugins(list(_PLUGINS.items()))
+
     for plugin_id, plugin_inst in list(_PLUGINS.items()):
         LOG.debug("Initializing '%s' plugin", plugin_id)
         plugin_inst.initialise()
 
 
+def _hasIoInitialise(plugin_inst):
+    return type(plugin_inst).ioInitialise is not Plugin.ioInitialise
+
+
+def _ioInitialisePlugins(plugins):
+    """Runs ``ioInitialise`` for plugins that implement it in a thread pool.
+
+    A plugin is started as soon as all of the plugins listed in its
+    ``dependencies`` have finished, so independent plugins run
+    concurrently. Returns once all of them have completed.
+
+    Args:
+        plugins (list) : List of (plugin_id, plugin_inst) tuples.
+    """
+    pending = OrderedDict((plugin_id, plugin_inst) for plugin_id, plugin_inst
+                          in plugins if _hasIoInitialise(plugin_inst))
+    if not pending:
+        return
+
+    # only wait on dependencies that actually have an I/O phase
+    dependencies = {plugin_id: [dep for dep in plugin_inst.dependencies if dep in pending]
+                    for plugin_id, plugin_inst in list(pending.items())}
+
+    def ioInitialise(plugin_id):
+        LOG.debug("I/O Initializing '%s' plugin", plugin_id)
+        pending[plugin_id].ioInitialise()
+
+    done = set()
+    running = {}
+    with ThreadPoolExecutor(max_workers=min(IO_INIT_WORKERS, len(pending))) as pool:
+        while dependencies or running:
+            for plugin_id, deps in list(dependencies.items()):
+                if all(dep in done for dep in deps):
+                    del dependencies[plugin_id]
+                    running[pool.submit(ioInitialise, plugin_id)] = plugin_id
+
+            if not running:
+                LOG.error("Circular dependencies between plugins %s, "
+                          "I/O initializing serially", ', '.join(dependencies))
+                for plugin_id in dependencies:
+                    try:
+                        ioInitialise(plugin_id)
+                    except Exception:
+                        LOG.exception("Error I/O initializing '%s' plugin", plugin_id)
+                break
+
+            finished, not_finished = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                plugin_id = running.pop(future)
+                try:
+                    future.result()
+                except Exception:
+                    LOG.exception("Error I/O initializing '%s' plugin", plugin_id)
+                done.add(plugin_id)
+
+
 def postGuiInitialisePlugins(main_window):
     """Initializes all registered plugins after main window is shown.
 
         Plugins are initialized in the order they were registered in.
         Plugins defined in the YAML file are registered in the order they
-        were defined.
+        were defined. Deferred plugins are initialized when they are loaded.
     """
+    global _MAIN_WINDOW
+    _MAIN_WINDOW = main_window
+
     for plugin_id, plugin_inst in list(_PLUGINS.items()):
         LOG.debug("Post GUI Initializing '%s' plugin", plugin_id)
         plugin_inst.postGuiInitialise(main_window)
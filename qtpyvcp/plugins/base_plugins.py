@@ -8,6 +8,11 @@ LOG = getLogger(__name__)
 
 class Plugin(QObject):
     """QtPyVCP Plugin base class."""
+
+    #: IDs of other plugins whose :py:meth:`ioInitialise` must complete
+    #: before this plugin's :py:meth:`ioInitialise` is started.
+    dependencies = ()
+
     def __init__(self):
         super(Plugin, self).__init__()
 
@@ -22,6 +27,20 @@ class Plugin(QObject):
             return self._log
         return self._log
 
+    def ioInitialise(self):
+        """Perform slow, I/O bound initialization.
+
+        Plugins that need to do blocking work at startup, such as reading and
+        parsing data files, can override this method. It is run in a worker
+        thread, concurrently with the ``ioInitialise`` of other plugins that
+        do not depend on it, and all of them complete before any plugin's
+        :py:meth:`initialise` method is called.
+
+        This method must not create or modify any QObjects or emit signals,
+        that should be left for :py:meth:`initialise`.
+        """
+        pass
+
     def initialise(self):
         """Initialize the plugin.
 
@@ -29,15 +29,13 @@ import io
 from itertools import takewhile
 from datetime import datetime
 
-from deepdiff import DeepDiff
-
 from  linuxcnc import command
 
 from qtpy.QtCore import QFileSystemWatcher, QTimer, Signal, Slot
 
 import qtpyvcp
 
-from qtpyvcp.lib.db_tool.base import Session, Base, engine
+from qtpyvcp.lib.db_tool.base import Session, Base, getEngine
 from qtpyvcp.lib.db_tool.tool_table import ToolTable, Tool
 
 from qtpyvcp.utilities.info import Info
@@ -120,6 +118,31 @@ FLOAT_COLUMN_WIDTH = 12
 FLOAT_DECIMAL_PLACES = 6
 
 
+# Tool columns loaded from and saved to the database, by tool table key
+TOOL_COLUMNS = {
+    'A': Tool.a_offset,
+    'B': Tool.b_offset,
+    'C': Tool.c_offset,
+    'D': Tool.diameter,
+    'I': Tool.i_offset,
+    'J': Tool.j_offset,
+    'P': Tool.pocket,
+    'Q': Tool.q_offset,
+    'R': Tool.remark,
+    'T': Tool.tool_no,
+    'U': Tool.u_offset,
+    'V': Tool.v_offset,
+    'W': Tool.w_offset,
+    'X': Tool.x_offset,
+    'Y': Tool.y_offset,
+    'Z': Tool.z_offset,
+}
+
+# max number of tool numbers in one DELETE ... IN statement, older
+# SQLite versions allow at most 999 parameters
+DELETE_BATCH_SIZE = 500
+
+
 def makeLorumIpsumToolTable():
     return {i: merge(DEFAULT_TOOL,
                      {'T': i, 'P': i, 'R': 'Lorum Ipsum ' + str(i)})
@@ -138,7 +161,7 @@ class DBToolTable(DataPlugin):
                  remember_tool_in_spindle=True):
         super(DBToolTable, self).__init__()
 
-        Base.metadata.create_all(engine)
+        Base.metadata.create_all(getEngine())
         
         self.table = dict()
         # self.fs_watcher = None
@@ -251,145 +274,96 @@ class DBToolTable(DataPlugin):
     def reloadToolTable(self):
         self.loadToolTable()
         
-    def loadToolTable(self): 
-        print("Loads ToolTable")
-        
-        tool_list = self.session.query(Tool).all()
-        
-        for tool in tool_list:
-                   
-            self.table[tool.tool_no] = {'A': tool.a_offset,
-                                        'B': tool.b_offset,
-                                        'C': tool.b_offset,
-                                        'D': tool.diameter,
-                                        'I': 0.0,
-                                        'J': 0.0,
-                                        'P': tool.pocket,
-                                        'Q': 1,
-                                        'R': tool.remark,
-                                        'T': tool.tool_no,
-                                        'U': tool.u_offset,
-                                        'V': tool.v_offset,
-                                        'W': tool.w_offset,
-                                        'X': tool.x_offset,
-                                        'Y': tool.y_offset,
-                                        'Z': tool.z_offset}
-
-        # CMD.load_tool_table()
-        
-        self.tool_table_changed.emit(self.table.copy())     
+    def queryTools(self):
+        """Get the tools in the database.
+
+        Only selects the tool columns, without loading Tool objects.
+
+        Returns:
+            dict : Tool dicts by tool number.
+        """
+        keys = list(TOOL_COLUMNS)
+        query = self.session.query(*[TOOL_COLUMNS[key] for key in keys])
+
+        tool_table = {}
+        for row in query:
+            # columns left empty by other tools keep the defaults
+            tool = merge(DEFAULT_TOOL, {key: value for key, value in zip(keys, row)
+                                        if value is not None})
+            # the orientation is stored as a float
+            tool['Q'] = int(tool['Q'])
+            tool_table[tool['T']] = tool
+
+        return tool_table
+
+    def loadToolTable(self):
+        self.table = self.queryTools()
+        LOG.debug("Loaded {} tools from the tool database".format(len(self.table)))
+
+        self.tool_table_changed.emit(self.table.copy())
 
     def getToolTable(self):
         return self.table.copy()
-    
+
     def saveToolTable(self, tool_table, columns=None):
         """Write tooltable data to db.
 
+        Compares the tool table with the tools in the database and applies
+        the inserts, updates and deletes in one transaction.
+
         Args:
             tool_table (dict) : Dictionary of dictionaries containing
                 the tool data to write to the file.
             columns (str | list) : A list of data columns to write.
                 If `None` will use the value of ``self.columns``.
-            tool_file (str) : Path to write the tooltable too.
-                Defaults to ``self.tool_table_file``.
         """
-        
+
         self.table = tool_table
-        
-        tool_data = self.session.query(Tool)
-        
-        new_tool_dict = dict()
-        
-        for tool in tool_data:
-            tool_dict = dict()
-            
-            tool_dict['R'] = tool.remark
-            tool_dict['T'] = tool.tool_no
-            tool_dict['P'] = tool.pocket
-            tool_dict['X'] = tool.x_offset
-            tool_dict['Y'] = tool.y_offset
-            tool_dict['Z'] = tool.z_offset
-            tool_dict['A'] = tool.a_offset
-            tool_dict['B'] = tool.b_offset
-            tool_dict['C'] = tool.c_offset
-            tool_dict['U'] = tool.u_offset
-            tool_dict['V'] = tool.v_offset
-            tool_dict['W'] = tool.w_offset
-            tool_dict['Q'] = 1
-            tool_dict['I'] = 0.0
-            tool_dict['J'] = 0.0
-            tool_dict['D'] = tool.diameter
-            
-            new_tool_dict[tool.tool_no] = tool_dict
-
-        diff = DeepDiff(new_tool_dict, self.table, view="tree")
-                #
-        to_insert = diff.get("dictionary_item_added")
-        to_update = diff.get("values_changed")
-        to_delete = diff.get("dictionary_item_removed")
-        
-        if to_insert is not None:
-            print("TO INSTER")
-            for a in to_insert:
-                temp_tool = a.t2
-                
-                self.session.add(
-                    Tool(remark=temp_tool['R'],
-                         tool_no=temp_tool['T'],
-                         in_use=False,
-                         pocket=temp_tool['P'],
-                         x_offset=temp_tool['X'],
-                         y_offset=temp_tool['Y'],
-                         z_offset=temp_tool['Z'],
-                         a_offset=temp_tool['A'],
-                         b_offset=temp_tool['B'],
-                         c_offset=temp_tool['C'],
-                         i_offset=temp_tool['I'],
-                         j_offset=temp_tool['J'],
-                         q_offset=temp_tool['Q'],
-                         u_offset=temp_tool['U'],
-                         v_offset=temp_tool['V'],
-                         w_offset=temp_tool['W'],
-                         diameter=temp_tool['D'],
-                         tool_table_id=1
-                    )
-                )
-                self.session.commit()
-                
-        if to_update is not None:
-            print("TO UPDATE")
-            for a in to_update:
-                temp_tool = a.up.t2
-                
-                tool_data = self.session.query(Tool).filter(Tool.tool_no == temp_tool['T']).one()
-                
-                tool_data.remark = temp_tool['R']
-                tool_data.tool_no = temp_tool['T']
-                tool_data.in_use = False
-                tool_data.pocket = temp_tool['P']
-                tool_data.x_offset = temp_tool['X']
-                tool_data.y_offset = temp_tool['Y']
-                tool_data.z_offset = temp_tool['Z']
-                tool_data.a_offset = temp_tool['A']
-                tool_data.b_offset = temp_tool['B']
-                tool_data.c_offset = temp_tool['C']
-                tool_data.i_offset = temp_tool['I']
-                tool_data.j_offset = temp_tool['J']
-                tool_data.q_offset = temp_tool['Q']
-                tool_data.u_offset = temp_tool['U']
-                tool_data.v_offset = temp_tool['V']
-                tool_data.w_offset = temp_tool['W']
-                tool_data.diameter = temp_tool['D']
-                tool_data.tool_table_id = 1
-                
-                self.session.commit()
-
-        if to_delete is not None:
-            print("TO DELETE")
-            for a in to_delete:
-                temp_tool = a.t1
-                tool_row = tool_data.filter(Tool.tool_no == temp_tool['T']).one()
-                self.session.delete(tool_row)
-                self.session.commit()
-        
+
+        keys = list(TOOL_COLUMNS)
+        query = self.session.query(Tool.id, *TOOL_COLUMNS.values())
+
+        db_rows = {}
+        for row in query:
+            db_rows[row.tool_no] = row
+
+        to_insert = []
+        to_update = []
+        for tnum, tool in tool_table.items():
+            row = db_rows.get(tnum)
+            if row is None:
+                to_insert.append(self._toolMapping(tool, keys))
+            elif any(tool[key] != value for key, value in zip(TOOL_COLUMNS, row[1:])):
+                to_update.append(merge(self._toolMapping(tool, keys), {'id': row.id}))
+
+        to_delete = [tnum for tnum in db_rows if tnum not in tool_table]
+
+        if not (to_insert or to_update or to_delete):
+            LOG.debug("Tool table unchanged, not saving")
+            return
+
+        LOG.debug("Saving tool table: {} inserts, {} updates, {} deletes"
+                  .format(len(to_insert), len(to_update), len(to_delete)))
+
+        try:
+            if to_insert:
+                self.session.bulk_insert_mappings(Tool, to_insert)
+            if to_update:
+                self.session.bulk_update_mappings(Tool, to_update)
+            for i in range(0, len(to_delete), DELETE_BATCH_SIZE):
+                self.session.query(Tool) \
+                    .filter(Tool.tool_no.in_(to_delete[i:i + DELETE_BATCH_SIZE])) \
+                    .delete(synchronize_session=False)
+            self.session.commit()
+        except Exception:
+            LOG.exception("Error saving tool table to the database")
+            self.session.rollback()
+            return
+
         CMD.load_tool_table()
+
+    @staticmethod
+    def _toolMapping(tool, keys):
+        mapping = {TOOL_COLUMNS[key].key: tool[key] for key in keys}
+        mapping.update(in_use=False, tool_table_id=1)
+        return mapping
@@ -61,6 +61,41 @@ def merge(a, b):
     return r
 
 
+# Parameter number -> (row, column) of the G5x offset table cell it holds.
+# Each coordinate system has a block of 20 parameters, starting at 5221
+# for G54, the first 10 of which are the X Y Z A B C U V W offsets and
+# the R rotation.
+PARAM_CELLS = {5221 + 20 * row + col: (row, col)
+               for row in range(9) for col in range(10)}
+
+
+def defaultOffsets():
+    """Get a G5x offset table with all offsets zero."""
+    return {row: [0.0] * 10 for row in range(9)}
+
+
+def readVarFile(parameter_file):
+    """Read the G5x offsets from a LinuxCNC parameter (var) file.
+
+    Args:
+        parameter_file (str) : Path of the var file.
+
+    Returns:
+        dict : Lists of offsets by row, as ``OffsetTable.g5x_offset_table``.
+    """
+    offsets = defaultOffsets()
+    with open(parameter_file, 'r') as fh:
+        for line in fh:
+            items = line.split()
+            try:
+                cell = PARAM_CELLS.get(int(items[0]))
+                if cell is not None:
+                    offsets[cell[0]][cell[1]] = float(items[1])
+            except (IndexError, ValueError):
+                continue
+    return offsets
+
+
 class OffsetTable(DataPlugin):
     DEFAULT_OFFSET = {
         0: [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
@@ -123,10 +158,15 @@ class OffsetTable(DataPlugin):
 
         self.setCurrentOffsetNumber(1)
 
-        self.g5x_offset_table = self.DEFAULT_OFFSET.copy()
+        self.g5x_offset_table = defaultOffsets()
         self.current_index = STATUS.stat.g5x_index
 
-        self.loadOffsetTable()
+        # offsets as last read from the var file
+        self.file_offsets = defaultOffsets()
+        # offsets as last given to the table widget or sent to LinuxCNC,
+        # the widget edits g5x_offset_table in place
+        self.table_offsets = defaultOffsets()
+        self.var_file_stamp = None
 
         self.status.g5x_index.notify(self.setCurrentOffsetNumber)
 
@@ -158,7 +198,12 @@ class OffsetTable(DataPlugin):
         """
         return self.current_offset
 
+    def ioInitialise(self):
+        self.readVarFileIfChanged()
+
     def initialise(self):
+        self.updateOffsetTable()
+
         self.fs_watcher = QFileSystemWatcher([self.parameter_file])
         self.fs_watcher.fileChanged.connect(self.onParamsFileChanged)
 
@@ -206,8 +251,9 @@ class OffsetTable(DataPlugin):
         if self.parameter_file not in self.fs_watcher.files():
             self.fs_watcher.addPath(self.parameter_file)
 
-        # reload with the new data
-        offset_table = self.loadOffsetTable()
+        # reload with the new data, if there is any
+        if self.readVarFileIfChanged():
+            self.updateOffsetTable()
 
     def iterTools(self, offset_table=None, columns=None):
         offset_table = offset_table or self.OFFSET_TABLE
@@ -216,61 +262,107 @@ class OffsetTable(DataPlugin):
             offset_data = offset_table[offset]
             yield [offset_data[key] for key in columns]
 
-    def loadOffsetTable(self):
+    def readVarFileIfChanged(self):
+        """Read the var file if it changed since it was last read.
 
-        if self.parameter_file:
-            with open(self.parameter_file, 'r') as fh:
-                for line in fh:
-                    param, data = int(line.split()[0]), float(line.split()[1])
-
-                    if 5230 >= param >= 5221:
-                        self.g5x_offset_table.get(0)[param - 5221] = data
-                    elif 5250 >= param >= 5241:
-                        self.g5x_offset_table.get(1)[param - 5241] = data
-                    elif 5270 >= param >= 5261:
-                        self.g5x_offset_table.get(2)[param - 5261] = data
-                    elif 5290 >= param >= 5281:
-                        self.g5x_offset_table.get(3)[param - 5281] = data
-                    elif 5310 >= param >= 5301:
-                        self.g5x_offset_table.get(4)[param - 5301] = data
-                    elif 5330 >= param >= 5321:
-                        self.g5x_offset_table.get(5)[param - 5321] = data
-                    elif 5350 >= param >= 5341:
-                        self.g5x_offset_table.get(6)[param - 5341] = data
-                    elif 5370 >= param >= 5361:
-                        self.g5x_offset_table.get(7)[param - 5361] = data
-                    elif 5390 >= param >= 5381:
-                        self.g5x_offset_table.get(8)[param - 5381] = data
+        Returns:
+            bool : True if the file was read.
+        """
+        if not self.parameter_file:
+            return False
+
+        try:
+            st = os.stat(self.parameter_file)
+        except OSError as e:
+            LOG.error("Could not read parameter file: {}".format(e))
+            return False
+
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self.var_file_stamp:
+            LOG.debug('Params file unchanged, not reloading')
+            return False
+
+        self.file_offsets = readVarFile(self.parameter_file)
+        self.var_file_stamp = stamp
+        return True
+
+    def updateOffsetTable(self):
+        self.g5x_offset_table = {row: list(offsets) for row, offsets
+                                 in self.file_offsets.items()}
+        self.table_offsets = {row: list(offsets) for row, offsets
+                              in self.file_offsets.items()}
 
         self.offset_table_changed.emit(self.g5x_offset_table)
 
+    def loadOffsetTable(self):
+        self.readVarFileIfChanged()
+        self.updateOffsetTable()
+
         return self.g5x_offset_table
 
     def getOffsetTable(self):
         return self.g5x_offset_table
 
-    def saveOffsetTable(self, offset_table, columns):
+    def offsetCommands(self, offset_table, columns, rows=()):
+        """Get the G10 L2 commands to set the edited offsets.
+
+        One command per edited coordinate system, setting all its offsets
+        in `columns`. A coordinate system is edited if it is in `rows` or
+        any of its offsets differ from those last given to the table
+        widget or saved. The whole row is sent as LinuxCNC may have changed
+        other offsets, by a G10 L20 touch off for example, without
+        rewriting the var file.
+
+        Args:
+            offset_table (dict) : Lists of offsets by row.
+            columns (str | list) : The columns to send.
+            rows (list) : Rows edited in the table widget, sent even if
+                their offsets are unchanged.
+
+        Returns:
+            list : The G10 commands.
+        """
+        indexes = [self.COLUMN_LABELS.index(char) for char in columns]
+
+        commands = []
+        for row in range(len(self.rows)):
+            offsets = offset_table[row]
+            if row not in rows and all(offsets[column] == self.table_offsets[row][column]
+                                       for column in indexes):
+                continue
+
+            words = ["{}{:.6f}".format(char, offsets[column])
+                     for char, column in zip(columns, indexes)]
+            commands.append("G10 L2 P{} {}".format(row + 1, " ".join(words)))
+
+        return commands
+
+    def saveOffsetTable(self, offset_table, columns, rows=()):
         """ Stores the offset table in memory.
 
+        Edited offsets are sent to LinuxCNC as a single batch of MDI
+        commands.
+
         Args:
             offset_table (dict) : Dictionary of dictionaries containing
                 the tool data to write to the file.
             columns (str | list) : A list of data columns to write.
                 If `None` will use the value of ``self.columns``.
+            rows (list) : Rows edited in the table widget, see
+                `offsetCommands`.
         """
         self.g5x_offset_table = offset_table
 
-        for index in range(len(self.rows)):
-            mdi_list = list()
-            mdi_list.append("G10 L2")
-            mdi_list.append("P{}".format(index+1))
-
-            for char in columns:
+        columns = columns or self.columns
 
-                column_index = self.columns.index(char)
-
-                mdi_list.append("{}{}".format(char, self.g5x_offset_table[index][column_index]))
+        commands = self.offsetCommands(offset_table, columns, rows)
+        if not commands:
+            LOG.debug('Offset table unchanged, not saving')
+            return
 
-            mdi_command = " ".join(mdi_list)
+        issue_mdi(";".join(commands))
 
-            issue_mdi(mdi_command)
+        for row in range(len(self.rows)):
+            for char in columns:
+                column = self.COLUMN_LABELS.index(char)
+                self.table_offsets[row][column] = offset_table[row][column]
@@ -1,4 +1,28 @@
+"""Persistent Data Manager
+
+Stores data that should persist between sessions, such as settings and
+the tool in the spindle.
+
+The data is kept in a pack file next to the ``persistence_file``, e.g.
+``.vcp_persistent_data.pickle.pack``, which maps each key to its own
+serialized data. Keys set with :meth:`PersistentDataManager.setData` are
+marked dirty and written ``flush_delay`` ms after the last change, and on
+terminate, so a crash only loses the most recent changes. Only the dirty
+keys are serialized, then the pack is written to a temporary file which
+replaces the old one, so there is one fsync per flush however many keys
+changed.
+
+At startup the pack is read but each key is only deserialized the first
+time it is asked for. If there is no pack but there is a
+``persistence_file`` from an older version its data is loaded, and is
+written to the pack with the first change.
+"""
+
 import os
+import shutil
+import tempfile
+
+from qtpy.QtCore import QTimer
 
 from qtpyvcp.utilities.misc import normalizePath
 from qtpyvcp.utilities.logger import getLogger
@@ -8,7 +32,8 @@ LOG = getLogger(__name__)
 
 
 class PersistentDataManager(Plugin):
-    def __init__(self, serialization_method='pickle', persistence_file=None):
+    def __init__(self, serialization_method='pickle', persistence_file=None,
+                 flush_delay=1000):
         super(PersistentDataManager, self).__init__()
 
         self.serialization_method = serialization_method
@@ -26,15 +51,41 @@ class PersistentDataManager(Plugin):
         self.data = {}
         self.persistence_file = normalizePath(path=persistence_file,
                                               base=os.getenv('CONFIG_DIR', '~/'))
+        self.pack_file = self.persistence_file + '.pack'
+
+        self._packed = {}   # name -> serialized data in the pack file
+        self._dirty = set()
+
+        self._flush_timer = QTimer()
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_delay)
+        self._flush_timer.timeout.connect(self.flush)
 
     def getData(self, name, default=None):
+        if name not in self.data and name in self._packed:
+            try:
+                self.data[name] = self.serializer.loads(self._packed[name])
+            except:
+                LOG.exception("Error reading persistent data %r from file: %s",
+                              name, self.pack_file)
+                del self._packed[name]
         return self.data.get(name, default)
 
     def setData(self, name, data):
         self.data[name] = data
+        self._dirty.add(name)
+        self._flush_timer.start()
+
+    def ioInitialise(self):
+        if os.path.isfile(self.pack_file):
+            with open(self.pack_file, 'rb') as fh:
+                try:
+                    self._packed = self.serializer.loads(fh.read())
+                except:
+                    LOG.exception("Error reading persistent data from file: %s",
+                                  self.pack_file)
 
-    def initialise(self):
-        if os.path.isfile(self.persistence_file):
+        elif os.path.isfile(self.persistence_file):
             with open(self.persistence_file, 'rb') as fh:
                 try:
                     self.data = self.serializer.loads(fh.read())
@@ -43,14 +94,63 @@ class PersistentDataManager(Plugin):
                                   self.persistence_file)
 
     def terminate(self):
-        LOG.debug("Writing persistent data to file: %s", self.persistence_file)
+        self._flush_timer.stop()
+        self.flush()
+
+    def flush(self):
+        """Write the keys changed since the last flush to the pack file."""
+        if not self._dirty:
+            return
+
+        # keys loaded from an older persistence file are not in the pack yet
+        dirty = self._dirty.union(self.data.keys() - self._packed.keys())
+        self._dirty = set()
+
+        packed = dict(self._packed)
+        for name in dirty:
+            try:
+                packed[name] = self.serialize(self.data[name])
+            except Exception:
+                LOG.exception("Error serializing persistent data %r", name)
+                self._dirty.add(name)
+
+        if packed == self._packed:
+            return
+
+        LOG.debug("Writing %i persistent data keys to: %s", len(dirty),
+                  self.pack_file)
+
+        try:
+            self._writePack(packed)
+        except Exception:
+            LOG.exception("Error writing persistent data to file: %s",
+                          self.pack_file)
+            self._dirty.update(dirty)
+            return
+
+        self._packed = packed
+
+    def serialize(self, data):
+        if self.serialization_method == 'json':
+            return self.serializer.dumps(data, sort_keys=True)
+        return self.serializer.dumps(data, protocol=self.serializer.HIGHEST_PROTOCOL)
+
+    def _writePack(self, packed):
         if self.serialization_method == 'json':
-            str_data = self.serializer.dumps(self.data, indent=4, sort_keys=True)
-            write_method = "w"
+            str_data = self.serializer.dumps(packed, indent=4, sort_keys=True).encode('utf-8')
         else:
-            str_data = self.serializer.dumps(self.data,
-                                             protocol=self.serializer.HIGHEST_PROTOCOL)
-            write_method = "wb"
+            str_data = self.serializer.dumps(packed, protocol=self.serializer.HIGHEST_PROTOCOL)
 
-        with open(self.persistence_file, write_method) as fh:
-            fh.write(str_data)
+        fd, tmp_file = tempfile.mkstemp(prefix='.persistent_data.',
+                                        dir=os.path.dirname(self.pack_file))
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(str_data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            if os.path.exists(self.pack_file):
+                shutil.copymode(self.pack_file, tmp_file)
+            os.replace(tmp_file, self.pack_file)
+        except Exception:
+            os.unlink(tmp_file)
+            raise
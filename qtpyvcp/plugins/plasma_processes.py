@@ -24,10 +24,10 @@ from qtpyvcp.utilities.misc import normalizePath
 from qtpyvcp.plugins import Plugin
 
 from sqlalchemy import create_engine
-from sqlalchemy import Column, ForeignKey
+from sqlalchemy import Column, ForeignKey, Index
 from sqlalchemy import Integer, String, Float, LargeBinary
 from sqlalchemy import and_
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, joinedload
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm.session import sessionmaker
 from requests.sessions import session
@@ -36,6 +36,11 @@ LOG = getLogger(__name__)
 BASE = declarative_base()
 IN_DESIGNER = os.getenv('DESIGNER', False)
 
+# cut data values in a seed file, in addition to the lookup names
+CUT_VALUES = ('pierce_height', 'pierce_delay', 'cut_height', 'cut_speed',
+              'volts', 'kerf_width', 'plunge_rate', 'puddle_height',
+              'puddle_delay', 'amps', 'pressure', 'pause_at_end')
+
 class crudMixin(object):
     @classmethod
     def create(cls, session,  **kw):
@@ -208,6 +213,9 @@ class HoleCut(crudMixin, BASE):
     # distance to keep going after torch-off
     over_cut = Column(Float)
 
+    # covers the get_holes() filter and sort
+    __table_args__ = (Index('ix_holecut_filter', machineid, materialid, thicknessid, hole_size),)
+
     @classmethod
     def get_holes(cls, session, mch=0, mat=0, thi=0):
         """
@@ -270,6 +278,11 @@ class Cutchart(crudMixin,BASE):
     pause_at_end = Column(Float)
     smallest_hole = Column(Float)
 
+    # covers the get_exact_cut() filter, the leading columns
+    # also cover tool_list_for_lcnc()
+    __table_args__ = (Index('ix_cutchart_filter', linearsystemid, machineid, pressuresystemid,
+                            materialid, thicknessid, consumableid, operationid, gasid, qualityid),)
+
 
     @classmethod
     def get_exact_cut(cls, session, ls=0, ps=0, mch=0, con=0, mat=0, thi=0, op=0, gas=0, qua=0):
@@ -305,6 +318,9 @@ class Cutchart(crudMixin,BASE):
 class PlasmaProcesses(Plugin):
     def __init__(self, **kwargs):
         super(PlasmaProcesses, self).__init__()
+        # read-through cache of cut chart and hole queries, keyed by
+        # (query name, args). Cleared whenever cut data is written.
+        self._cache = {}
         # determine what database to connect to.  Support types are:
         
         # stop data load processing if in designer
@@ -325,16 +341,62 @@ class PlasmaProcesses(Plugin):
 
         # create the database for anything not already in place
         BASE.metadata.create_all(self._engine)
+        # indexes are only made with new tables, add any an older DB is missing
+        for table in BASE.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self._engine, checkfirst=True)
         # create and hold session for use of transactions
         self._session_maker = sessionmaker(bind=self._engine)
         self._session = self._session_maker()
     
     def drop_all(self):
         BASE.metadata.drop_all(self._engine)
+        self.invalidate_cache()
     
     def build_all(self):
         BASE.metadata.create_all(self._engine)
-        
+        self.invalidate_cache()
+
+    def _cached(self, key, query):
+        try:
+            return self._cache[key]
+        except KeyError:
+            data = self._cache[key] = query()
+            return data
+
+    def invalidate_cache(self):
+        """Drop all cached cut chart and hole data.
+
+        Called after any write through this plugin. Call it directly if the
+        DB has been changed by another process.
+        """
+        self._cache.clear()
+
+    def preload_cuts(self):
+        """Load every cut chart and hidef hole list into the query cache.
+
+        Gives a point in time snapshot that cut_by_id() and hidef_holes()
+        answer without touching the DB. The session and connections are
+        released afterwards so the snapshot can be shared with forked
+        processes, any later query opens a connection of its own.
+        """
+        self.invalidate_cache()
+        cuts = self._session.query(Cutchart).options(joinedload(Cutchart.thickness)).all()
+        for cut in cuts:
+            self._cache[('cut_by_id', cut.id)] = [cut]
+        holes = {}
+        for hole in self._session.query(HoleCut).order_by(HoleCut.hole_size).all():
+            holes.setdefault(('hidef_holes', hole.machineid, hole.materialid, hole.thicknessid), []).append(hole)
+        self._cache.update(holes)
+        # most cuts have no hidef holes, cache that too so the lookup
+        # does not fall through to the DB, likewise before a cut is active
+        self._cache.setdefault(('hidef_holes', None, None, None), [])
+        for cut in cuts:
+            self._cache.setdefault(('hidef_holes', cut.machineid, cut.materialid, cut.thicknessid), [])
+        self._session.close()
+        self._engine.dispose()
+        LOG.debug(f'Preloaded {len(cuts)} cuts and {len(holes)} hidef hole lists')
+
 
     # Gas
     def gases(self):
@@ -442,13 +504,15 @@ class PlasmaProcesses(Plugin):
 
     # HiDef Hole List
     def hidef_holes(self, machineid, materialid, thicknessid):
-        data = HoleCut.get_holes(self._session, machineid, materialid, thicknessid)
+        data = self._cached(('hidef_holes', machineid, materialid, thicknessid),
+                            lambda: HoleCut.get_holes(self._session, machineid, materialid, thicknessid))
         LOG.debug('Get hidef hole list')
         return data
 
     # Cut Data
     def cut_by_id(self, id):
-        data = Cutchart.get_by_key(self._session, 'id', id)
+        data = self._cached(('cut_by_id', id),
+                            lambda: Cutchart.get_by_key(self._session, 'id', id))
         # if data is not None:
         #     LOG.debug(f'Find specific cut id: {id}.  Found: {len(data)}')
         # else:
@@ -457,7 +521,8 @@ class PlasmaProcesses(Plugin):
 
 
     def tool_list_for_lcnc(self, machine, pressure, measurement):
-        data = Cutchart.tool_list_for_lcnc(self._session, machine, pressure, measurement)
+        data = self._cached(('tool_list_for_lcnc', machine, pressure, measurement),
+                            lambda: Cutchart.tool_list_for_lcnc(self._session, machine, pressure, measurement))
         #LOG.debug(f'lcnc tool list for filters machine={machine}, pressure={pressure}, measurement={measurement}')
         return data
 
@@ -474,10 +539,11 @@ class PlasmaProcesses(Plugin):
         #  6 -> 'filter_operation',
         #  7 -> 'filter_quality',
         #  8 -> 'filter_consumable'
-        data = Cutchart.get_exact_cut(self._session, ls=arglst[4], ps=arglst[5], \
-                                      mch=arglst[1], con=arglst[8], mat=arglst[2], \
-                                      thi=arglst[3], op=arglst[6], gas=arglst[0], \
-                                      qua=arglst[7])
+        data = self._cached(('cut', tuple(arglst[:9])),
+                            lambda: Cutchart.get_exact_cut(self._session, ls=arglst[4], ps=arglst[5], \
+                                                           mch=arglst[1], con=arglst[8], mat=arglst[2], \
+                                                           thi=arglst[3], op=arglst[6], gas=arglst[0], \
+                                                           qua=arglst[7]))
         LOG.debug("Look for Cut data.")
         return data
 
@@ -490,7 +556,7 @@ class PlasmaProcesses(Plugin):
                         machineid = args['machines'], \
                         consumableid = args['consumables'], \
                         materialid = args['materials'], \
-                        thickenssid = args['thicknesses'], \
+                        thicknessid = args['thicknesses'], \
                         operationid = args['operations'], \
                         gasid = args['gases'], \
                         qualityid = args['qualities'], \
@@ -507,6 +573,7 @@ class PlasmaProcesses(Plugin):
                         amps = args['amps'], \
                         pressure = args['pressure'], \
                         pause_at_end = args['pause_at_end'])
+        self.invalidate_cache()
         LOG.debug(f"Add cutchart: {args['name']}.")
         return id
     
@@ -524,169 +591,107 @@ class PlasmaProcesses(Plugin):
                         amps = args['amps'], \
                         pressure = args['pressure'], \
                         pause_at_end = args['pause_at_end'])
+        self.invalidate_cache()
         LOG.debug(f"Update cutchart.")
 
     def seed_data_base(self, source_file, holes_file=None):
         # This method tears down the DB and loads net new from a source file
         # ToDO: Possible initial load/import routines below here - for OEM type use
+        # Everything is inserted in a single transaction, with foreign keys
+        # resolved through name -> id dicts built as the lookup rows go in.
         
         # tear down the whole DB
         self.drop_all()
         self.build_all()
         
-        file = []
         with open(source_file, newline='') as csvfile:
             reader = csv.DictReader(csvfile,dialect=csv.excel_tab)
-            for row in reader:
-                file.append(row)
-        # unique machines in list
+            file = list(reader)
+
+        # unique machines, thicknesses and materials in list. First row wins.
         machines = {}
-        for r in file:
-            if r['machine_name'] not in machines.keys():
-                machines[r['machine_name']] = r['service_height']
-        
-        for k in machines:
-            self.add_machine(k, machines[k])
-    
-        # add in linear system
-        mm_id = self.add_linearsystems('mm', 24.5)
-        inch_id = self.add_linearsystems('inch', 1)
-    
-        #import pydevd;pydevd.settrace()
-    
-    
-        # unique thicknesses in list
         thicknesses = {}
-        for r in file:
-            if r['thickness_name'] not in thicknesses.keys():
-                thicknesses[r['thickness_name']] = [r['thickness'], r['thickness_unit']]
-                
-        
-        for k in thicknesses:
-            print(k)
-            print(thicknesses[k][1])
-            if thicknesses[k][1] == "mm":
-                self.add_thickness(k, thicknesses[k][0], mm_id)
-            else:
-                self.add_thickness(k, thicknesses[k][0], inch_id)
-        
-    
-        # unique materials
         mats = {}
         for r in file:
-            if r['material'] not in mats.keys():
-                mats[r['material']] = ''
-        
-        for k in mats:
-            self.add_materials(k)
-    
-        # Add plasma/shield 'gasses'
-        self.add_gas('Air - Air')
-        self.add_gas('Nitrogen - Air')
-        self.add_gas('Nitrogen - CO2')
-        self.add_gas('Nitrogen - Water')
-        self.add_gas('Oxygen - Air')
-        self.add_gas('Argon Hydrogen')
-        self.add_gas('Argon Hydrogen - Water')
-        
-        # add pressure system
-        self.add_pressuresystems('psi', 1)
-        self.add_pressuresystems('bar', 0.0689476)
-        
-        # add operations
-        self.add_operations('Cut')
-        self.add_operations('Pierce')
-        self.add_operations('Mark/Spot')
-        self.add_operations('Cut (from side)')
-    
-        # add quality
-        self.add_qualities('Production')
-        self.add_qualities('Fine')
-        
-        # add consumable
-        self.add_consumables('Shielded')
-        self.add_consumables('Unshielded')
-    
-    
-        # build initial cut chart
-        linearsys = self.linearsystems()
-        pressuresys = self.pressuresystems()
-        machines = self.machines()
-        cons = self.consumables()
-        mats = self.materials()
-        thick = self.thicknesses()
-        ops = self.operations()
-        gases = self.gases()
-        qual = self.qualities()
-        
-        for r in file:
-            # get the ids for foriegn keys
-            for unit in linearsys:
-                if unit.name == r['thickness_unit']:
-                    linearsys_id = unit.id
-            for unit in pressuresys:
-                if unit.name == 'psi':
-                    pressuresys_id = unit.id
-            for machine in machines:
-                if machine.name == r['machine_name']:
-                    machines_id = machine.id
-            for con in cons:
-                if con.name == 'Shielded':
-                    cons_id = con.id
-            for m in mats:
-                if m.name == r['material']:
-                    mats_id = m.id
-            for t in thick:
-                if t.name == r['thickness_name']:
-                    thick_id = t.id
-            for o in ops:
-                if o.name == 'Cut':
-                    ops_id = o.id
-            for g in gases:
-                if g.name == 'Air - Air':
-                    gases_id = g.id
-            for q in qual:
-                if q.name == 'Production':
-                    qual_id = q.id
-    
-            name = r['name']
-            pierce_height = r['pierce_height']
-            pierce_delay = r['pierce_delay']
-            cut_height = r['cut_height']
-            cut_speed = r['cut_speed']
-            volts = r['volts']
-            kerf_width = r['kerf_width']
-            plunge_rate = r['plunge_rate']
-            puddle_height = r['puddle_height']
-            puddle_delay = r['puddle_delay']
-            amps = r['amps']
-            pressure = r['pressure']
-            pause_at_end = r['pause_at_end']
-            
-            self.addCut(linearsystems=linearsys_id, \
-                 pressuresystems=pressuresys_id, \
-                 machines=machines_id, \
-                 consumables=cons_id, \
-                 materials=mats_id, \
-                 thicknesses=thick_id, \
-                 operations=ops_id, \
-                 gases=gases_id, \
-                 qualities=qual_id,\
-                 name=name,\
-                 pierce_height=float(pierce_height), \
-                 pierce_delay=float(pierce_delay), \
-                 cut_height=float(cut_height), \
-                 cut_speed=float(cut_speed), \
-                 volts=float(volts), \
-                 kerf_width=float(kerf_width), \
-                 plunge_rate=float(plunge_rate), \
-                 puddle_height=float(puddle_height), \
-                 puddle_delay=float(puddle_delay), \
-                 amps=float(amps), \
-                 pressure=float(pressure), \
-                 pause_at_end=float(pause_at_end))
-        
-        # finish up
+            machines.setdefault(r['machine_name'], r['service_height'])
+            thicknesses.setdefault(r['thickness_name'], [r['thickness'], r['thickness_unit']])
+            mats.setdefault(r['material'], '')
+
+        session = self._session
+
+        def add_all(cls, rows):
+            # insert lookup rows and return a name -> id dict for them
+            objs = [cls(**row) for row in rows]
+            session.add_all(objs)
+            session.flush()
+            return {obj.name: obj.id for obj in objs}
+
+        try:
+            machine_ids = add_all(Machine, [dict(name=k, service_height=v) for k, v in machines.items()])
+
+            # add in linear system
+            linear_ids = add_all(LinearSystem, [dict(name='mm', unit_per_inch=24.5),
+                                                dict(name='inch', unit_per_inch=1)])
+
+            def linear_id(unit):
+                return linear_ids['mm'] if unit == 'mm' else linear_ids['inch']
+
+            thickness_ids = add_all(Thickness, [dict(name=k, thickness=v[0], linearsystemid=linear_id(v[1]))
+                                                for k, v in thicknesses.items()])
+            material_ids = add_all(Material, [dict(name=k) for k in mats])
+
+            # Add plasma/shield 'gasses'
+            gas_ids = add_all(Gas, [dict(name=k) for k in ('Air - Air',
+                                                           'Nitrogen - Air',
+                                                           'Nitrogen - CO2',
+                                                           'Nitrogen - Water',
+                                                           'Oxygen - Air',
+                                                           'Argon Hydrogen',
+                                                           'Argon Hydrogen - Water')])
+
+            # add pressure system
+            pressure_ids = add_all(PressureSystem, [dict(name='psi', unit_per_psi=1),
+                                                    dict(name='bar', unit_per_psi=0.0689476)])
+
+            # add operations
+            operation_ids = add_all(Operation, [dict(name=k) for k in ('Cut',
+                                                                       'Pierce',
+                                                                       'Mark/Spot',
+                                                                       'Cut (from side)')])
+
+            # add quality
+            quality_ids = add_all(Quality, [dict(name=k) for k in ('Production', 'Fine')])
+
+            # add consumable
+            consumable_ids = add_all(Consumable, [dict(name=k, image_path=None) for k in ('Shielded', 'Unshielded')])
+
+            # build initial cut chart
+            cuts = []
+            for r in file:
+                cut = dict(linearsystemid=linear_id(r['thickness_unit']),
+                           pressuresystemid=pressure_ids['psi'],
+                           machineid=machine_ids[r['machine_name']],
+                           consumableid=consumable_ids['Shielded'],
+                           materialid=material_ids[r['material']],
+                           thicknessid=thickness_ids[r['thickness_name']],
+                           operationid=operation_ids['Cut'],
+                           gasid=gas_ids['Air - Air'],
+                           qualityid=quality_ids['Production'],
+                           name=r['name'])
+                for k in CUT_VALUES:
+                    cut[k] = float(r[k])
+                cuts.append(cut)
+            session.bulk_insert_mappings(Cutchart, cuts)
+
+            # finish up
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.invalidate_cache()
+
+        LOG.debug(f"Seeded {len(file)} cuts from {source_file}.")
     
     def initialise(self):
         LOG.debug('Initialising Plasma Processes plugin')
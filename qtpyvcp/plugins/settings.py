@@ -39,7 +39,16 @@ class Settings(DataPlugin):
             except KeyError:
                 pass
 
+        # hand changes to the data manager as they happen, so they are
+        # written out without waiting for terminate
+        for obj in list(SETTINGS.values()):
+            if obj.persistent == True:
+                obj.signal.connect(self.saveSettings)
+
     def terminate(self):
+        self.saveSettings()
+
+    def saveSettings(self, *args):
         settings = {}
         for key, obj in list(SETTINGS.items()):
             if obj.persistent == True:
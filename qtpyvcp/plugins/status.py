@@ -5,6 +5,7 @@ from qtpy.QtCore import QTimer, QFileSystemWatcher
 
 from qtpyvcp.utilities.logger import getLogger
 from qtpyvcp.app.runtime_config import RuntimeConfig
+from qtpyvcp.lib.mdi_history import MDIHistoryStore
 from qtpyvcp.plugins import DataPlugin, DataChannel
 
 from qtpyvcp.utilities.info import Info
@@ -21,7 +22,7 @@ class Status(DataPlugin):
 
     stat = STAT
 
-    def __init__(self, cycle_time=100):
+    def __init__(self, cycle_time=100, max_mdi_history=10000):
         super(Status, self).__init__()
 
 
@@ -39,7 +40,8 @@ class Status(DataPlugin):
         # MDI history
         self._max_mdi_history_length = 100
         self._mdi_history_file = INFO.getMDIHistoryFile()
-        self.loadMdiHistory(self._mdi_history_file)
+        self._mdi_history = MDIHistoryStore(fname=self._mdi_history_file,
+                                            max_entries=max_mdi_history)
 
         self.jog_increment = 0  # jog
         self.step_jog_increment = INFO.getIncrements()[0]
@@ -97,24 +99,44 @@ class Status(DataPlugin):
     recent_files = DataChannel(doc='List of recently loaded files', settable=True, data=[])
 
     def loadMdiHistory(self, fname):
-        """Load MDI history from file."""
-        mdi_history = []
-        if os.path.isfile(fname):
-            with open(fname, 'r') as fh:
-                for line in fh.readlines():
-                    line = line.strip()
-                    mdi_history.append(line)
+        """Load MDI history from file.
 
-        mdi_history.reverse()
-        self.mdi_history.setValue(mdi_history)
+        New commands are appended to the file as they are issued.
+        """
+        self._mdi_history.fname = fname
+        self._mdi_history.load()
+        self._mdi_history.buildIndex()
+        self._updateMdiHistory()
 
     def saveMdiHistory(self, fname):
-        """Write MDI history to file."""
-        with open(fname, 'w') as fh:
-            cmds = self.mdi_history.value
-            cmds.reverse()
-            for cmd in cmds:
-                fh.write(cmd + '\n')
+        """Write MDI history to file.
+
+        Only rewrites the file if commands have been removed or reordered
+        since it was loaded, or if it is a different file.
+        """
+        if fname != self._mdi_history.fname:
+            self._mdi_history.fname = fname
+            self._mdi_history.compact()
+        else:
+            self._mdi_history.save()
+
+    def searchMdiHistory(self, text, prefix=False, limit=100):
+        """Search the whole MDI history, ignoring case.
+
+        Args:
+            text (str) : The text to look for.
+            prefix (bool) : Only match commands starting with the text.
+            limit (int) : Maximum number of commands to return.
+
+        Returns:
+            list : The matching commands, newest first.
+        """
+        return self._mdi_history.search(text, prefix=prefix, limit=limit)
+
+    def _updateMdiHistory(self):
+        chan = self.mdi_history
+        chan.value = self._mdi_history.recent(self._max_mdi_history_length)
+        chan.signal.emit(chan.value)
 
     @DataChannel
     def axis_mask(self, chan, format='int'):
@@ -156,8 +178,8 @@ class Status(DataPlugin):
         """List of recently issued MDI commands.
             Commands are stored in reverse chronological order, with the
             newest command at the front of the list, and oldest at the end.
-            When the list exceeds the length given by MAX_MDI_COMMANDS the
-            oldest entries will be dropped.
+            Only the 100 most recent commands are in the list, use
+            searchMdiHistory to search the whole history.
 
             Duplicate commands will not be removed, so that MDI History
             can be replayed via the queue meachanisim from a point in
@@ -170,20 +192,13 @@ class Status(DataPlugin):
     def mdi_history(self, chan, new_value):
         LOG.debug("---------set mdi_history: {}, {}".format(chan, new_value))
         if isinstance(new_value, list):
-            chan.value = new_value[:self._max_mdi_history_length]
+            self._mdi_history.replace(new_value)
         else:
             cmd = str(new_value.strip())
-            cmds = chan.value
             LOG.debug("---------cmd: {}".format(cmd))
-            LOG.debug("---------cmds: {}".format(cmds))
-            if cmd in cmds:
-               cmds.remove(cmd)
+            self._mdi_history.add(cmd)
 
-            cmds.insert(0, cmd)
-            chan.value = cmds[:self._max_mdi_history_length]
-            LOG.debug("---------chan.value: {}".format(chan.value))
-
-        chan.signal.emit(chan.value)
+        self._updateMdiHistory()
 
     def mdi_remove_entry(self, mdi_index):
         """Remove the indicated cmd by index reference"""
@@ -192,8 +207,8 @@ class Status(DataPlugin):
         cmds = chan.value
         # only attempt to delete if index is in range.
         if mdi_index > -1 and mdi_index < len(cmds):
-            del cmds[mdi_index]
-            chan.signal.emit(cmds)
+            self._mdi_history.remove(cmds[mdi_index])
+            self._updateMdiHistory()
         else:
             LOG.debug("---------mdi history delete attempt index out of range")
 
@@ -201,15 +216,13 @@ class Status(DataPlugin):
         """Switch two entries about."""
         chan = self.mdi_history
         cmds = chan.value
-        cmds[index2], cmds[index1] = cmds[index1], cmds[index2]
-        chan.signal.emit(cmds)
+        self._mdi_history.swap(cmds[index1], cmds[index2])
+        self._updateMdiHistory()
     
     def mdi_remove_all(self):
         """Remove all entries in mdi history"""
-        chan = self.mdi_history
-        cmds = chan.value
-        cmds.clear()
-        chan.signal.emit(cmds)
+        self._mdi_history.clear()
+        self._updateMdiHistory()
 
     @DataChannel
     def on(self, chan):
@@ -701,9 +714,16 @@ class Status(DataPlugin):
         # axes not in stat chanel
         # self.old['axes'] = None
 
+    def ioInitialise(self):
+        """Load the MDI history file and build its search index."""
+        self._mdi_history.load()
+        self._mdi_history.buildIndex()
+
     def initialise(self):
         """Start the periodic update timer."""
 
+        self._updateMdiHistory()
+
         # watch the gcode file for changes and reload as needed
         self.file_watcher = QFileSystemWatcher()
         if self.file.value:
@@ -24,6 +24,7 @@ Tool Table YAML configuration:
 import os
 import re
 import io
+import shutil
 from itertools import takewhile
 from datetime import datetime
 
@@ -110,6 +111,91 @@ FLOAT_COLUMN_WIDTH = 12
 FLOAT_DECIMAL_PLACES = 6
 
 
+TOOL_ITEM_RE = re.compile(r"([A-Z]+[0-9.+-]+)")
+
+
+def parseToolLine(line):
+    """Parse a tool table file line into a tool dict.
+
+    Returns a dict with a `T` value of -1 if the line does not define a tool.
+    """
+    data, sep, comment = line.partition(';')
+    items = TOOL_ITEM_RE.findall(data.replace(' ', ''))
+
+    tool = DEFAULT_TOOL.copy()
+    for item in items:
+        descriptor = item[0]
+        if descriptor in 'TPXYZABCUVWDIJQR':
+            value = item[1:]
+            if descriptor in ('T', 'P', 'Q'):
+
+                try:
+                    tool[descriptor] = int(value)
+                except:
+                    LOG.error('Error converting value to int: {}'.format(value))
+                    break
+            else:
+                try:
+                    tool[descriptor] = float(value)
+                except:
+                    LOG.error('Error converting value to float: {}'.format(value))
+                    break
+
+    tool['R'] = comment.strip()
+    return tool
+
+
+def splitToolFile(lines):
+    """Split tool table file lines into the header and the tool lines.
+
+    The header ends with the last line that starts with a semicolon,
+    which is the column header line written by saveToolTable.
+    """
+    for rlnum, line in enumerate(reversed(lines)):
+        if line.startswith(';'):
+            lnum = len(lines) - rlnum
+            return lines[:lnum], lines[lnum:]
+    return [], lines
+
+
+class ToolLineCache(object):
+    """Parsed tool table file lines.
+
+    Keeps the tool parsed from each line of the tool table file, keyed by
+    the line text, so that a reload only parses the lines that changed
+    since the last load or save, wherever they moved to in the file.
+    """
+
+    def __init__(self):
+        self._tools = {}
+
+    def toolTable(self, lines):
+        """Return the tool table for the tool lines of a tool table file."""
+        tools = {}
+        table = {0: NO_TOOL, }
+        parsed = 0
+        for line in lines:
+            tool = self._tools.get(line)
+            if tool is None:
+                tool = parseToolLine(line)
+                parsed += 1
+            tools[line] = tool
+
+            tnum = tool['T']
+            if tnum == -1:
+                continue
+
+            # add a copy of the tool to the table, the tool table
+            # widget edits the tools in place
+            table[tnum] = tool.copy()
+
+        LOG.debug('Parsed {} of {} tool table lines'.format(parsed, len(lines)))
+
+        # forget lines no longer in the file
+        self._tools = tools
+        return table
+
+
 def makeLorumIpsumToolTable():
     return {i: merge(DEFAULT_TOOL,
                      {'T': i, 'P': i, 'R': 'Lorum Ipsum ' + str(i)})
@@ -130,6 +216,8 @@ class ToolTable(DataPlugin):
 
         self.fs_watcher = None
         self.orig_header_lines = []
+        self.tool_lines = ToolLineCache()
+        self.tool_file_text = None
         self.file_header_template = file_header_template or ''
         self.remember_tool_in_spindle = remember_tool_in_spindle
         self.columns = self.validateColumns(columns) or [c for c in 'TPXYZABCUVWDIJQR']
@@ -139,18 +227,6 @@ class ToolTable(DataPlugin):
         self.setCurrentToolNumber(0)
 
         self.tool_table_file = INFO.getToolTableFile()
-        if not os.path.exists(self.tool_table_file):
-            return
-
-        self.loadToolTable()
-
-        self.current_tool.setValue(self.TOOL_TABLE[STATUS.tool_in_spindle.getValue()])
-
-        # update signals
-        STATUS.tool_in_spindle.notify(self.setCurrentToolNumber)
-        STATUS.tool_table.notify(lambda *args: self.loadToolTable())
-
-        STATUS.all_axes_homed.notify(self.reload_tool)
 
     def reload_tool(self):
         if self.remember_tool_in_spindle and STATUS.all_axes_homed.value and STATUS.enabled.value:
@@ -197,7 +273,23 @@ class ToolTable(DataPlugin):
             return self.TOOL_TABLE[STAT.tool_in_spindle]
         return self.TOOL_TABLE[STAT.tool_in_spindle].get(item[0].upper())
 
+    def ioInitialise(self):
+        # read and parse the tool table, it is sent out in initialise
+        if os.path.exists(self.tool_table_file):
+            text = self._readToolFile(self.tool_table_file)
+            if text is not None:
+                self._parseToolText(text)
+
     def initialise(self):
+        if os.path.exists(self.tool_table_file):
+            self._updateToolTable()
+
+            # update signals
+            STATUS.tool_in_spindle.notify(self.setCurrentToolNumber)
+            STATUS.tool_table.notify(lambda *args: self.reloadIfChanged())
+
+            STATUS.all_axes_homed.notify(self.reload_tool)
+
         self.fs_watcher = QFileSystemWatcher()
         self.fs_watcher.addPath(self.tool_table_file)
         self.fs_watcher.fileChanged.connect(self.onToolTableFileChanged)
@@ -247,9 +339,26 @@ class ToolTable(DataPlugin):
         if self.tool_table_file not in self.fs_watcher.files():
             self.fs_watcher.addPath(self.tool_table_file)
 
-        # reload with the new data
-        tool_table = self.loadToolTable()
-        self.tool_table_changed.emit(tool_table)
+        self.reloadIfChanged()
+
+    def reloadIfChanged(self):
+        """Reload the tool table if the file changed since the last load.
+
+        Does nothing if the file is the one last loaded or saved by this
+        plugin, so saving does not cause the tool table to be reloaded
+        when LinuxCNC or the file watcher report the change.
+        """
+        text = self._readToolFile(self.tool_table_file)
+        if text is None:
+            # ToolEdit deletes the file before rewriting it, the
+            # file watcher will let us know when it is back
+            return
+
+        if text == self.tool_file_text:
+            LOG.debug('Tool table file unchanged, not reloading')
+            return
+
+        self._loadToolText(text)
 
     def iterTools(self, tool_table=None, columns=None):
         tool_table = tool_table or self.TOOL_TABLE
@@ -271,65 +380,50 @@ class ToolTable(DataPlugin):
             LOG.critical("Tool table file does not exist: {}".format(tool_file))
             return {}
 
-        with io.open(tool_file, 'r') as fh:
-            lines = [line.strip() for line in fh.readlines()]
+        text = self._readToolFile(tool_file)
+        if text is None:
+            return {}
 
-        # find opening colon, and get header data so it can be restored
-        for rlnum, line in enumerate(reversed(lines)):
-            if line.startswith(';'):
-                lnum = len(lines) - rlnum
-                raw_header = lines[:lnum]
-                lines = lines[lnum:]
-
-                self.orig_header_lines = list(takewhile(lambda l:
-                                        not l.strip() == '---' and
-                                        not l.startswith(';Tool'), raw_header))
-                break
-
-        table = {0: NO_TOOL,}
-        for line in lines:
+        return self._loadToolText(text, tool_file)
+
+    def _readToolFile(self, tool_file):
+        try:
+            with io.open(tool_file, 'r') as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+        except IOError as e:
+            LOG.error("Could not read tool table file: {}".format(e))
+            return None
+
+    def _loadToolText(self, text, tool_file=None):
+        table = self._parseToolText(text, tool_file)
+        self._updateToolTable()
+        return table.copy()
 
-            data, sep, comment = line.partition(';')
-            items = re.findall(r"([A-Z]+[0-9.+-]+)", data.replace(' ', ''))
-
-            tool = DEFAULT_TOOL.copy()
-            for item in items:
-                descriptor = item[0]
-                if descriptor in 'TPXYZABCUVWDIJQR':
-                    value = item[1:]
-                    if descriptor in ('T', 'P', 'Q'):
-
-                        try:
-                            tool[descriptor] = int(value)
-                        except:
-                            LOG.error('Error converting value to int: {}'.format(value))
-                            break
-                    else:
-                        try:
-                            tool[descriptor] = float(value)
-                        except:
-                            LOG.error('Error converting value to float: {}'.format(value))
-                            break
-
-            tool['R'] = comment.strip()
+    def _parseToolText(self, text, tool_file=None):
+        lines = [line.strip() for line in text.splitlines()]
 
-            tnum = tool['T']
-            if tnum == -1:
-                continue
+        # find opening colon, and get header data so it can be restored
+        raw_header, lines = splitToolFile(lines)
+        if raw_header:
+            self.orig_header_lines = list(takewhile(lambda l:
+                                    not l.strip() == '---' and
+                                    not l.startswith(';Tool'), raw_header))
+
+        table = self.tool_lines.toolTable(lines)
 
-            # add the tool to the table
-            table[tnum] = tool
+        if tool_file in (None, self.tool_table_file):
+            self.tool_file_text = text
 
         # update tooltable
         self.__class__.TOOL_TABLE = table
+        return table
 
+    def _updateToolTable(self):
         self.current_tool.setValue(self.TOOL_TABLE[STATUS.tool_in_spindle.getValue()])
 
-        # import json
-        # print(json.dumps(table, sort_keys=True, indent=4))
-
-        self.tool_table_changed.emit(table)
-        return table.copy()
+        self.tool_table_changed.emit(self.TOOL_TABLE)
 
     def getToolTable(self):
         return self.TOOL_TABLE.copy()
@@ -366,8 +460,8 @@ class ToolTable(DataPlugin):
 
         if self.orig_header_lines:
             try:
-                self.orig_header_lines.extend(header_lines[header_lines.index('---'):])
-                header_lines = self.orig_header_lines
+                header_lines = self.orig_header_lines + \
+                               header_lines[header_lines.index('---'):]
             except ValueError:
                 header_lines = self.orig_header_lines
 
@@ -411,17 +505,45 @@ class ToolTable(DataPlugin):
             if comment != '':
                 items.append('; ' + comment)
 
+            # the padding leaves trailing blanks on a tool with no remark
+            lines.append(''.join(items).rstrip())
+
+        # the table is unchanged if everything from the column header on
+        # is, don't rewrite the file just to update a header timestamp
+        old_text = self._readToolFile(tool_file)
+        if old_text is not None:
+            old_lines = [line.strip() for line in old_text.splitlines()]
+            old_header, old_tool_lines = splitToolFile(old_lines)
+            if old_header and old_header[-1] == lines[len(header_lines)] \
+                    and old_tool_lines == lines[len(header_lines) + 1:]:
+                LOG.debug('Tool table unchanged, not saving: {}'.format(tool_file))
+                return
 
-            lines.append(''.join(items))
+        text = '\n'.join(lines) + '\n'  # new line at end of file
 
-        # for line in lines:
-        #     print(line)
+        self._writeToolFile(tool_file, text)
 
-        # write to file
-        with io.open(tool_file, 'w') as fh:
-            fh.write('\n'.join(lines))
-            fh.write('\n')  # new line at end of file
-            fh.flush()
-            os.fsync(fh.fileno())
+        if tool_file == self.tool_table_file:
+            self._loadToolText(text)
 
         CMD.load_tool_table()
+
+    def _writeToolFile(self, tool_file, text):
+        # write to a temp file and rename it over the tool file, so LinuxCNC
+        # and the file watcher never see a partly written tool table
+        tool_file = os.path.realpath(tool_file)
+        tmp_file = '{}.{}.tmp'.format(tool_file, os.getpid())
+        try:
+            with io.open(tmp_file, 'w') as fh:
+                fh.write(text)
+                fh.flush()
+                os.fsync(fh.fileno())
+            if os.path.exists(tool_file):
+                shutil.copymode(tool_file, tmp_file)
+            os.replace(tmp_file, tool_file)
+        except Exception:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            raise
@@ -10,23 +10,45 @@
     The results are printed to standard-out. Other
     special case data (e.g. progress) is sent to
     standard-error
+    Results are cached in $CONFIG_DIR/preprocessor_cache
+    and replayed when the file, HAL settings and cut
+    DB are unchanged. QTPYVCP_PREPROCESSOR_CACHE=0
+    disables the cache.
+    Batch mode pre-processes many files ahead of time
+    in a pool of worker processes, writing each result
+    next to its input as <name>.pp<ext>, or into the
+    cache to be replayed when the file is loaded.
 
 Usage:
   plasma_gcode_preprocessor <gcode-file>
+  plasma_gcode_preprocessor --batch [--jobs=<n>] [--cache] <path>...
   plasma_gcode_preprocessor -h
 
+Options:
+  --batch       Process all given files, and the gcode files in any
+                given directories.
+  --jobs=<n>    Number of worker processes, defaults to the CPU count.
+  --cache       Write the results into the preprocessor cache.
+
 """
 
 import os
 import sys
 import re
 import math
+import json
+import time
+import shutil
+import hashlib
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from enum import Enum, auto
 from typing import List, Dict, Tuple, Union
 
 import hal
 import linuxcnc
+from docopt import docopt
 from qtpyvcp.plugins.plasma_processes import PlasmaProcesses
 from qtpyvcp.utilities.misc import normalizePath
 from qtpyvcp.utilities.config_loader import load_config_files
@@ -35,10 +57,23 @@ from qtpyvcp.utilities.config_loader import load_config_files
 
 INI = linuxcnc.ini(os.environ['INI_FILE_NAME'])
 preprocessor_log_name = normalizePath(path='gcode_preprocessor.log', base=os.getenv('CONFIG_DIR', '~/'))
+# Log level from $QTPYVCP_PREPROCESSOR_LOG_LEVEL or [FILTER]PREPROCESSOR_LOG_LEVEL
+# in the INI, defaults to INFO. DEBUG logs every line so is slow on big files.
+log_level = logging.getLevelName((os.getenv('QTPYVCP_PREPROCESSOR_LOG_LEVEL') or
+                                  INI.find('FILTER', 'PREPROCESSOR_LOG_LEVEL') or
+                                  'INFO').upper())
+if not isinstance(log_level, int):
+    log_level = logging.INFO
 # Constrcut LOG from qtpyvcp standard logging framework
 formatter = "%(asctime)s; %(levelname)s; %(message)s"
-logging.basicConfig(filename=preprocessor_log_name, level=logging.DEBUG, format=formatter)
+logging.basicConfig(filename=preprocessor_log_name, level=log_level, format=formatter)
 LOG = logging.getLogger(__name__)
+# the qtpyvcp modules used here, and this one when run from the entry
+# point, log through the qtpyvcp base logger which defaults to DEBUG
+for name in (__name__, 'qtpyvcp'):
+    logging.getLogger(name).setLevel(log_level)
+# checked before any per line logging, so it costs nothing when off
+LOG_DEBUG = LOG.isEnabledFor(logging.DEBUG)
 LOG.info('---------------------------------------------------')
 LOG.info('------------- Initialising log system -------------')
 LOG.info('---------------------------------------------------')
@@ -47,9 +82,7 @@ LOG.info('---------------------------------------------------')
 # Catch unhandled exceptions
 def excepthook(exc_type, exc_msg, exc_tb):
     try:
-        LOG.debug(exc_type)
-        LOG.debug(exc_msg)
-        LOG.debug(exc_tb)
+        LOG.error('Unhandled exception', exc_info=(exc_type, exc_msg, exc_tb))
     except Exception as e:
         LOG.info("lol")
 
@@ -76,6 +109,45 @@ except:
 PLASMADB = None
 DEBUG_COMMENTS = False
 
+# Output cache, set QTPYVCP_PREPROCESSOR_CACHE=0 to disable. Entries are
+# dropped oldest first once the dir is over QTPYVCP_PREPROCESSOR_CACHE_MB.
+CACHE_ENABLED = os.getenv('QTPYVCP_PREPROCESSOR_CACHE', '1').lower() not in ['0', 'false', 'off', 'no']
+CACHE_DIR = normalizePath(path='preprocessor_cache', base=os.getenv('CONFIG_DIR', '~/'))
+CACHE_MAX_BYTES = int(os.getenv('QTPYVCP_PREPROCESSOR_CACHE_MB', '256')) * 1024 * 1024
+CACHE_VERSION = 1
+
+# Every HAL value the output depends on, these are part of the cache key
+HAL_PARAMS = ('qtpyvcp.plasma-hole-detect-enable.checked',
+              'qtpyvcp.plasma-pierce-only-enable.checked',
+              'qtpyvcp.plasma-hole-thickness-ratio.out',
+              'qtpyvcp.plasma-max-hole-size.out',
+              'qtpyvcp.plasma-arc1-percent.out',
+              'qtpyvcp.plasma-arc2-distance.out',
+              'qtpyvcp.plasma-arc2-percent.out',
+              'qtpyvcp.plasma-arc3-distance.out',
+              'qtpyvcp.plasma-arc3-percent.out',
+              'qtpyvcp.plasma-leadin-percent.out',
+              'qtpyvcp.plasma-leadin-radius.out',
+              'qtpyvcp.param-kirfwidth.out',
+              'qtpyvcp.plasma-torch-off-distance.out',
+              'qtpyvcp.plasma-small-hole-detect.checked',
+              'qtpyvcp.plasma-small-hole-threshold.out',
+              'qtpyvcp.spot-threshold.out',
+              'qtpyvcp.spot-delay.out')
+
+# Max number of parsed lines held back while looking for holes. A hole
+# rewrites the lines back to its M3, lines further back are emitted as is.
+MAX_LOOK_BEHIND = 10000
+
+# Max number of memoized smart hole templates, one per distinct hole
+# size and cut settings.
+MAX_HOLE_TEMPLATES = 1024
+
+# Batch mode picks these up from directories and names its outputs
+# <name>.pp<ext>, existing outputs are not picked up again.
+BATCH_EXTENSIONS = ('.ngc', '.nc', '.tap')
+BATCH_SUFFIX = '.pp'
+
 G_MODAL_GROUPS = {
     1: ('G0','G1','G2','G3','G33','G38.n','G73','G76','G80','G81',\
         'G82','G83','G84','G85','G86','G87','G88','G89'),
@@ -97,6 +169,16 @@ M_MODAL_GROUPS = {
     7: ('M3','M4','M5'),
     9: ('M48','M49')}
 
+# reverse lookup of the modal group a G code belongs to
+G_MODAL_LOOKUP = {}
+for _grp, _codes in G_MODAL_GROUPS.items():
+    for _code in _codes:
+        G_MODAL_LOOKUP.setdefault(_code, _grp)
+del _grp, _codes, _code
+
+# motion codes (modal group 1) that move the torch in XY
+XY_MOTION_CODES = ('G0','G1','G2','G3')
+
 
 # Enum for line type
 class Commands(Enum):
@@ -161,9 +243,52 @@ class Commands(Enum):
 
 
 
+class MachineState:
+# Running machine state, carried forward by the parser one line at a time
+
+    __slots__ = ('x', 'y', 'g_modal_groups', 'units', 'feedrate')
+
+    def __init__(self):
+        self.x = None
+        self.y = None
+        self.g_modal_groups = {}
+        self.units = UNITS
+        self.feedrate = None
+
+    def update(self, line):
+        # apply a parsed line. Positions only track the XY motion codes
+        if line.active_g_modal_groups.get(1) in XY_MOTION_CODES:
+            if 'X' in line.params:
+                self.x = line.params['X']
+            if 'Y' in line.params:
+                self.y = line.params['Y']
+        if line.token == 'G20':
+            self.units = 'in'
+        elif line.token == 'G21':
+            self.units = 'mm'
+        elif line.command and line.command[0] == 'F':
+            self.feedrate = line.command[1]
+
+
+# Precompiled patterns used when scanning each gcode line
+MULTI_CODE_RE = re.compile(r"G\d+|T\s*\d+|M\d+")
+TOOL_COMBO_RE = re.compile(r"T\s*\d+|M6")
+COMMENT_RE = re.compile(r";|\(")
+XY_RE = re.compile(r"X[\d\+\.-]*|Y[\d\+\.-]*")
+XY_PARAM_RE = re.compile(r"X|Y|[\d\+\.-]+")
+ARC_RE = re.compile(r"X[\d\+\.-]*|Y[\d\+\.-]*|I[\d\+\.-]*|J[\d\+\.-]*|P[\d\+\.-]*")
+ARC_PARAM_RE = re.compile(r"X|Y|I|J|P|[\d\+\.-]+")
+SPINDLE_RE = re.compile(r"\$\d+")
+
+
 class CodeLine:
 # Class to represent a single line of gcode
 
+    __slots__ = ('_parent', 'command', 'params', 'comment', 'raw', 'errors',
+                 'type', 'is_hole', 'is_pierce', 'token',
+                 'active_g_modal_groups', 'position', 'cutchart_id',
+                 'hole_builder', 'pierce_builder')
+
     def __init__(self, line, parent = None):
         """args:
         line:  the gcode line to be parsed
@@ -180,73 +305,13 @@ class CodeLine:
         self.is_pierce = False
         self.token = ''
         self.active_g_modal_groups = {}
+        # (x, y) of the torch before this line is run
+        self.position = (None, None)
         self.cutchart_id = None
         self.hole_builder = None
         self.pierce_builder = None
 
-
-        # token mapping for line commands
-        tokens = {
-            'G0':(Commands.MOVE_LINEAR, self.parse_linear),
-            'G1':(Commands.MOVE_LINEAR, self.parse_linear),
-            'G20':(Commands.UNITS, self.set_inches),
-            'G21':(Commands.UNITS, self.set_mms),
-            'G2':(Commands.MOVE_ARC, self.parse_arc),
-            'G3':(Commands.MOVE_ARC, self.parse_arc),
-            #'M3$0':Commands.BEGIN_CUT,
-            #'M5$0':Commands.END_CUT,
-            #'M3$1':Commands.BEGIN_SCRIBE,
-            #'M5$1':Commands.END_SCRIBE,
-            #'M3$2':Commands.BEGIN_SPOT,
-            #'M5$2':Commands.END_SPOT,
-            #'M5$-1':Commands.END_ALL,
-            #'M190':(Commands.SELECT_PROCESS, self.placeholder),
-            #'M66P3L3':(Commands.WAIT_PROCESS, self.placeholder),
-            #'F#<_hal[plasmac.cut-feed-rate]>':Commands.FEEDRATE_MATERIAL,
-            #'M62P1':Commands.ENABLE_IGNORE_ARC_OK_SYNCH,
-            #'M64P1':Commands.ENABLE_IGNORE_ARC_OK_IMMED,
-            #'M63P1':Commands.DISABLE_IGNORE_ARC_OK_SYNCH,
-            #'M65P1':Commands.DISABLE_IGNORE_ARC_OK_IMMED,
-            #'M62P2':Commands.DISABLE_THC_SYNCH,
-            #'M64P2':Commands.DISABLE_THC_IMMED,
-            #'M63P2':Commands.ENABLE_THC_SYNCH,
-            #'M65P2':Commands.ENABLE_THC_IMMED,
-            #'M62P3':Commands.DISABLE_TORCH_SYNCH,
-            #'M64P3':Commands.DISABLE_TORCH_IMMED,
-            #'M63P3':Commands.ENABLE_TORCH_SYNCH,
-            #'M65P3':Commands.ENABLE_TORCH_IMMED,
-            #'M67E3':Commands.FEED_VEL_PERCENT_SYNCH,
-            #'M68E3':Commands.FEED_VEL_PERCENT_IMMED,
-            'G41':(Commands.CUTTER_COMP_LEFT, self.cutter_comp_error),
-            'G42':(Commands.CUTTER_COMP_RIGHT, self.cutter_comp_error),
-            'G41.1':(Commands.CUTTER_COMP_LEFT, self.cutter_comp_error),
-            'G42.1':(Commands.CUTTER_COMP_RIGHT, self.cutter_comp_error),
-            'G40':(Commands.CUTTER_COMP_OFF, self.placeholder),
-            'G64':(Commands.PATH_BLENDING, self.parse_passthrough),
-            'M52':(Commands.ADAPTIVE_FEED, self.parse_passthrough),
-            'M2':(Commands.PROGRAM_END, self.parse_passthrough),
-            'M30':(Commands.PROGRAM_END, self.parse_passthrough),
-            'M3':(Commands.SPINDLE_ON, self.parse_spindle_on),
-            'M5':(Commands.SPINDLE_OFF, self.parse_spindle_off),
-            'M190':(Commands.MATERIAL_CHANGE, self.parse_passthrough),
-            'M66':(Commands.DIGITAL_IN, self.parse_passthrough),
-            'G90':(Commands.ABSOLUTE, self.parse_passthrough),
-            'G91':(Commands.RELATIVE, self.parse_passthrough),
-            'G91.1':(Commands.ARC_RELATIVE, self.parse_passthrough),
-            'G90.1':(Commands.ARC_ABSOLUTE, self.parse_passthrough),
-            'F#':(Commands.FEEDRATE_MATERIAL, self.parse_passthrough),
-            'F':(Commands.FEEDRATE_LINE, self.parse_feedrate),
-            '#<holes>':(Commands.HOLE_MODE, self.placeholder),
-            '#<h_diameter>':(Commands.HOLE_DIAM, self.placeholder),
-            '#<h_velocity>':(Commands.HOLE_VEL, self.placeholder),
-            '#<oclength>':(Commands.HOLE_OVERCUT, self.placeholder),
-            '#<pierce-only>':(Commands.PIERCE_MODE, self.placeholder),
-            #'#<keep-z-motion>':Commands.KEEP_Z,
-            ';':(Commands.COMMENT, self.parse_comment),
-            '(':(Commands.COMMENT, self.parse_comment),
-            'T':(Commands.TOOLCHANGE, self.parse_toolchange)
-            #'(o=':Commands.MAGIC_MATERIAL
-            }
+        upper = line.upper()
 
         # a line could have multiple Gcodes on it. This is typical of the
         # preamble set by many CAM packages.  The processor should not need
@@ -255,9 +320,10 @@ class CodeLine:
         # [1] Recognise it is there
         # [2] Scan for any illegal codes, set any error codes if needed
         # [3] Mark line for pass through
-        multi_codes = re.findall(r"G\d+|T\s*\d+|M\d+", line.upper().strip())
+        multi_codes = MULTI_CODE_RE.findall(upper.strip())
         if len(multi_codes) > 1:
-            LOG.debug('Codeline: Multi codes on line detected')
+            if LOG_DEBUG:
+                LOG.debug('Codeline: Multi codes on line detected')
             # we have multiple codes on the line
             self.type = Commands.PASSTHROUGH
             # scan for possible 'bad' codes
@@ -272,37 +338,32 @@ class CodeLine:
                 if code == 'G91':
                     self._parent.set_active_g_modal('G91')
             # look for Tx M6 combo
-            f = re.findall("T\s*\d+|M6", line.upper().strip())
+            f = TOOL_COMBO_RE.findall(upper.strip())
             if len(f) == 2:
                 # we have a tool change combo. Assume in form Tx M6
                 self.parse_toolchange(combo=True)
         else:
             # not a multi code on single line situation so process line
             # to set line type
-            LOG.debug('Codeline: Non-Multi code: Scan tokens on line.')
-            for k in tokens:
-                # do regex searches to find exact matches of the token patterns
-                pattern = r"^"+k + r"{1}"
-                if k == '(':
-                    # deal with escaping the '(' which is special char in regex
-                    pattern = r"^\({1}"
-                r = re.search(pattern, line.upper())
-                if r != None:
-                    # since r is NOT None we must have found something
-                    self.type = tokens[k][0]
-                    self.token = k
-                    # call the parser method bound to this key
-                    tokens[k][1]()
-                    # check for an inline comment if the entire line is not a comment
-                    if self.type is not Commands.COMMENT:
-                        self.parse_inline_comment()
-                    # break out of the loop, we found a match
-                    break
-                else:
-                    # nothing of interest just mark the line for pass through processing
-                    self.type = Commands.PASSTHROUGH
+            if LOG_DEBUG:
+                LOG.debug('Codeline: Non-Multi code: Scan tokens on line.')
+            # a single match of the combined token pattern finds the first
+            # token (in table order) that the line starts with
+            r = self.TOKEN_RE.match(upper)
+            if r is not None:
+                self.token = r.group()
+                self.type, parser = self.TOKENS[self.token]
+                # call the parser method bound to this key
+                parser(self)
+                # check for an inline comment if the entire line is not a comment
+                if self.type is not Commands.COMMENT:
+                    self.parse_inline_comment()
+            else:
+                # nothing of interest just mark the line for pass through processing
+                self.type = Commands.PASSTHROUGH
             if self.type is Commands.PASSTHROUGH:
-                LOG.debug('Codeline: Command type = PASSTHROUGH: Do further checks, e.g. XY line/')
+                if LOG_DEBUG:
+                    LOG.debug('Codeline: Command type = PASSTHROUGH: Do further checks, e.g. XY line/')
                 # If the result was seen as 'OTHER' do some further checks
                 # As soon as we shift off being type OTHER, exit the method
                 # 1. is it an XY line
@@ -311,7 +372,7 @@ class CodeLine:
 
 
     def strip_inline_comment(self, line):
-        s = re.split(";|\(", line, 1)
+        s = COMMENT_RE.split(line, 1)
         try:
             return s[0].strip()
         except:
@@ -329,21 +390,18 @@ class CodeLine:
 
     def parse_inline_comment(self):
         # look for possible inline comment
-        s = re.split(";|\(",self.raw[1:],1)
-        robj = re.search(";|\(",self.raw[1:])
-        if robj != None:
-            # found an inline comment. get the char token for the comment
-            i = robj.start() + 1
-            found_c = self.raw[i]
-            self.comment = found_c + s[1]
+        robj = COMMENT_RE.search(self.raw, 1)
+        if robj is not None:
+            # found an inline comment. keep the comment char and everything after it
+            self.comment = self.raw[robj.start():]
         else:
-            # no comment found to empty the char token var
-            found_c = ''
+            # no comment found
             self.comment = ''
 
 
     def parse_other(self):
-        LOG.debug(f'Type OTHER -- {self.token} -- found - this code is not handled or considered')
+        if LOG_DEBUG:
+            LOG.debug('Type OTHER -- %s -- found - this code is not handled or considered', self.token)
         pass
 
     def parse_passthrough(self):
@@ -357,9 +415,9 @@ class CodeLine:
         self.command = ('G',int(self.token[1:]))
         # split the raw line at the token and then look for X/Y existence
         line = self.raw.upper().split(self.token,1)[1].strip()
-        tokens = re.finditer(r"X[\d\+\.-]*|Y[\d\+\.-]*", line)
+        tokens = XY_RE.finditer(line)
         for token in tokens:
-            params = re.findall(r"X|Y|[\d\+\.-]+", token.group())
+            params = XY_PARAM_RE.findall(token.group())
             # this is now a list which can be added to the params dictionary
             if len(params) == 2:
                 self.params[params[0]] = float(params[1])
@@ -367,9 +425,9 @@ class CodeLine:
 
     def parse_XY_line(self):
         line = self.raw.upper().strip()
-        tokens = re.finditer(r"X[\d\+\.-]*|Y[\d\+\.-]*", line)
+        tokens = XY_RE.finditer(line)
         for token in tokens:
-            params = re.findall(r"X|Y|[\d\+\.-]+", token.group())
+            params = XY_PARAM_RE.findall(token.group())
             # this is now a list which can be added to the params dictionary
             if len(params) == 2:
                 self.params[params[0]] = float(params[1])
@@ -382,9 +440,9 @@ class CodeLine:
         self.command = ('G',int(self.token[1:]))
         # split the raw line at the token and then look for X/Y/I/J/P existence
         line = self.strip_inline_comment(self.raw).upper().split(self.token,1)[1].strip()
-        tokens = re.finditer(r"X[\d\+\.-]*|Y[\d\+\.-]*|I[\d\+\.-]*|J[\d\+\.-]*|P[\d\+\.-]*", line)
+        tokens = ARC_RE.finditer(line)
         for token in tokens:
-            params = re.findall(r"X|Y|I|J|P|[\d\+\.-]+", token.group())
+            params = ARC_PARAM_RE.findall(token.group())
             # this is now a list which can be added to the params dictionary
             if len(params) == 2:
                 self.params[params[0]] = float(params[1])
@@ -394,7 +452,7 @@ class CodeLine:
         self.command = ('M', int(self.token[1:]))
         # split the raw line at the token
         line = self.strip_inline_comment(self.raw).upper().split(self.token,1)[1].strip()
-        params = re.findall('\$\d+', line)
+        params = SPINDLE_RE.findall(line)
         if len(params) == 1:
             self.params['$'] = int(params[0][1:])
         elif len(params) == 0:
@@ -406,7 +464,7 @@ class CodeLine:
         self.command = ('M', int(self.token[1:]))
         # split the raw line at the token
         line = self.strip_inline_comment(self.raw).upper().split(self.token,1)[1].strip()
-        params = re.findall('\$\d+', line)
+        params = SPINDLE_RE.findall(line)
         if len(params) == 1:
             self.params['$'] = int(params[0][1:])
         elif len(params) == 0:
@@ -422,7 +480,7 @@ class CodeLine:
         # Param: combo - if True then line has both Tx and M6
         line = self.strip_inline_comment(self.raw)
         if combo:
-            f = re.findall(r"T\s*\d+|M6", line.upper().strip())
+            f = TOOL_COMBO_RE.findall(line.upper().strip())
             # assume is in format Tx M6
             tool = int(re.split('T', f[0], 1)[1])
             self.type = Commands.PASSTHROUGH
@@ -435,7 +493,7 @@ class CodeLine:
         if len(cut_process) == 0:
             # rewrite the raw line as an error comment
             self.raw = f"; ERROR: Invalid Cutchart ID in Tx. Check CAM Tools: {self.raw}"
-            LOG.warn(f'Tool {tool} not a valid cut process in DB')
+            LOG.warning('Tool %s not a valid cut process in DB', tool)
         else:
             self.cutchart_id = tool
             self._parent.active_cutchart = tool
@@ -479,14 +537,87 @@ class CodeLine:
         return self._parent.active_feedrate
 
     def placeholder(self):
-        LOG.debug(f'Type PLACEHOLDER -- {self.token} -- found - this code is not handled or considered')
+        if LOG_DEBUG:
+            LOG.debug('Type PLACEHOLDER -- %s -- found - this code is not handled or considered', self.token)
         pass
 
+    # token mapping for line commands. Order matters, the first token
+    # the line starts with wins, e.g. 'G20' has to be tried before 'G2'.
+    TOKENS = {
+        'G0':(Commands.MOVE_LINEAR, parse_linear),
+        'G1':(Commands.MOVE_LINEAR, parse_linear),
+        'G20':(Commands.UNITS, set_inches),
+        'G21':(Commands.UNITS, set_mms),
+        'G2':(Commands.MOVE_ARC, parse_arc),
+        'G3':(Commands.MOVE_ARC, parse_arc),
+        #'M3$0':Commands.BEGIN_CUT,
+        #'M5$0':Commands.END_CUT,
+        #'M3$1':Commands.BEGIN_SCRIBE,
+        #'M5$1':Commands.END_SCRIBE,
+        #'M3$2':Commands.BEGIN_SPOT,
+        #'M5$2':Commands.END_SPOT,
+        #'M5$-1':Commands.END_ALL,
+        #'M190':(Commands.SELECT_PROCESS, placeholder),
+        #'M66P3L3':(Commands.WAIT_PROCESS, placeholder),
+        #'F#<_hal[plasmac.cut-feed-rate]>':Commands.FEEDRATE_MATERIAL,
+        #'M62P1':Commands.ENABLE_IGNORE_ARC_OK_SYNCH,
+        #'M64P1':Commands.ENABLE_IGNORE_ARC_OK_IMMED,
+        #'M63P1':Commands.DISABLE_IGNORE_ARC_OK_SYNCH,
+        #'M65P1':Commands.DISABLE_IGNORE_ARC_OK_IMMED,
+        #'M62P2':Commands.DISABLE_THC_SYNCH,
+        #'M64P2':Commands.DISABLE_THC_IMMED,
+        #'M63P2':Commands.ENABLE_THC_SYNCH,
+        #'M65P2':Commands.ENABLE_THC_IMMED,
+        #'M62P3':Commands.DISABLE_TORCH_SYNCH,
+        #'M64P3':Commands.DISABLE_TORCH_IMMED,
+        #'M63P3':Commands.ENABLE_TORCH_SYNCH,
+        #'M65P3':Commands.ENABLE_TORCH_IMMED,
+        #'M67E3':Commands.FEED_VEL_PERCENT_SYNCH,
+        #'M68E3':Commands.FEED_VEL_PERCENT_IMMED,
+        'G41':(Commands.CUTTER_COMP_LEFT, cutter_comp_error),
+        'G42':(Commands.CUTTER_COMP_RIGHT, cutter_comp_error),
+        'G41.1':(Commands.CUTTER_COMP_LEFT, cutter_comp_error),
+        'G42.1':(Commands.CUTTER_COMP_RIGHT, cutter_comp_error),
+        'G40':(Commands.CUTTER_COMP_OFF, placeholder),
+        'G64':(Commands.PATH_BLENDING, parse_passthrough),
+        'M52':(Commands.ADAPTIVE_FEED, parse_passthrough),
+        'M2':(Commands.PROGRAM_END, parse_passthrough),
+        'M30':(Commands.PROGRAM_END, parse_passthrough),
+        'M3':(Commands.SPINDLE_ON, parse_spindle_on),
+        'M5':(Commands.SPINDLE_OFF, parse_spindle_off),
+        'M190':(Commands.MATERIAL_CHANGE, parse_passthrough),
+        'M66':(Commands.DIGITAL_IN, parse_passthrough),
+        'G90':(Commands.ABSOLUTE, parse_passthrough),
+        'G91':(Commands.RELATIVE, parse_passthrough),
+        'G91.1':(Commands.ARC_RELATIVE, parse_passthrough),
+        'G90.1':(Commands.ARC_ABSOLUTE, parse_passthrough),
+        'F#':(Commands.FEEDRATE_MATERIAL, parse_passthrough),
+        'F':(Commands.FEEDRATE_LINE, parse_feedrate),
+        '#<holes>':(Commands.HOLE_MODE, placeholder),
+        '#<h_diameter>':(Commands.HOLE_DIAM, placeholder),
+        '#<h_velocity>':(Commands.HOLE_VEL, placeholder),
+        '#<oclength>':(Commands.HOLE_OVERCUT, placeholder),
+        '#<pierce-only>':(Commands.PIERCE_MODE, placeholder),
+        #'#<keep-z-motion>':Commands.KEEP_Z,
+        ';':(Commands.COMMENT, parse_comment),
+        '(':(Commands.COMMENT, parse_comment),
+        'T':(Commands.TOOLCHANGE, parse_toolchange)
+        #'(o=':Commands.MAGIC_MATERIAL
+        }
+
+    # all tokens compiled into a single anchored pattern. Regex alternation
+    # tries the alternatives in order so the table order is preserved.
+    TOKEN_RE = re.compile('|'.join(map(re.escape, TOKENS)))
+
 
 class HoleBuilder:
+    # hole templates shared by all builders, see plasma_hole()
+    templates = {}
+
     def __init__(self):
-        torch_on = False
+        self.torch_on = False
         self.elements = []
+        self.gcode = ''
 
     def degrees(self, rad):
         #convert radians to degrees to help decipher the angles
@@ -615,6 +746,8 @@ class HoleBuilder:
         #self.elements.append(self.create_dwell(delay *1.2))
         self.elements.append(self.create_cut_on_off_gcode(False))
         self.elements.append(self.create_comment('---- Marking/Spotting End ----'))
+        self.gcode = ''.join(self.element_to_gcode_line(e) + '\n' for e in self.elements \
+                             if e['code'] is not None)
 
     def plasma_hole(self, line, x, y, d, kerf, leadin_radius, splits=[], hidef=False):
         # Params:
@@ -625,22 +758,56 @@ class HoleBuilder:
         # leadin_radius:  Radius for the lead in arc
         # splits[]:       List of length segments. Segments will support different speeds
         #                 and starting positions of the circle. Including overburn
-        LOG.debug('Build smart hole')
-        #kerf compensation
-        # often code is already compensated. We need to be able to tell the script if it is
-        #changed the radius parameter to be ad diameter which is more in keeping with the hole data methodology
+        if LOG_DEBUG:
+            LOG.debug('Build smart hole')
         feed_rate = line.get_active_feedrate()
         arc1_feed = feed_rate * hal.get_value('qtpyvcp.plasma-arc1-percent.out')/100
         arc2_feed = feed_rate * hal.get_value('qtpyvcp.plasma-arc2-percent.out')/100
         arc3_feed = feed_rate * hal.get_value('qtpyvcp.plasma-arc3-percent.out')/100
         leadin_feed = feed_rate * hal.get_value('qtpyvcp.plasma-leadin-percent.out')/100
+        feeds = (feed_rate, leadin_feed, arc1_feed, arc2_feed, arc3_feed)
 
         # is G40 oavtive or not
-        if line.active_g_modal_groups[7] == 'G40':
-            g40 = True
-        else:
-            g40 = False
+        g40 = line.active_g_modal_groups[7] == 'G40'
+        relative_arcs = line.active_g_modal_groups[4] == 'G91.1'
+
+        # the geometry of a hole only depends on its size and cut settings,
+        # so it is built once and then moved to each hole centre
+        key = (d, kerf, leadin_radius, tuple(splits), hidef, g40, relative_arcs, feeds)
+        template = self.templates.get(key)
+        if template is None:
+            if len(self.templates) >= MAX_HOLE_TEMPLATES:
+                self.templates.clear()
+            self.hole_template(d, kerf, leadin_radius, splits, hidef, g40, relative_arcs, feeds)
+            template = self.templates[key] = self.elements_to_template()
+
+        fmt, offsets = template
+        centre = (x, y)
+        values = []
+        for axis, terms in offsets:
+            v = centre[axis]
+            for t in terms:
+                v += t
+            values.append(v)
+        self.gcode = fmt.format(*values)
+
+    def hole_template(self, d, kerf, leadin_radius, splits, hidef, g40, relative_arcs, feeds):
+        # Build the elements of a hole centred on 0,0. Coordinates are
+        # (axis, terms) pairs, the terms are added to the X (axis 0) or
+        # Y (axis 1) of the hole centre in order, so a translated hole
+        # gives exactly the same numbers as one built in place.
+        def cx(*terms):
+            return (0, terms)
+
+        def cy(*terms):
+            return (1, terms)
+
+        feed_rate, leadin_feed, arc1_feed, arc2_feed, arc3_feed = feeds
+        self.torch_on = False
 
+        #kerf compensation
+        # often code is already compensated. We need to be able to tell the script if it is
+        #changed the radius parameter to be ad diameter which is more in keeping with the hole data methodology
         r = float(d) / 2.00
         kc = float(kerf) / 2.00
         # kerf larger than hole -> hole disappears
@@ -654,23 +821,13 @@ class HoleBuilder:
         split_angles = []
         full_circle = math.pi * 2  # 360 degrees. We need to use this for a segment moving to 12 O'clock
         degs90 = math.pi / 2
-        crossed_origin = False
         for spt in splits:
             # using the relationship of arc_length/circumfrance = angle/360 if you work the algebra you find:
             # angle = arc_length/radius (in radians)
-            tmp_ang = float(spt) / float(r)     # need to typecast to prevent Python from truncating to whole values, maybe should be double?
-            this_ang = tmp_ang    # Accoding to Juha, all angles are from 0 degrees, -ve angles to the right, +ve angles to the left
-            # this_ang = full_circle + tmp_ang    # Accoding to Juha, all angles are from 0 degrees, -ve angles to the right, +ve angles to the left
-            # if (this_ang > full_circle) and (crossed_origin == False):
-            #     # Has this split got to the 0deg/360 deg  origin?
-            #     # when we cross the origin, add a 360 degree keep it in the correct order
-            #     split_angles.append(full_circle)
-            #     this_ang = tmp_ang
-            #     crossed_origin = True
-            split_angles.append(this_ang)
+            # Accoding to Juha, all angles are from 0 degrees, -ve angles to the right, +ve angles to the left
+            split_angles.append(float(spt) / float(r))
         #Sorting is not helpful with splits becasue the smaller values come befor ethe first segment.
         #We need to keep ssegments in order
-        #sort angles, smallest first
 
         # compensate hole radius and leadin radius if not already compensated code
         # Testing for g40 active.  HOWEVER using a G41/42 code causes so many lost plasmac featrues
@@ -679,22 +836,22 @@ class HoleBuilder:
         leadin_radius = leadin_radius if g40 else leadin_radius -kc
 
         # the first real point of the hole (after leadin)
-        arc_x0 = x
-        arc_y0 = y + r
+        arc_x0 = cx()
+        arc_y0 = cy(r)
 
         # make sure gcode elements list is empty
         self.elements = []
 
-        if line.active_g_modal_groups[4] == 'G91.1':
+        if relative_arcs:
             self.elements.append(self.create_absolute_arc())
         if hidef:
             self.elements.append(self.create_comment('---- HiDef Hole ----'))
-        self.elements.append(self.create_debug_comment(f'Hole Center x={x} y={y} r={r} leadin_r={leadin_radius}'))
-        self.elements.append(self.create_debug_comment(f'First point on hole: x={arc_x0} y={arc_y0}'))
+        self.elements.append(self.create_debug_comment(f'Hole r={r} leadin_r={leadin_radius}'))
+        self.elements.append(self.create_debug_comment(f'First point on hole: centre y+{r}'))
         self.elements.append(self.create_debug_comment('Leadin...'))
 
-        centre_to_leadin_diam_gap = math.fabs(arc_y0 - (2 * leadin_radius) - y)
-        
+        centre_to_leadin_diam_gap = math.fabs(r - (2 * leadin_radius))
+
         # set the lead in speed
         self.elements.append(self.create_feed(leadin_feed))
         # turn off the THC
@@ -704,7 +861,7 @@ class HoleBuilder:
         # --> use straight leadin from the hole center.
         if leadin_radius < 0 or leadin_radius >= r-kc:
             self.elements.append(self.create_debug_comment('too small'))
-            self.elements.append(self.create_line_gcode(x, y, True))
+            self.elements.append(self.create_line_gcode(cx(), cy(), True))
             self.elements.append(self.create_kerf_off_gcode())
             # TORCH ON
             self.elements.append(self.create_cut_on_off_gcode(True))
@@ -712,103 +869,64 @@ class HoleBuilder:
 
         # leadin radius <= r / 2.
         # --> use half circle leadin
-        # done nothing here
         elif leadin_radius <= (r / 2):
             self.elements.append(self.create_debug_comment('Half circle radius'))
             # rapid to hole centre
             self.elements.append(self.create_debug_comment(f'Half circle radius. Centre-to-Leadin-Gap={centre_to_leadin_diam_gap}'))
             if centre_to_leadin_diam_gap < kerf:
                 self.elements.append(self.create_debug_comment('... single arc'))
-                self.elements.append(self.create_line_gcode(x, y, True))
+                self.elements.append(self.create_line_gcode(cx(), cy(), True))
                 self.elements.append(self.create_kerf_off_gcode())
                 # TORCH ON
                 self.elements.append(self.create_cut_on_off_gcode(True))
-                self.elements.append(self.create_line_gcode(x, arc_y0 - 2 * leadin_radius, False))
-                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, x, arc_y0 - leadin_radius))
+                self.elements.append(self.create_line_gcode(cx(), cy(r, -2 * leadin_radius), False))
+                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, cx(), cy(r, -leadin_radius)))
             else:
                 self.elements.append(self.create_debug_comment('... double back arc'))
-                self.elements.append(self.create_line_gcode(x, y, True))
+                self.elements.append(self.create_line_gcode(cx(), cy(), True))
                 self.elements.append(self.create_kerf_off_gcode())
                 # TORCH ON
                 self.elements.append(self.create_cut_on_off_gcode(True))
-                self.elements.append(self.create_cw_arc_gcode(x, y + centre_to_leadin_diam_gap, \
-                                                              x, y + centre_to_leadin_diam_gap/2))
-                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, x, arc_y0 - leadin_radius))
-            
+                self.elements.append(self.create_cw_arc_gcode(cx(), cy(centre_to_leadin_diam_gap), \
+                                                              cx(), cy(centre_to_leadin_diam_gap/2)))
+                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, cx(), cy(r, -leadin_radius)))
 
         # r/2 < leadin radius < r.
         # --> use combination of leadin arc and a smaller arc from the hole center
         else:
-            # TODO:
             self.elements.append(self.create_debug_comment('Greater then Half circle radius'))
             self.elements.append(self.create_debug_comment(f'Half circle radius. Centre-to-Leadin-Gap={centre_to_leadin_diam_gap}'))
 
             if centre_to_leadin_diam_gap < kerf:
                 self.elements.append(self.create_debug_comment('... single arc'))
-                self.elements.append(self.create_line_gcode(x, y, True))
+                self.elements.append(self.create_line_gcode(cx(), cy(), True))
                 self.elements.append(self.create_kerf_off_gcode())
                 # TORCH ON
                 self.elements.append(self.create_cut_on_off_gcode(True))
-                self.elements.append(self.create_line_gcode(x, y - centre_to_leadin_diam_gap, False))
-                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, x, arc_y0 - leadin_radius))
+                self.elements.append(self.create_line_gcode(cx(), cy(-centre_to_leadin_diam_gap), False))
+                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, cx(), cy(r, -leadin_radius)))
             else:
                 self.elements.append(self.create_debug_comment('... double back arc'))
-                self.elements.append(self.create_line_gcode(x, y, True))
+                self.elements.append(self.create_line_gcode(cx(), cy(), True))
                 self.elements.append(self.create_kerf_off_gcode())
                 # TORCH ON
                 self.elements.append(self.create_cut_on_off_gcode(True))
-                self.elements.append(self.create_ccw_arc_gcode(x, y - centre_to_leadin_diam_gap, \
-                                                              x, y - centre_to_leadin_diam_gap/2))
-                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, x, arc_y0 - leadin_radius))
-
-
-            
-            
-            #leadin_diameter =  (leadin_radius + kc) * 2
-            #from_centre = leadin_diameter - (r + kc)  # distance from centre
-            # always start from centre of the hole
-            #start1_x = x
-            #startl_y = y
-            #start1_y = r + from_centre  + kc # Y coordinate of start position
-            
-            # rapid to hole centre
-            #self.elements.append(self.create_line_gcode(x, y , True))
-            
-            # self.elements.append(self.create_line_gcode(x, y-d/2 , True))
-            # if abs(from_centre) < (kerf * 2):
-            #      # no room for arc, use straight segment from hole centre
-            #     self.elements.append(self.create_comment('no room for arc, use straight segment from hole centre...'))
-            #     self.elements.append(self.create_line_gcode(start1_x, start1_y, False))
-            # elif start1_y < r:
-            #     # leadin diameter is shorter than hole radius, Use G2 for first arc
-            #     self.elements.append(self.create_comment('leadin diameter is shorter than hole radius, Use G2 for first arc...'))
-            #     self.elements.append(self.create_cw_arc_gcode(start1_x , start1_y, x, start1_y - from_centre))
-            # else:
-            #     #leadin diameter is longer than hole radius, Use G3 for first arc
-            #     self.elements.append(self.create_comment('leadin diameter is longer than hole radius, Use G3 for first arc...'))
-            #     self.elements.append(self.create_ccw_arc_gcode(x , -(leadin_diameter) , x, -(start1_y - from_centre/2)))
-            # self.elements.append(self.create_ccw_arc_gcode(x , y - kc, x, -(leadin_diameter-(leadin_diameter - kc)/2)))
+                self.elements.append(self.create_ccw_arc_gcode(cx(), cy(-centre_to_leadin_diam_gap), \
+                                                              cx(), cy(-centre_to_leadin_diam_gap/2)))
+                self.elements.append(self.create_ccw_arc_gcode(arc_x0, arc_y0, cx(), cy(r, -leadin_radius)))
 
         self.elements.append(self.create_comment('Hole...'))
-        #this has been reworked quite a bit. The original code was referring to the cursor X & Y positions and they needed to be the hole centre
-        # TODO: not happy with this as it only works where x = 0 I think. Nees to be more robust
-        cx = x
-        cy =  y
 
         if len(split_angles) > 0:
             sector_num = 0
             for sang in split_angles:
                 end_angle = sang
-                end_x = ( cx + r * math.cos(end_angle + degs90))
-                end_y = ( cy + r * math.sin(end_angle + degs90))
+                end_x = cx(r * math.cos(end_angle + degs90))
+                end_y = cy(r * math.sin(end_angle + degs90))
                 if sang == full_circle or sang == 0:
                     #reset coordinates to 0,0 if angle = 360 degrees. We want the next segments to refer to 0 degrees
-                    end_x = x
-                    end_y = y + r
-                # if sang < split_angles[0] and sang > 0.00:
-                #     #conditional to coordinate positive angles
-                #     end_x = (cx - r * math.cos(end_angle + degs90))
-                #     end_y = (cy - r * math.sin(end_angle + degs90))
+                    end_x = cx()
+                    end_y = cy(r)
                 #comment the code
                 self.elements.append(self.create_debug_comment(f'Settings: angle = {str(sang)} end_angle {str(end_angle)} radians {str(self.degrees(end_angle))} degrees'))
                 self.elements.append(self.create_debug_comment(f'Arc length = {r * sang}'))
@@ -821,18 +939,14 @@ class HoleBuilder:
                     # TORCH OFF
                     self.elements.append(self.create_cut_on_off_gcode(False))
                     self.elements.append(self.create_feed(arc3_feed))
-                self.elements.append(self.create_ccw_arc_gcode(end_x, end_y, cx, cy))
-                # if (end_x == 0.00 and end_y == 0.00) == False:
-                #     #if not 12 O'clock, dwell for 0.5 sec so we have a visual indicator of each segment
-                #     # we need to insert a call to a procedure that creates the required gcode actions at the end of each segment
-                #     self.elements.append(self.create_dwell('0.5'))
+                self.elements.append(self.create_ccw_arc_gcode(end_x, end_y, cx(), cy()))
                 sector_num += 1
         else:
             # create hole as four arcs. no overburn or anything special.
-            self.elements.append(self.create_ccw_arc_gcode(x-r, y, x, y))
-            self.elements.append(self.create_ccw_arc_gcode(x, y-r, x, y))
-            self.elements.append(self.create_ccw_arc_gcode(x+r, y, x, y))
-            self.elements.append(self.create_ccw_arc_gcode(x, y+r, x, y))
+            self.elements.append(self.create_ccw_arc_gcode(cx(-r), cy(), cx(), cy()))
+            self.elements.append(self.create_ccw_arc_gcode(cx(), cy(-r), cx(), cy()))
+            self.elements.append(self.create_ccw_arc_gcode(cx(r), cy(), cx(), cy()))
+            self.elements.append(self.create_ccw_arc_gcode(cx(), cy(r), cx(), cy()))
 
         # TORCH OFF
         if self.torch_on:
@@ -841,29 +955,48 @@ class HoleBuilder:
         self.elements.append(self.create_thc_on_synch())
         # rest feed rate
         self.elements.append(self.create_feed(feed_rate))
-        if line.active_g_modal_groups[4] == 'G91.1':
+        if relative_arcs:
             self.elements.append(self.create_relative_arc())
 
-    def generate_hole_gcode(self):
+    def elements_to_template(self):
+        # Format the template elements into a single block of gcode with a
+        # placeholder per coordinate, filled in per hole by plasma_hole()
+        num = '{:.%df}' % PRECISION
+        lines = []
+        offsets = []
         for e in self.elements:
-            if e['code'] is not None:
-                print(self.element_to_gcode_line(e), file=sys.stdout)
-                sys.stdout.flush()
+            code = e['code']
+            if code is None:
+                continue
+            code = code.replace('{', '{{').replace('}', '}}')
+            if 'i' in e:
+                lines.append(f'{code} x{num} y{num} i{num} j{num}')
+                offsets.extend((e['x'], e['y'], e['i'], e['j']))
+            elif 'x' in e:
+                lines.append(f'{code} x{num} y{num}')
+                offsets.extend((e['x'], e['y']))
+            else:
+                lines.append(code)
+        return ''.join(l + '\n' for l in lines), tuple(offsets)
+
+    def generate_hole_gcode(self, out=None):
+        out = out or sys.stdout
+        out.write(self.gcode)
 
 
 class PierceBuilder:
-    def generate_pierce_gcode(self, line):
-        print('M3 $0', file=sys.stdout)
+    def generate_pierce_gcode(self, line, out=None):
+        out = out or sys.stdout
+        print('M3 $0', file=out)
         if line.active_g_modal_groups[3] == 'G90':
             # shift from absolute to relative
-            print('G91', file=sys.stdout)
+            print('G91', file=out)
         # small wiggle
-        print('G1 X0.0001', file=sys.stdout)
+        print('G1 X0.0001', file=out)
         if line.active_g_modal_groups[3] == 'G90':
             # shift back to absolute
-            print('G90', file=sys.stdout)
-        print('M5 $0', file=sys.stdout)
-        sys.stdout.flush()
+            print('G90', file=out)
+        print('M5 $0', file=out)
 
 
 class HiDefHole:
@@ -940,14 +1073,16 @@ class HiDefHole:
     
 
 class PreProcessor:
-    def __init__(self, inCode):
-        self._new_gcode = []
-        self._parsed = []
+    def __init__(self, inCode, progress=True):
+        self._in_file = inCode
+        self._progress = progress
         self._line = ''
         self._line_num = 0
         self._line_type = 0
-        self._orig_gcode = None
-        self.active_g_modal_grps = {}
+        self.errors = 0
+        self.state = MachineState()
+        self.active_g_modal_grps = self.state.g_modal_groups
+        self._g_modal_snapshot = None
         self.active_m_modal_grps = {}
         self.active_cutchart = None
         self.active_feedrate = None
@@ -955,19 +1090,21 @@ class PreProcessor:
         self.active_machineid = None
         self.active_thicknessid = None
         self.active_materialid = None
-        
-
-        openfile= open(inCode, 'r')
-        self._orig_gcode = openfile.readlines()
-        openfile.close()
 
     def set_active_g_modal(self, gcode):
         # get the modal grp for the code and set things
         # if a code is not found then nothing will be set
-        for g_modal_grp in G_MODAL_GROUPS:
-            if gcode in G_MODAL_GROUPS[g_modal_grp]:
-                self.active_g_modal_grps[g_modal_grp] = gcode
-                break
+        g_modal_grp = G_MODAL_LOOKUP.get(gcode)
+        if g_modal_grp is not None and self.active_g_modal_grps.get(g_modal_grp) != gcode:
+            self.active_g_modal_grps[g_modal_grp] = gcode
+            self._g_modal_snapshot = None
+
+    def g_modal_snapshot(self):
+        # copy of the active modal groups. Lines are only read from so the
+        # copy is shared by every line until the next modal change
+        if self._g_modal_snapshot is None:
+            self._g_modal_snapshot = self.active_g_modal_grps.copy()
+        return self._g_modal_snapshot
 
 
     def active_motion_code(self):
@@ -977,7 +1114,47 @@ class PreProcessor:
             return None
 
 
-    def flag_holes(self):
+    def remove_lead_in(self, window, i):
+        # scan back from a replaced hole and mark the M3 and the rapids
+        # leading up to it as Commands.REMOVE
+        found_m3 = False
+        for j in range(i - 1, -1, -1):
+            prev = window[j]
+            # mark for removal any lines until find the M3
+            if prev.token.startswith('M3'):
+                found_m3 = True
+                prev.type = Commands.REMOVE
+            if not found_m3:
+                prev.type = Commands.REMOVE
+            try:
+                if prev.active_g_modal_groups[1] != 'G0' and found_m3:
+                    break
+                elif prev.active_g_modal_groups[1] == 'G0':
+                    prev.type = Commands.REMOVE
+            except KeyError:
+                # access to the dictionary index failed,
+                # so no longer in a g0 mode
+                break
+
+
+    def lead_in_start(self, window, m3):
+        # number of leading lines in the window that remove_lead_in() can
+        # no longer reach once the M3 at window[m3] is the latest torch on
+        j = m3
+        while j >= 0 and window[j].active_g_modal_groups.get(1) == 'G0':
+            j -= 1
+        # a scan stops on the first non-G0 line, which is only
+        # marked itself when it is the M3
+        return j + 1 if j < m3 else m3
+
+
+    def flag_holes(self, lines):
+        """Flag and build smart holes in a stream of parsed lines.
+
+        Lines are held in a look-behind window until no later hole can
+        rewrite them, i.e. until they are behind the lead in of the latest
+        M3, and yielded in order as soon as they are final.
+        """
         # connect to HAL and collect the data we need to determine what holes
         # should be processes and what are too large
         thickness_ratio = hal.get_value('qtpyvcp.plasma-hole-thickness-ratio.out')
@@ -1006,33 +1183,27 @@ class PreProcessor:
         marking_voltage = hal.get_value('qtpyvcp.spot-threshold.out')
         marking_delay = hal.get_value('qtpyvcp.spot-delay.out')
         
-        
-        # old school loop so we can easily peek forward or back of the current
-        # record being processed.
-        i = 0
-        while i < len(self._parsed):
-            line = self._parsed[i]
+        window = []
+        # True while removing everything after a replaced hole up to its M5
+        remove_to_m5 = False
+
+        for line in lines:
+            if remove_to_m5:
+                line.type = Commands.REMOVE
+                if line.token.startswith('M5'):
+                    remove_to_m5 = False
+
+            window.append(line)
+            i = len(window) - 1
+
             if len(line.command) == 2:
                 if line.command[0] == 'G' and line.command[1] == 3:
                     # this could be a hole, test for it.
                     # NB: Only circles that are defined as cww are deemed to be
                     # a hole.  cw (G2) cuts are deemed as an outer edge not inner.
-                                        
-                    #[1] find the last X and Y position while grp 1 was either G0 or G1
-                    j = i-1
-                    for j in range(j, -1, -1):
-                        prev = self._parsed[j]
-                        # is there an X or Y in the line
-                        if 'X' in prev.params.keys() and prev.active_g_modal_groups[1] in ('G0','G1','G2','G3'):
-                            lastx = prev.params['X']
-                            break
-                    j = i-1
-                    for j in range(j, -1, -1):
-                        prev = self._parsed[j]
-                        # is there an X or Y in the line
-                        if 'Y' in prev.params.keys() and prev.active_g_modal_groups[1] in ('G0','G1','G2','G3'):
-                            lasty = prev.params['Y']
-                            break
+                    # the position before the arc is the last X and Y while
+                    # grp 1 was one of G0 to G3
+                    lastx, lasty = line.position
                     endx = line.params['X'] if 'X' in line.params.keys() else lastx
                     endy = line.params['Y'] if 'Y' in line.params.keys() else lasty
                     if endx == lastx and endy == lasty:
@@ -1084,34 +1255,9 @@ class PreProcessor:
                             # removde the hole and replace with a pulse
                             line.hole_builder.\
                                 plasma_mark(line, centre_x, centre_y, marking_delay)
-                            # scan forward and back to mark the M3 and M5 as Coammands.REMOVE
-                            j = i-1
-                            found_m3 = False
-                            for j in range(j, -1, -1):
-                                prev = self._parsed[j]
-                                # mark for removal any lines until find the M3
-                                if prev.token.startswith('M3'):
-                                    found_m3 = True
-                                    prev.type = Commands.REMOVE
-                                if not found_m3:
-                                    prev.type = Commands.REMOVE
-                                try:
-                                    if prev.active_g_modal_groups[1] != 'G0' and found_m3:
-                                        break
-                                    elif prev.active_g_modal_groups[1] == 'G0':
-                                        prev.type = Commands.REMOVE
-                                except KeyError:
-                                    # access to the dictionary index failed,
-                                    # so no longer in a g0 mode
-                                    break
-                            j = i+1
-                            for j in range(j, len(self._parsed)):
-                                next = self._parsed[j]
-                                # mark all lines for removal until find M5
-                                next.type = Commands.REMOVE
-                                if next.token.startswith('M5'):
-                                    next.type = Commands.REMOVE
-                                    break
+                            # mark the M3 and M5 and everything between as Commands.REMOVE
+                            self.remove_lead_in(window, i)
+                            remove_to_m5 = True
                         elif hidef:
                             arc1_distance = circumferance - hidef_speed2dist - hidef_offdistance
                             arc2_from_zero = arc1_distance + hidef_speed2dist
@@ -1123,34 +1269,9 @@ class PreProcessor:
                                              arc2_from_zero, \
                                              arc3_from_zero], hidef)
                             
-                            # scan forward and back to mark the M3 and M5 as Coammands.REMOVE
-                            j = i-1
-                            found_m3 = False
-                            for j in range(j, -1, -1):
-                                prev = self._parsed[j]
-                                # mark for removal any lines until find the M3
-                                if prev.token.startswith('M3'):
-                                    found_m3 = True
-                                    prev.type = Commands.REMOVE
-                                if not found_m3:
-                                    prev.type = Commands.REMOVE
-                                try:
-                                    if prev.active_g_modal_groups[1] != 'G0' and found_m3:
-                                        break
-                                    elif prev.active_g_modal_groups[1] == 'G0':
-                                        prev.type = Commands.REMOVE
-                                except KeyError:
-                                    # access to the dictionary index failed,
-                                    # so no longer in a g0 mode
-                                    break
-                            j = i+1
-                            for j in range(j, len(self._parsed)):
-                                next = self._parsed[j]
-                                # mark all lines for removal until find M5
-                                next.type = Commands.REMOVE
-                                if next.token.startswith('M5'):
-                                    next.type = Commands.REMOVE
-                                    break
+                            # mark the M3 and M5 and everything between as Commands.REMOVE
+                            self.remove_lead_in(window, i)
+                            remove_to_m5 = True
                             
                         elif (diameter <= self.active_thickness * thickness_ratio) or \
                            (diameter <= max_hole_size):
@@ -1179,126 +1300,119 @@ class PreProcessor:
                                              arc2_from_zero, \
                                              arc3_from_zero])
                             
-                            # scan forward and back to mark the M3 and M5 as Coammands.REMOVE
-                            j = i-1
-                            found_m3 = False
-                            for j in range(j, -1, -1):
-                                prev = self._parsed[j]
-                                # mark for removal any lines until find the M3
-                                if prev.token.startswith('M3'):
-                                    found_m3 = True
-                                    prev.type = Commands.REMOVE
-                                if not found_m3:
-                                    prev.type = Commands.REMOVE
-                                try:
-                                    if prev.active_g_modal_groups[1] != 'G0' and found_m3:
-                                        break
-                                    elif prev.active_g_modal_groups[1] == 'G0':
-                                        prev.type = Commands.REMOVE
-                                except KeyError:
-                                    # access to the dictionary index failed,
-                                    # so no longer in a g0 mode
-                                    break
-                            j = i+1
-                            for j in range(j, len(self._parsed)):
-                                next = self._parsed[j]
-                                # mark all lines for removal until find M5
-                                next.type = Commands.REMOVE
-                                if next.token.startswith('M5'):
-                                    next.type = Commands.REMOVE
-                                    break
+                            # mark the M3 and M5 and everything between as Commands.REMOVE
+                            self.remove_lead_in(window, i)
+                            remove_to_m5 = True
                         else:
                             line.is_hole = False
                             line.hole_builder = None
-            i += 1
-
-    def flag_pierce(self):
-        # old school loop so we can easily peek forward or back of the current
-        # record being processed.
-        i = 0
-        while i < len(self._parsed):
-            line = self._parsed[i]
+
+            # release the lines no later hole can rewrite
+            final = 0
+            if line.token.startswith('M3'):
+                final = self.lead_in_start(window, i)
+            if len(window) - final > MAX_LOOK_BEHIND:
+                final = len(window) - MAX_LOOK_BEHIND
+            if final > 0:
+                yield from window[:final]
+                del window[:final]
+
+        yield from window
+
+    def flag_pierce(self, lines):
+        """Flag pierces in a stream of parsed lines."""
+        # True while removing everything after a pierce up to its M5
+        remove_to_m5 = False
+        for line in lines:
+            if remove_to_m5:
+                # mark all lines for removal until find M5
+                line.type = Commands.REMOVE
+                if line.token.startswith('M5'):
+                    remove_to_m5 = False
             if len(line.command) == 2:
                 if line.command[0] == 'M' and line.command[1] == 3:
                     # this is a torce start so must be a pierce.
                     line.is_pierce = True
                     line.pierce_builder = PierceBuilder()
                             
-                    # scan forward to find the M5 and remove all the 
-                    # stuff in the moddle using Coammands.REMOVE
-                    # Aadd in a wiggle for the pierce 
-                    j = i+1
-                    for j in range(j, len(self._parsed)):
-                        next = self._parsed[j]
-                        # mark all lines for removal until find M5
-                        next.type = Commands.REMOVE
-                        if next.token.startswith('M5'):
-                            next.type = Commands.REMOVE
-                            break
-            i += 1
+                    # remove all the stuff up to and including the M5
+                    # using Coammands.REMOVE. A wiggle is added in for
+                    # the pierce
+                    remove_to_m5 = True
+            yield line
         
 
     def parse(self):
+        """Parse the input file, yielding a CodeLine per line as it is read."""
         # setup any global default modal groups that we need to be aware of
         self.set_active_g_modal('G91.1')
         self.set_active_g_modal('G40')
+        # report progress through the file to the filter runner
+        size = os.path.getsize(self._in_file) or 1
+        read = 0
+        progress = -1
         # start parsing through the loaded file
-        for line in self._orig_gcode:
-            self._line_num += 1
-            self._line = line.strip()
-            LOG.debug('Parse: Build gcode line.')
-            l = CodeLine(self._line, parent=self)
-            try:
-                gcode = f'{l.command[0]}{l.command[1]}'
-            except:
-                gcode = ''
-            self.set_active_g_modal(l.token)
-            l.save_g_modal_group(self.active_g_modal_grps)
-            self._parsed.append(l)
-
-
-
-    def dump_parsed(self):
+        with open(self._in_file, 'r') as openfile:
+            for line in openfile:
+                self._line_num += 1
+                read += len(line)
+                if self._progress and read * 100 // size != progress:
+                    progress = read * 100 // size
+                    print(f'FILTER_PROGRESS={progress}', file=sys.stderr)
+                self._line = line.strip()
+                if LOG_DEBUG:
+                    LOG.debug('Parse: Build gcode line %d.', self._line_num)
+                l = CodeLine(self._line, parent=self)
+                if l.errors:
+                    self.errors += 1
+                self.set_active_g_modal(l.token)
+                l.active_g_modal_groups = self.g_modal_snapshot()
+                l.position = (self.state.x, self.state.y)
+                self.state.update(l)
+                yield l
+
+
+    def dump_parsed(self, lines, out=None):
         LOG.debug('Dump parsed gcode to stdio')
-        for l in self._parsed:
+        out = out or sys.stdout
+        for l in lines:
             #print(f'{l.type}\t\t -- {l.command} \
             #    {l.params} {l.comment}')
             # build up line to go to stdout
             if l.is_hole:
-                print('(---- Smart Hole Start ----)')
-                l.hole_builder.generate_hole_gcode()
-                print('(---- Smart Hole End ----)')
-                print()
+                print('(---- Smart Hole Start ----)', file=out)
+                l.hole_builder.generate_hole_gcode(out)
+                print('(---- Smart Hole End ----)', file=out)
+                print(file=out)
                 continue
             if l.is_pierce:
-                print('(---- Pierce ----)')
-                l.pierce_builder.generate_pierce_gcode(l)
+                print('(---- Pierce ----)', file=out)
+                l.pierce_builder.generate_pierce_gcode(l, out)
                 continue
             if l.type is Commands.COMMENT:
-                out = l.comment
+                out_line = l.comment
             elif l.type is Commands.OTHER:
                 # Other at the moment means not recognised
-                out = "; >>  "+l.raw
+                out_line = "; >>  "+l.raw
             elif l.type is Commands.PASSTHROUGH:
-                out = l.raw
+                out_line = l.raw
             elif l.type is Commands.REMOVE:
                 # skip line as not to be used
-                out = ''
                 continue
             else:
                 try:
-                    out = f"{l.command[0]}{l.command[1]}"
+                    out_line = f"{l.command[0]}{l.command[1]}"
                 except:
-                    out = ''
+                    out_line = ''
                 try:
                     for p in l.params:
-                        out += f' {p}{l.params[p]}'
-                    out += f' {l.comment}'
-                    out = out.strip()
+                        out_line += f' {p}{l.params[p]}'
+                    out_line += f' {l.comment}'
+                    out_line = out_line.strip()
                 except:
-                    out = ''
-            print(out, file=sys.stdout)
-            sys.stdout.flush()
+                    out_line = ''
+            print(out_line, file=out)
+        out.flush()
 
     def set_ui_hal_cutchart_pin(self):
         if self.active_cutchart is not None:
@@ -1308,42 +1422,189 @@ class PreProcessor:
             LOG.debug('No active cutchart')
 
 
-def main():
-    global PLASMADB
+class PhaseTimer:
+    # times the stages of the line pipeline. Each stage pulls its lines
+    # from the one before, so its own time is its total less its source's.
+    def __init__(self):
+        self.phases = []
 
+    def wrap(self, name, lines):
+        phase = [name, 0.0]
+        self.phases.append(phase)
+        return self._timed(phase, iter(lines))
+
+    def _timed(self, phase, lines):
+        perf_counter = time.perf_counter
+        while True:
+            start = perf_counter()
+            try:
+                line = next(lines)
+            except StopIteration:
+                phase[1] += perf_counter() - start
+                return
+            phase[1] += perf_counter() - start
+            yield line
+
+    def log_summary(self, total, line_count):
+        parts = []
+        source = 0.0
+        for name, elapsed in self.phases + [['dump', total]]:
+            parts.append('{} {:.3f}s'.format(name, elapsed - source))
+            source = elapsed
+        LOG.info('Processed %d lines in %.3fs (%.0f lines/s): %s',
+                 line_count, total, line_count / total if total else 0, ', '.join(parts))
+
+
+class TeeWriter:
+    # write text to several streams at once
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+def _file_stamp(path):
     try:
-        inCode = sys.argv[1]
-        LOG.debug(f'File to process: {inCode}')
-    except:
-        # no arg found, probably being run from command line and someone forgot a file
-        print(__doc__)
-        return
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
-    if len(inCode) == 0 or '-h' == inCode:
-        print(__doc__)
-        return
 
+def _cache_key(in_file, db_file):
+    # hash of the input plus everything else the output depends on
+    hal_values = []
+    for name in HAL_PARAMS:
+        try:
+            hal_values.append(hal.get_value(name))
+        except Exception:
+            hal_values.append(None)
+
+    key = hashlib.sha1(repr((CACHE_VERSION,
+                             _file_stamp(__file__),
+                             UNITS, PRECISION, DEBUG_COMMENTS,
+                             _file_stamp(db_file),
+                             hal_values)).encode())
+    with open(in_file, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            key.update(chunk)
+    return key.hexdigest()
+
+
+def _replay_cache(key):
+    # stream a cached result to stdout, returns False if there is none
+    out_file = os.path.join(CACHE_DIR, key + '.ngc')
+    try:
+        with open(os.path.join(CACHE_DIR, key + '.json')) as fh:
+            meta = json.load(fh)
+        with open(out_file, 'rb') as fh:
+            sys.stdout.flush()
+            shutil.copyfileobj(fh, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    except FileNotFoundError:
+        LOG.debug('No cached output')
+        return False
+    except Exception:
+        LOG.debug('Failed to read cached output: %s', out_file, exc_info=True)
+        return False
+
+    # mark as recently used
+    os.utime(out_file)
+    print('FILTER_PROGRESS=100', file=sys.stderr)
+    if meta['cutchart'] is not None:
+        hal.set_p("qtpyvcp.cutchart-id", f"{meta['cutchart']}")
+    return True
+
+
+def _open_cache(key):
+    tmp_file = os.path.join(CACHE_DIR, '{}.{}.tmp'.format(key, os.getpid()))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        return open(tmp_file, 'w', encoding=sys.stdout.encoding)
+    except Exception:
+        LOG.debug('Failed to open output cache: %s', tmp_file, exc_info=True)
+        return None
+
+
+def _close_cache(key, fh, meta, keep, prune=True):
+    # move a finished result into place, or drop it
+    fh.close()
+    try:
+        if keep:
+            with open(os.path.join(CACHE_DIR, key + '.json'), 'w') as mf:
+                json.dump(meta, mf)
+            os.replace(fh.name, os.path.join(CACHE_DIR, key + '.ngc'))
+            if prune:
+                _prune_cache()
+        else:
+            os.remove(fh.name)
+    except Exception:
+        LOG.debug('Failed to write output cache: %s', fh.name, exc_info=True)
+
+
+def _prune_cache():
+    # another process may prune at the same time, so entries can vanish
+    # between listing and removing them
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.ngc'):
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(e[1] for e in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        for entry in (path, path[:-4] + '.json'):
+            try:
+                os.remove(entry)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+
+def _db_connect_str():
+    # we assume that things are sqlite unless we find custom_config.yml
+    # pointing to different type of DB
     LOG.debug('Log custom config yaml file')
     custom_config_yaml_file_name = normalizePath(path='custom_config.yml', base=os.getenv('CONFIG_DIR', '~/'))
     cfg_dic = load_config_files(custom_config_yaml_file_name)
-    
-    # we assume that things are sqlite unless we find custom_config.yml
-    # pointing to different type of DB
     try:
-        db_connect_str = cfg_dic['data_plugins']['plasmaprocesses']['kwargs']['connect_string']
-        # if no error then we found a db connection string. Use it.
-        PLASMADB = PlasmaProcesses(connect_string=db_connect_str)
-        LOG.debug('Connected to NON SQLite DB')
+        return cfg_dic['data_plugins']['plasmaprocesses']['kwargs']['connect_string']
     except:
+        return None
+
+
+def _connect_db(db_connect_str):
+    db = None
+    if db_connect_str is not None:
+        try:
+            # we found a db connection string. Use it.
+            db = PlasmaProcesses(connect_string=db_connect_str)
+            LOG.debug('Connected to NON SQLite DB')
+        except:
+            db = None
+    if db is None:
         # no connect string found OR can't connect so assume sqlite on local machine
-        PLASMADB = PlasmaProcesses(db_type='sqlite')
+        db = PlasmaProcesses(db_type='sqlite')
         LOG.debug('Connected to SQLite DB')
+    return db
 
-    # Start cycling through each line of the file and processing it
-    LOG.debug('Build preprocessor object and process gcode')
-    p = PreProcessor(inCode)
-    p.parse()
-    LOG.debug('Parsing done.')
+
+def _pipeline(p, timer):
+    # Build the line pipeline. Lines are read, parsed, flagged and written
+    # one at a time as the dump consumes them.
+    lines = timer.wrap('parse', p.parse())
 
     # Holes flag
     try:
@@ -1358,17 +1619,73 @@ def main():
         do_pierce = False
     
     if do_holes and not do_pierce:
-        LOG.debug('Flag holes ...')
-        p.flag_holes()
-        LOG.debug('... Flag holes done')
+        LOG.debug('Flag holes')
+        lines = timer.wrap('flag_holes', p.flag_holes(lines))
     elif do_pierce:
-        LOG.debug('Flag piercing ...')
-        p.flag_pierce()
-        LOG.debug('... Flag piercing done')
+        LOG.debug('Flag piercing')
+        lines = timer.wrap('flag_pierce', p.flag_pierce(lines))
+    return lines
+
+
+def main():
+    global PLASMADB
+
+    try:
+        inCode = sys.argv[1]
+        LOG.debug('File to process: %s', inCode)
+    except:
+        # no arg found, probably being run from command line and someone forgot a file
+        print(__doc__)
+        return
+
+    if len(inCode) == 0 or '-h' == inCode:
+        print(__doc__)
+        return
+
+    if inCode == '--batch':
+        return batch_main(docopt(__doc__))
+
+    db_connect_str = _db_connect_str()
+
+    # a sqlite DB file can be checked for changes, so the output can be
+    # served from the cache when nothing it depends on has changed
+    cache_key = None
+    if CACHE_ENABLED and db_connect_str is None:
+        db_file = normalizePath(path='plasma_table.db', base=os.getenv('CONFIG_DIR', '~/'))
+        try:
+            cache_key = _cache_key(inCode, db_file)
+        except OSError:
+            LOG.debug('Failed to hash input file', exc_info=True)
+        if cache_key is not None and _replay_cache(cache_key):
+            LOG.debug('Output replayed from cache')
+            return
+
+    PLASMADB = _connect_db(db_connect_str)
+
+    LOG.debug('Build preprocessor object and process gcode')
+    timer = PhaseTimer()
+    p = PreProcessor(inCode)
+    lines = _pipeline(p, timer)
     
-    # pass file to stdio and set any hal pins
+    # pass file to stdio, and the cache, and set any hal pins
     LOG.debug('Dump parsed file')
-    p.dump_parsed()
+    start = time.perf_counter()
+    cache_fh = _open_cache(cache_key) if cache_key is not None else None
+    if cache_fh is None:
+        p.dump_parsed(lines)
+    else:
+        done = False
+        try:
+            p.dump_parsed(lines, TeeWriter(sys.stdout, cache_fh))
+            done = True
+        finally:
+            # only keep clean runs, errors must be reported again on reload
+            _close_cache(cache_key, cache_fh,
+                         {'input': os.path.realpath(inCode),
+                          'cutchart': p.active_cutchart,
+                          'created': time.time()},
+                         keep=done and p.errors == 0)
+    timer.log_summary(time.perf_counter() - start, p._line_num)
     # Set hal pin on UI for cutchart.id
     LOG.debug('Set UI param data via cutchart pin')
     p.set_ui_hal_cutchart_pin()
@@ -1377,5 +1694,123 @@ def main():
     LOG.debug('Plasma DB closed and end.')
 
 
+def _batch_inputs(paths):
+    # the files named, plus the gcode files in any directories named
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in BATCH_EXTENSIONS and not stem.endswith(BATCH_SUFFIX):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+
+def _batch_file(in_file, db_file):
+    # Process one file of a batch in a pool worker. Returns a tuple of
+    # (input, output, lines, seconds, gcode errors, failure message),
+    # lines is None if the result was already in the cache and output is
+    # None if it was not kept there due to errors
+    start = time.perf_counter()
+    try:
+        p = PreProcessor(in_file, progress=False)
+        lines = _pipeline(p, PhaseTimer())
+        if db_file is None:
+            stem, ext = os.path.splitext(in_file)
+            out_file = stem + BATCH_SUFFIX + ext
+            tmp_file = out_file + '.tmp'
+            try:
+                with open(tmp_file, 'w') as fh:
+                    p.dump_parsed(lines, fh)
+                os.replace(tmp_file, out_file)
+            except Exception:
+                # the pipeline runs as it is written out, don't leave a
+                # partial output behind if it fails
+                try:
+                    os.unlink(tmp_file)
+                except OSError:
+                    pass
+                raise
+        else:
+            key = _cache_key(in_file, db_file)
+            out_file = os.path.join(CACHE_DIR, key + '.ngc')
+            if os.path.isfile(out_file):
+                return in_file, out_file, None, time.perf_counter() - start, 0, None
+            fh = _open_cache(key)
+            if fh is None:
+                raise IOError('Failed to open output cache')
+            done = False
+            try:
+                p.dump_parsed(lines, fh)
+                done = True
+            finally:
+                _close_cache(key, fh,
+                             {'input': os.path.realpath(in_file),
+                              'cutchart': p.active_cutchart,
+                              'created': time.time()},
+                             keep=done and p.errors == 0, prune=False)
+            if p.errors:
+                out_file = None
+        return in_file, out_file, p._line_num, time.perf_counter() - start, p.errors, None
+    except Exception as e:
+        LOG.error('Failed to process %s', in_file, exc_info=True)
+        return in_file, None, 0, time.perf_counter() - start, 0, str(e)
+
+
+def batch_main(args):
+    global PLASMADB
+
+    files = _batch_inputs(args['<path>'])
+    jobs = int(args['--jobs'] or os.cpu_count() or 1)
+
+    db_connect_str = _db_connect_str()
+    db_file = None
+    if args['--cache']:
+        if not CACHE_ENABLED or db_connect_str is not None:
+            print('The preprocessor cache is disabled or not supported for this DB', file=sys.stderr)
+            return 1
+        db_file = normalizePath(path='plasma_table.db', base=os.getenv('CONFIG_DIR', '~/'))
+
+    # every worker is forked from here and shares this one snapshot of
+    # the cut charts, rather than each opening and querying the DB
+    PLASMADB = _connect_db(db_connect_str)
+    PLASMADB.preload_cuts()
+
+    LOG.info('Batch processing %d files with %d workers', len(files), jobs)
+    start = time.perf_counter()
+    total_lines = 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork')) as pool:
+        futures = [pool.submit(_batch_file, f, db_file) for f in files]
+        for future in as_completed(futures):
+            in_file, out_file, line_count, elapsed, errors, failure = future.result()
+            if failure is not None:
+                failed += 1
+                print(f'FAILED  {in_file}: {failure}')
+            elif line_count is None:
+                print(f'{elapsed:7.3f}s  already cached  {in_file}')
+            else:
+                total_lines += line_count
+                note = f' ({errors} errors)' if errors else ''
+                print(f'{elapsed:7.3f}s  {line_count:8d} lines  {in_file} -> {out_file or "not cached"}{note}')
+    total = time.perf_counter() - start
+
+    if db_file is not None:
+        try:
+            _prune_cache()
+        except Exception:
+            LOG.debug('Failed to prune output cache', exc_info=True)
+    PLASMADB.terminate()
+
+    summary = 'Processed {} files, {} lines in {:.3f}s with {} workers ({:.1f} files/s, {:.0f} lines/s)'.format(
+        len(files), total_lines, total, jobs, len(files) / total if total else 0,
+        total_lines / total if total else 0)
+    print(summary)
+    LOG.info(summary)
+    return 1 if failed else 0
+
+
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
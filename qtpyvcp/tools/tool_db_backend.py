@@ -1,16 +1,60 @@
 #!/usr/bin/env python3
 
-import os
+"""Tool Database Backend - serves the LinuxCNC tool database from SQLite
+
+    Implements the LinuxCNC tooldb interface for the QtPyVCP tool
+    database. All tools are loaded into memory at startup and LinuxCNC's
+    get requests are answered from there, so a tool change does not
+    wait on the database.
+
+    Tool edits (put) and spindle loads are applied in memory straight
+    away and written back to the database by a background thread every
+    FLUSH_INTERVAL seconds, all changes since the last write in one
+    transaction. Pending changes are written on exit.
+
+    Before answering a get request the SQLite data version is checked,
+    and if another connection, such as the tool table in the GUI, has
+    changed the database the tools are reloaded from it.
+"""
+
 import sys
-import re
+import signal
+import threading
 
 from tooldb import tooldb_callbacks # functions (g,p,l,u)
 from tooldb import tooldb_tools     # list of tool numbers
 from tooldb import tooldb_loop      # main loop
 
-from qtpyvcp.lib.db_tool.base import Session, Base, engine
+from qtpyvcp.lib.db_tool.base import Session, Base, getEngine
 from qtpyvcp.lib.db_tool.tool_table import ToolTable, Tool
 
+# seconds between writes of changed tools to the database
+FLUSH_INTERVAL = 0.5
+
+# Tool columns by tool line letter, in the order get requests send them
+TOOL_COLUMNS = {
+    'T': 'tool_no',
+    'P': 'pocket',
+    'D': 'diameter',
+    'X': 'x_offset',
+    'Y': 'y_offset',
+    'Z': 'z_offset',
+    'A': 'a_offset',
+    'B': 'b_offset',
+    'C': 'c_offset',
+    'U': 'u_offset',
+    'V': 'v_offset',
+    'W': 'w_offset',
+    'I': 'i_offset',
+    'J': 'j_offset',
+    'Q': 'q_offset',
+}
+
+# letters only sent when they are set
+OPTIONAL_COLUMNS = 'IJQ'
+
+INT_COLUMNS = 'TP'
+
 # Catch unhandled exceptions
 def excepthook(exc_type, exc_msg, exc_tb):
     print(exc_type, file=sys.stderr)
@@ -21,146 +65,279 @@ def excepthook(exc_type, exc_msg, exc_tb):
 sys.excepthook = excepthook
 
 
+def parseToolLine(params):
+    """Parse a LinuxCNC tool line into a dict of Tool column values.
+
+    Offsets missing from the line are zero, the remark is only set if
+    the line has a comment.
+    """
+    data, sep, comment = params.partition(';')
+
+    tool = {column: 0.0 for letter, column in TOOL_COLUMNS.items()
+            if letter not in INT_COLUMNS}
+    for word in data.split():
+        letter = word[0].upper()
+        column = TOOL_COLUMNS.get(letter)
+        if column is None:
+            continue
+        try:
+            if letter in INT_COLUMNS:
+                tool[column] = int(word[1:])
+            else:
+                tool[column] = float(word[1:])
+        except ValueError:
+            print(f"Bad value for {letter} in tool line: {params}", file=sys.stderr)
+
+    if sep:
+        tool['remark'] = comment.strip()
+
+    return tool
+
+
+def formatToolLine(tool):
+    """Format a dict of Tool column values as a LinuxCNC tool line."""
+    items = []
+    for letter, column in TOOL_COLUMNS.items():
+        value = tool.get(column)
+        if value is None or (letter in OPTIONAL_COLUMNS and not value):
+            continue
+        items.append(f"{letter}{value}")
+
+    remark = tool.get('remark')
+    if remark:
+        items.append(f";{remark}")
+
+    return " ".join(items)
+
+
+class ToolWriter(threading.Thread):
+    """Writes changed tools to the database in the background."""
+
+    def __init__(self, interval=FLUSH_INTERVAL):
+        super(ToolWriter, self).__init__(name='ToolWriter', daemon=True)
+        self.interval = interval
+        self.writes = 0
+
+        # held while writing, so no changes are half way to the database
+        # while it holds this lock
+        self.flush_lock = threading.Lock()
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stop_event = threading.Event()
+
+    def queue(self, tool_no, values):
+        """Queue Tool column values to be written for a tool."""
+        with self._lock:
+            self._pending.setdefault(tool_no, {}).update(values)
+
+    def pending(self):
+        """Returns a copy of the queued changes not written yet."""
+        with self._lock:
+            return {tool_no: dict(values) for tool_no, values in self._pending.items()}
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Write all queued changes in one transaction."""
+        with self.flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+
+        session = Session()
+        try:
+            ids = dict(session.query(Tool.tool_no, Tool.id)
+                       .filter(Tool.tool_no.in_(list(pending))))
+
+            updates = []
+            inserts = []
+            for tool_no, values in pending.items():
+                if tool_no in ids:
+                    updates.append(dict(values, id=ids[tool_no]))
+                else:
+                    inserts.append(dict(values, tool_no=tool_no, tool_table_id=1))
+
+            if updates:
+                session.bulk_update_mappings(Tool, updates)
+            if inserts:
+                session.bulk_insert_mappings(Tool, inserts)
+            session.commit()
+            self.writes += 1
+
+        except Exception as e:
+            session.rollback()
+            print(f"Error writing tools {sorted(pending)}: {e}", file=sys.stderr)
+
+            # try again on the next flush, keeping any newer changes
+            with self._lock:
+                for tool_no, values in pending.items():
+                    self._pending[tool_no] = dict(values, **self._pending.get(tool_no, {}))
+
+        finally:
+            session.close()
+
+    def stop(self):
+        """Stop the thread and write any queued changes."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.flush()
+
+
 class DataBaseManager():
-    def __init__(self):
+    def __init__(self, writer=None):
         super(DataBaseManager, self).__init__()
-        self.session = None
-        
+
+        engine = getEngine()
         Base.metadata.create_all(engine)
-        
-        self.session = Session()
-        
-        tools = self.session.query(Tool).all()
-        tool_list = list()
-
-        for tool in tools:
-            tool_list.append(tool.tool_no)
-    
-        tooldb_tools(tool_list)
+
+        self.tools = dict()
+        self.lines = dict()
+        self.tool_list = list()
+        self.tool_in_spindle = 0
+
+        # connection kept open to check the data version on, it changes
+        # when another connection commits to the database
+        self._version_conn = None
+        self._data_version = None
+        if engine.url.get_backend_name() == 'sqlite':
+            self._version_conn = engine.raw_connection()
+
+        self.writer = writer or ToolWriter()
+
+        self.tool_in_spindle = self._loadTools()
+
+        self.writer.start()
+
+        tooldb_tools(self.tool_list)
         tooldb_callbacks(self.user_get_tool,
                          self.user_put_tool,
                          self.user_load_spindle,
                          self.user_unload_spindle)
-            
-        
-        self.tool_list = tool_list
-        
-        self.tools = dict()
 
-  
     def close(self):
-        self.session.close()
+        self.writer.stop()
+        if self._version_conn is not None:
+            self._version_conn.close()
+            self._version_conn = None
 
-    def user_get_tool(self, tool_no):
-        print(f"GET tool {tool_no}", file = sys.stderr)
-
-        tool = self.session.query(Tool).filter(Tool.tool_no == tool_no).one()
-        
-        data = [f"T{tool.tool_no}",
-                f"P{tool.pocket}",
-                f"D{tool.diameter}",
-                f"X{tool.x_offset}",
-                f"Y{tool.y_offset}",
-                f"Z{tool.z_offset}",
-                f"A{tool.a_offset}",
-                f"B{tool.b_offset}",
-                f"C{tool.c_offset}",
-                f"U{tool.u_offset}",
-                f"V{tool.v_offset}",
-                f"W{tool.w_offset}"]
-
-        return " ".join(data)
+    def reloadIfChanged(self):
+        """Reload the tools if the database has changed since they were loaded.
+
+        Returns:
+            bool : True if the tools were reloaded.
+        """
+        if self._version_conn is None or self._dataVersion() == self._data_version:
+            return False
 
+        # the writer's own commits change the data version too, reloading
+        # after them is harmless as the tools are the same
+        tool_list = self.tool_list
+        self._loadTools()
+
+        if self.tool_list != tool_list:
+            tooldb_tools(self.tool_list)
+
+        return True
+
+    def user_get_tool(self, tool_no):
+        self.reloadIfChanged()
+        return self.lines[int(tool_no)]
 
     def user_put_tool(self, toolno, params):
-        print(f"PUT tool {toolno} {params}", file=sys.stderr)
-        
-        tool = self.session.query(Tool).filter(Tool.tool_no==toolno).one()
-        params_list = re.split(r'   | |;', params)
-        
-        tool_dict = dict()
-        
-        for param in params_list:
-            column = param[0]
-            value = param[1::]
-            tool_dict[column] = value
-
-        tool.tool_no = tool_dict.get("T")
-        tool.pocket = tool_dict.get("P")
-        tool.x_offset = tool_dict.get("X")
-        tool.y_offset = tool_dict.get("Y")
-        tool.z_offset = tool_dict.get("Z")
-        tool.a_offset = tool_dict.get("A")
-        tool.b_offset = tool_dict.get("B")
-        tool.c_offset = tool_dict.get("C")
-        tool.i_offset = tool_dict.get("I")
-        tool.j_offset = tool_dict.get("J")
-        tool.q_offset = tool_dict.get("Q")
-        tool.u_offset = tool_dict.get("U")
-        tool.v_offset = tool_dict.get("V")
-        tool.w_offset = tool_dict.get("W")
-        tool.diameter = tool_dict.get("D")
-        
-        self.session.commit()
-
-    
+        tool_no = int(toolno)
+        values = parseToolLine(params)
+        values['tool_no'] = tool_no
+
+        tool = self.tools.setdefault(tool_no, {'remark': ''})
+        tool.update(values)
+        self.lines[tool_no] = formatToolLine(tool)
+
+        self.writer.queue(tool_no, values)
+
     def user_load_spindle(self, toolno, params):
-        print(f"LOAD SPINDLE {toolno} {params}", file=sys.stderr)
-        #
-        # tno = int(toolno)
-        #
-        # TMP = toolline_to_dict(params,['T','P'])
-        # if TMP['P'] != "0": umsg("user_load_spindle_nonran_tc P=%s\n"%TMP['P'])
-        # if tno      ==  0:  umsg("user_load_spindle_nonran_tc tno=%d\n"%tno)
-        #
-        # # save restore_pocket as pocket may have been altered by apply_db_rules()
-        # D   = toolline_to_dict(self.tools[tno],all_letters)
-        # restore_pocket[tno] = D['P']
-        # D['P'] = "0"
-        #
-        # if p0tool != -1:  # accrue time for prior tool:
-        #     stop_tool_timer(p0tool)
-        #     RESTORE = toolline_to_dict(self.tools[p0tool],all_letters)
-        #     RESTORE['P'] = restore_pocket[p0tool]
-        #     self.tools[p0tool] = dict_to_toolline(RESTORE,all_letters)
-        #
-        # p0tool = tno
-        # D['T'] = str(tno)
-        # D['P'] = "0"
-        # start_tool_timer(p0tool)
-        # self.tools[tno] = dict_to_toolline(D,all_letters)
-        # save_tools_to_file(db_savefile)
-    
+        self._setToolInSpindle(int(toolno))
+
     def user_unload_spindle(self, toolno, params):
-        print(f"UNLOAD SPINDLE {toolno} {params}", file=sys.stderr)
-        #
-        # tno = int(toolno)
-        #
-        # if p0tool == -1: return # ignore
-        # TMP = toolline_to_dict(params,['T','P'])
-        # if tno       !=  0:  umsg("user_unload_spindle_nonran_tc tno=%d\n"%tno)
-        # if TMP['P']  != "0": umsg("user_unload_spindle_nonran_tc P=%s\n"%TMP['P'])
-        #
-        # stop_tool_timer(p0tool)
-        # D = toolline_to_dict(self.tools[p0tool],all_letters)
-        # D['T'] = str(p0tool)
-        # D['P'] = restore_pocket[p0tool]
-        # self.tools[p0tool] = dict_to_toolline(D,all_letters)
-        #
-        # p0tool = -1
-        # save_tools_to_file(db_savefile)
+        self._setToolInSpindle(0)
+
+    def _setToolInSpindle(self, tool_no):
+        if tool_no == self.tool_in_spindle:
+            return
+
+        if self.tool_in_spindle in self.tools:
+            self.writer.queue(self.tool_in_spindle, {'in_use': False})
+        if tool_no in self.tools:
+            self.writer.queue(tool_no, {'in_use': True})
+
+        self.tool_in_spindle = tool_no
+
+    def _dataVersion(self):
+        cursor = self._version_conn.cursor()
+        try:
+            cursor.execute('PRAGMA data_version')
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _loadTools(self):
+        # returns the number of the tool marked in use in the database,
+        # no writes are in progress while the writer's flush lock is held,
+        # so every change is either in the database or still queued
+        with self.writer.flush_lock:
+            if self._version_conn is not None:
+                self._data_version = self._dataVersion()
+
+            tools = dict()
+            tool_in_spindle = 0
+            columns = [getattr(Tool, column) for column in TOOL_COLUMNS.values()]
+            session = Session()
+            try:
+                for row in session.query(Tool.remark, Tool.in_use, *columns):
+                    tool = dict(zip(TOOL_COLUMNS.values(), row[2:]), remark=row.remark)
+                    tools[tool['tool_no']] = tool
+                    if row.in_use:
+                        tool_in_spindle = tool['tool_no']
+            finally:
+                session.close()
+
+            pending = self.writer.pending()
+
+        # put the edits not written yet back over the database values
+        for tool_no, values in pending.items():
+            values = {column: value for column, value in values.items()
+                      if column != 'in_use'}
+            if values:
+                tools.setdefault(tool_no, {'remark': ''}).update(values)
+
+        self.tools = tools
+        self.lines = {tool_no: formatToolLine(tool) for tool_no, tool in tools.items()}
+        self.tool_list = list(tools)
+
+        return tool_in_spindle
 
 
 def main():
-    
+
+    # let the finally below write pending changes when LinuxCNC stops us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     tool_db_man = DataBaseManager()
-    
+
     try:
         tooldb_loop()  # loop forever, use callbacks
     except Exception as e:
         print(f"Exception = {e}", file=sys.stderr)
-    
-    tool_db_man.close()
+    finally:
+        tool_db_man.close()
 
 if __name__ == "__main__":
     main()
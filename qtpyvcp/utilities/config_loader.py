@@ -1,5 +1,10 @@
 import os
+import re
 import sys
+import time
+import pickle
+import hashlib
+
 import hiyapyco
 from jinja2.nativetypes import NativeEnvironment
 from jinja2 import Environment, FileSystemLoader, Undefined, make_logging_undefined
@@ -14,12 +19,46 @@ hiyapyco.logger = hiyapyco_logger
 
 LogUndefined = make_logging_undefined(logger=LOG, base=Undefined)
 
+# Merged config cache, set QTPYVCP_CONFIG_CACHE=0 to disable
+CACHE_ENABLED = os.getenv('QTPYVCP_CONFIG_CACHE', '1').lower() not in ['0', 'false', 'off', 'no']
+CACHE_DIR = os.path.join(os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                         'qtpyvcp', 'config')
+CACHE_VERSION = 1
+
+# matches env.VAR, env['VAR'] and env.get('VAR') in template sources
+ENV_REF_RE = re.compile(r"""\benv(?:\.get\(\s*|\[\s*|\.)['"]?(\w+)""")
+
+
+class TrackingFileSystemLoader(FileSystemLoader):
+    """FileSystemLoader that records every template file it reads, and
+    the environment variables those templates reference, so that the
+    merged config can be invalidated when any of them change."""
+
+    def __init__(self, *args, **kwargs):
+        super(TrackingFileSystemLoader, self).__init__(*args, **kwargs)
+        self.dependencies = []
+        self.env_vars = set()
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super(TrackingFileSystemLoader, self) \
+            .get_source(environment, template)
+        if filename not in self.dependencies:
+            self.dependencies.append(filename)
+        self.env_vars.update(ENV_REF_RE.findall(source))
+        return source, filename, uptodate
+
+
 def load_config_files(*files):
     """Load and merge YAML config files.
 
     Files that come earlier in the list take precedence over files
     that come later in the list.
 
+    The merged result is cached on disk, keyed by the list of files, and is
+    reused as long as none of the files (or any files they include) have
+    changed and none of the environment variables they reference have
+    changed. Set ``QTPYVCP_CONFIG_CACHE=0`` to disable the cache.
+
     Args:
         *files (list) : Variable number of file paths.
 
@@ -38,16 +77,25 @@ def load_config_files(*files):
     # hiyapyco merges in order least important to most important
     files.reverse()
 
-    expanded_files = process_templates(files)
+    cfg_dict = None
+    if CACHE_ENABLED:
+        cfg_dict = _read_cache(files)
+
+    if cfg_dict is None:
+        loader = TrackingFileSystemLoader(searchpath=[os.path.dirname(file) for file in files])
+        expanded_files = process_templates(files, loader=loader)
 
-    hiyapyco.jinja2env = NativeEnvironment(variable_start_string='(',
-                                           variable_end_string=')',
-                                           undefined=LogUndefined)
+        hiyapyco.jinja2env = NativeEnvironment(variable_start_string='(',
+                                               variable_end_string=')',
+                                               undefined=LogUndefined)
 
-    cfg_dict = hiyapyco.load(expanded_files,
-                             method=hiyapyco.METHOD_MERGE,
-                             interpolate=True,
-                             failonmissingfiles=True)
+        cfg_dict = hiyapyco.load(expanded_files,
+                                 method=hiyapyco.METHOD_MERGE,
+                                 interpolate=True,
+                                 failonmissingfiles=True)
+
+        if CACHE_ENABLED:
+            _write_cache(files, loader.dependencies, loader.env_vars, cfg_dict)
 
     if LOG.getEffectiveLevel() == logLevelFromName("DEBUG"):
         LOG.debug("Merged YAML config:\n\n%s\n",
@@ -57,8 +105,11 @@ def load_config_files(*files):
     return cfg_dict
 
 
-def process_templates(files):
-    env = Environment(loader=FileSystemLoader(searchpath=[os.path.dirname(file) for file in files]),
+def process_templates(files, loader=None):
+    if loader is None:
+        loader = FileSystemLoader(searchpath=[os.path.dirname(file) for file in files])
+
+    env = Environment(loader=loader,
                       undefined=LogUndefined,
                       )
 
@@ -82,3 +133,123 @@ def process_templates(files):
 def load_config_files_from_env():
     files = os.getenv('VCP_CONFIG_FILES', '').split(':')
     return load_config_files(*files)
+
+
+def _cache_file(files):
+    key = hashlib.sha1(repr((CACHE_VERSION,
+                             sys.version_info[:2],
+                             [os.path.realpath(f) for f in files])).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, key + '.pickle')
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_cache(files):
+    cache_file = _cache_file(files)
+    try:
+        with open(cache_file, 'rb') as fh:
+            entry = pickle.load(fh)
+    except FileNotFoundError:
+        LOG.debug('No cached config for: {}'.format(files))
+        return None
+    except Exception:
+        LOG.debug('Failed to read cached config: {}'.format(cache_file), exc_info=True)
+        return None
+
+    for path, stamp in entry['dependencies'].items():
+        if _file_stamp(path) != stamp:
+            LOG.debug('Cached config is stale, file changed: {}'.format(path))
+            return None
+
+    for var, value in entry['env'].items():
+        if os.getenv(var) != value:
+            LOG.debug('Cached config is stale, env var changed: {}'.format(var))
+            return None
+
+    LOG.debug('Loaded merged config from cache: {}'.format(cache_file))
+    return entry['config']
+
+
+def _write_cache(files, dependencies, env_vars, cfg_dict):
+    entry = {
+        'files': files,
+        'dependencies': {path: _file_stamp(path) for path in dependencies},
+        'env': {var: os.getenv(var) for var in sorted(env_vars)},
+        'created': time.time(),
+        'config': cfg_dict,
+    }
+
+    cache_file = _cache_file(files)
+    tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_file, 'wb') as fh:
+            pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except Exception:
+        LOG.debug('Failed to write config cache: {}'.format(cache_file), exc_info=True)
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def dump_config_cache(stream=sys.stdout):
+    """Print the state of the merged config cache.
+
+    Lists each cached config with the files it depends on, whether they are
+    still up to date, and the environment variables it was rendered with.
+    """
+    stream.write('Config cache dir: {} ({})\n'.format(CACHE_DIR, 'enabled' if CACHE_ENABLED else 'disabled'))
+
+    try:
+        cache_files = sorted(f for f in os.listdir(CACHE_DIR) if f.endswith('.pickle'))
+    except OSError:
+        cache_files = []
+
+    for cache_file in cache_files:
+        path = os.path.join(CACHE_DIR, cache_file)
+        try:
+            with open(path, 'rb') as fh:
+                entry = pickle.load(fh)
+        except Exception as e:
+            stream.write('\n{}\n  unreadable: {}\n'.format(cache_file, e))
+            continue
+
+        stream.write('\n{} ({} bytes, created {})\n'.format(
+            cache_file, os.path.getsize(path),
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['created']))))
+
+        for path, stamp in entry['dependencies'].items():
+            state = 'ok' if _file_stamp(path) == stamp else 'STALE'
+            stream.write('  [{}] {}\n'.format(state, path))
+
+        for var, value in entry['env'].items():
+            state = 'ok' if os.getenv(var) == value else 'STALE'
+            stream.write('  [{}] ${}={}\n'.format(state, var, value))
+
+
+def clear_config_cache():
+    """Remove all cached merged configs."""
+    try:
+        cache_files = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+
+    for cache_file in cache_files:
+        try:
+            os.remove(os.path.join(CACHE_DIR, cache_file))
+        except OSError:
+            pass
+
+
+if __name__ == '__main__':
+    if '--clear' in sys.argv[1:]:
+        clear_config_cache()
+    dump_config_cache()
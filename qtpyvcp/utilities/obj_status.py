@@ -18,7 +18,7 @@
 #   You should have received a copy of the GNU General Public License
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import linuxcnc, time, threading, subprocess, os, json
+import linuxcnc, hal, time, threading, subprocess, os, json
 from qtpy.QtCore import QObject, QTimer, Signal
 
 # Setup logging
@@ -214,14 +214,15 @@ class HALPin(QObject):
             pin_name (str):      the HAL pin name
             pin_type (str):      the HAL type for the pin, float, u32, s32 or bit
             pin_direction (str): the pin direction, IN, OUT, or I/O
-            pin_value (str):     the initial value of the HAL pin
+            pin_value (str, bool, float or int): the initial value of the HAL pin
         """
 
         self.pin_name = pin_name
-        type_map = {'float': float, 's32': int, 'u32': int, 'bit': bool}
+        type_map = {'float': float, 's32': int, 'u32': int, 's64': int,
+                    'u64': int, 'bit': bool}
         self.type = type_map.get(pin_type)
         self.settable = pin_direction in ['IN', 'I/O']
-        self.value = self.type(pin_value)
+        self.value = self.convertType(pin_value)
 
         self.log_change = False
 
@@ -257,12 +258,11 @@ class HALPin(QObject):
             self.valueChanged[self.type].disconnect()
 
     def getValue(self):
-        data = subprocess.check_output(['halcmd', '-s', 'show', 'pin', self.pin_name]).split()
-        return self.convertType(data[3])
+        return self.convertType(hal.get_value(self.pin_name))
 
     def setValue(self, value):
         if self.settable:
-            return subprocess.call(['halcmd', 'setp', self.pin_name, str(value)])
+            return hal.set_p(self.pin_name, str(value))
         raise TypeError("setValue failed, HAL pin '{}' is read only".format(self.pin_name))
 
     def getSettable(self):
@@ -279,37 +279,51 @@ class HALPin(QObject):
         return self.log_change
 
     def convertType(self, value):
-        if self.type == bool:
-            return value.lower() in ['true', '1']
+        if isinstance(value, str):
+            if self.type == bool:
+                return value.lower() in ['true', '1']
+            if self.type == int:
+                # halcmd shows u32 values in hex
+                return int(value, 0)
         return self.type(value)
 
 
 class HALPoller(QObject):
-    """docstring for StatusPoller"""
-    def __init__(self):
+    """Polls the values of the HAL pins that have been asked for.
+
+    Pin values are read in-process through the ``hal`` module, only for
+    the pins that have a HALPin object, so no halcmd process is started
+    each cycle. Each cycle takes a snapshot of the pin values, already of
+    the pin's type, and the HALPin objects of the pins whose value changed
+    since the last snapshot are updated.
+
+    The ``hal`` module can only read pins once the process has created a
+    HAL component, as the QtPyVCP launcher does before loading plugins.
+    """
+    def __init__(self, start=True):
         super(HALPoller, self).__init__()
 
         self.cycle_time = 50
         self.linuxcnc_is_alive = False
 
         self.status_items = {}
-        self.pin_dict = {}
-        self.sig_dict = {}
+        self.pin_dict = {}      # pin name -> value as of the last snapshot
+
+        self._pin_info = None   # pin name -> (type, direction, value)
+        self._failed_pins = set()
 
-        # Create a thread for checking the HAL pins and sigs
+        # Create a thread for checking the HAL pins
         self.hal_mutex = threading.Lock()
         self.hal_thread = threading.Thread(target=self.hal_poll_thread)
         self.hal_thread.daemon = True
-        self.hal_thread.start()
+        if start:
+            self.hal_thread.start()
 
-
-    # halcmd can take 200ms or more to run, so run poll updates in a thread so as not to slow the server
-    # requests for hal pins and sigs will read the results from the most recent update
+    # run poll updates in a thread so as not to slow the GUI, requests for
+    # hal pins will read the results from the most recent update
     def hal_poll_thread(self):
 
         while True:
-            # s = time.time()
-
             # first, check if linuxcnc is running at all
             if not os.path.isfile( '/tmp/linuxcnc.lock' ):
                 self.hal_mutex.acquire()
@@ -318,7 +332,8 @@ class HALPoller(QObject):
                         log.debug("LinuxCNC has stopped.")
                     self.linuxcnc_is_alive = False
                     self.pin_dict = {}
-                    self.sig_dict = {}
+                    self._pin_info = None
+                    self._failed_pins = set()
                 finally:
                     self.hal_mutex.release()
                 time.sleep(self.cycle_time/1000.0)
@@ -328,67 +343,105 @@ class HALPoller(QObject):
                     log.debug("LinuxCNC has started.")
                 self.linuxcnc_is_alive = True
 
-            self.p = subprocess.Popen( ['halcmd', '-s', 'show', 'pin'] , stderr=subprocess.PIPE, stdout=subprocess.PIPE )
-            rawtuple = self.p.communicate()
-            if len(rawtuple[0]) <= 0:
-                time.sleep(self.cycle_time/1000.0)
-                continue
-            raw = rawtuple[0].split('\n')
+            self.poll()
+
+            # before starting the next check, sleep a little so we don't use all the CPU
+            time.sleep(self.cycle_time/1000.0)
+
+    def poll(self):
+        """Snapshot the subscribed pins and update those that changed.
 
-            pins = [ [a for a in [x.strip() for x in line.split(' ')] if a != ''] for line in raw ]
+        Returns:
+            list : The names of the pins whose value changed.
+        """
+        with self.hal_mutex:
+            status_items = list(self.status_items.items())
 
-            # UPDATE THE DICTIONARY OF PIN INFO
-            # Acquire the mutex so we don't step on other threads
-            self.hal_mutex.acquire()
+        old_pin_dict = self.pin_dict
+        pin_dict = {}
+        changed_items = []
+        for pin_name, si in status_items:
             try:
-                pin_dict = {}
-                sig_dict = {}
+                value = si.type(hal.get_value(pin_name))
+            except Exception as e:
+                # the pin's component may have been unloaded, only log
+                # the first failure until the pin can be read again
+                if pin_name not in self._failed_pins:
+                    self._failed_pins.add(pin_name)
+                    log.warning("Could not read HAL pin %s: %s", pin_name, e)
+                continue
 
-                for p in pins:
-                    if len(p) > 5:
-                        # if there is a signal listed on this pin, make sure
-                        # that signal is in our signal dictionary
-                        sig_dict[ p[6] ] = p[3]
-                    if len(p) >= 5:
-                        pin_dict[ p[4] ] = p[3]
-            finally:
-                self.hal_mutex.release()
+            self._failed_pins.discard(pin_name)
+            pin_dict[pin_name] = value
+            if old_pin_dict.get(pin_name) != value:
+                changed_items.append((si, value))
 
-            changed_items = set(pin_dict.items()) - set(self.pin_dict.items())
-            # for item in changed_items:
-            #     print('HAL pin Changed: {} => {}'.format(item[0], item[1]))
+        self.pin_dict = pin_dict
 
-            self.pin_dict = pin_dict
-            self.sig_dict = sig_dict
+        for si, value in changed_items:
+            si.update(value)
 
-            for changed_item in changed_items:
-                if changed_item[0] in self.status_items:
-                    self.status_items[changed_item[0]].update(changed_item[1])
+        return [si.pin_name for si, value in changed_items]
 
-            # print(time.time() - s)
-            # print(json.dumps(pin_dict, indent=4, sort_keys=True))
+    def getPinInfo(self, pin_name):
+        """Returns (type, direction, value) of a HAL pin, or None.
 
-            # before starting the next check, sleep a little so we don't use all the CPU
-            time.sleep(self.cycle_time/1000.0)
+        The type and direction are as shown by halcmd, e.g. 'float' and
+        'I/O'.
+        """
+        if self._pin_info is None or pin_name not in self._pin_info:
+            # cache the info of all pins, pins may have been added since
+            self._pin_info = self._readPinInfo()
+        return self._pin_info.get(pin_name)
+
+    def findPins(self, prefix):
+        """Returns the names of the HAL pins starting with prefix."""
+        if self._pin_info is None:
+            self._pin_info = self._readPinInfo()
+        return sorted(name for name in self._pin_info if name.startswith(prefix))
+
+    def _readPinInfo(self):
+        get_info_pins = getattr(hal, 'get_info_pins', None)
+        if get_info_pins is None:
+            # hal module too old to list pins, ask halcmd once
+            raw = subprocess.check_output(['halcmd', '-s', 'show', 'pin'],
+                                          universal_newlines=True)
+            pin_info = {}
+            for line in raw.splitlines():
+                pin_data = line.split()
+                if len(pin_data) >= 5:
+                    pin_info[pin_data[4]] = (pin_data[1], pin_data[2], pin_data[3])
+            return pin_info
+
+        types = {getattr(hal, 'HAL_' + name.upper()): name
+                 for name in ('bit', 'float', 's32', 'u32', 's64', 'u64')
+                 if hasattr(hal, 'HAL_' + name.upper())}
+        directions = {hal.HAL_IN: 'IN', hal.HAL_OUT: 'OUT', hal.HAL_IO: 'I/O'}
+
+        pin_info = {}
+        for pin in get_info_pins():
+            value = pin['VALUE']
+            pin_type = types.get(pin.get('TYPE'))
+            if pin_type is None:
+                pin_type = 'bit' if isinstance(value, bool) else \
+                    'float' if isinstance(value, float) else 's32'
+            pin_info[pin['NAME']] = (pin_type, directions.get(pin['DIRECTION']), value)
+        return pin_info
 
     def getHALPin(self, pin_name):
         si = self.status_items.get(pin_name)
         if si is None:
-            raw = subprocess.check_output(['halcmd', '-s', 'show', 'pin', pin_name]).strip()
-            if len(raw.split('\n')) > 1: # more than one pin name matches
+            info = self.getPinInfo(pin_name)
+            if info is None:
+                matches = self.findPins(pin_name)
+                if len(matches) == 1: # name is not complete, but only one pin could match
+                    raise ValueError("HAL pin red<{}> does not exist, did you mean green<{}>?".format(pin_name, matches[0]))
                 raise ValueError("HAL pin red<{}> does not exist".format(pin_name))
-            pin_data = raw.split()
-            if len(pin_data) == 0: # no pin names match
-                raise ValueError("HAL pin red<{}> does not exist".format(pin_name))
-                return
-            if pin_name != pin_data[4]: # name is not complete, but only one pin could match
-                raise ValueError("HAL pin red<{}> does not exist, did you mean green<{}>?".format(pin_name, pin_data[4]))
-            pin_type = pin_data[1].strip()
-            pin_direction = pin_data[2].strip()
-            pin_value = pin_data[3].strip()
+            pin_type, pin_direction, pin_value = info
             log.debug("Adding new HALStatusItem for pin '{}'".format(pin_name))
             si = HALPin(pin_name, pin_type, pin_direction, pin_value)
-            self.status_items[pin_name] = si
+            with self.hal_mutex:
+                self.status_items[pin_name] = si
         return si
 
 class HALStatus(QObject):
@@ -446,6 +499,11 @@ if __name__ == '__main__':
     hal_pos_label = QLabel("joint.0.pos-cmd =")
     hal_pos_dro = QLabel("0.12345")
 
+    # the hal module can only read and set pins once this process has a
+    # HAL component, the QtPyVCP launcher makes one named `qtpyvcp`
+    hal_comp = hal.component('qtpyvcp-demo')
+    hal_comp.ready()
+
     # Initialize the HALStatus object
     hal_stat = HALStatus()
 
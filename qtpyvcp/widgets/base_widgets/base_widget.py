@@ -8,6 +8,8 @@ all other QtPyVCP widgets are based.
 
 import os
 import json
+import itertools
+import weakref
 
 from qtpy.QtCore import Property, Slot
 from qtpy.QtWidgets import QPushButton
@@ -17,6 +19,17 @@ from qtpyvcp.utilities.logger import getLogger
 
 LOG = getLogger(__name__)
 
+# VCP widgets in the order they were created, so the application can
+# initialize and terminate them without walking every QWidget it contains.
+_VCP_WIDGETS = weakref.WeakValueDictionary()
+_VCP_WIDGET_IDS = itertools.count()
+
+
+def iterVCPWidgets():
+    """Returns a list of all existing VCP widgets, in creation order."""
+    return list(_VCP_WIDGETS.values())
+
+
 class ChanList(list):
     """Channel value list.
 
@@ -36,6 +49,15 @@ class VCPPrimitiveWidget(object):
     def __init__(self, parent=None):
         super(VCPPrimitiveWidget, self).__init__()
 
+        widget_id = next(_VCP_WIDGET_IDS)
+        _VCP_WIDGETS[widget_id] = self
+
+        # drop the widget as soon as the underlying Qt object is deleted
+        try:
+            self.destroyed.connect(lambda *args: _VCP_WIDGETS.pop(widget_id, None))
+        except (AttributeError, RuntimeError):
+            pass
+
     def initialize(self):
         """This method is called right before the main application starts."""
         pass
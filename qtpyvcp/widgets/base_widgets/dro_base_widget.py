@@ -4,9 +4,11 @@ DROBaseWidget
 
 """
 
+import re
+import time
 from enum import IntEnum
 
-from qtpy.QtCore import Slot, Property
+from qtpy.QtCore import Slot, Property, QTimer
 
 from qtpyvcp.plugins import getPlugin
 from qtpyvcp.utilities.settings import getSetting
@@ -19,6 +21,8 @@ from qtpyvcp.utilities.info import Info
 LOG = logger.getLogger(__name__)
 INFO = Info()
 
+QWIDGETSIZE_MAX = 16777215
+
 
 class Axis(IntEnum):
     ALL = -1
@@ -43,6 +47,46 @@ class LatheMode(IntEnum):
     Diameter = 2  # Always show diameter
 
 
+class DROUpdater(object):
+    """Per axis position update dispatcher.
+
+    There is one updater per position channel, and it is the only slot
+    connected to it. When the channel updates only the DROs of the axes
+    whose value actually changed are updated, so jogging one axis does
+    not reformat every DRO on the screen.
+    """
+
+    _updaters = {}
+
+    def __init__(self, channel):
+        self._dros = [[] for anum in range(9)]
+        self._last = channel.getValue()
+        channel.notify(self.update)
+
+    @classmethod
+    def forChannel(cls, channel):
+        """Returns the updater for a position channel, creating it if needed."""
+        updater = cls._updaters.get(channel)
+        if updater is None:
+            updater = cls._updaters[channel] = cls(channel)
+        return updater
+
+    def register(self, dro, anum):
+        self._dros[anum].append(dro)
+
+    def unregister(self, dro):
+        for dros in self._dros:
+            if dro in dros:
+                dros.remove(dro)
+
+    def update(self, pos):
+        last, self._last = self._last, pos
+        for anum, dros in enumerate(self._dros):
+            if dros and (last is None or pos[anum] != last[anum]):
+                for dro in dros:
+                    dro.positionChanged(pos)
+
+
 class DROBaseWidget(VCPWidget):
     """DROBaseWidget
 
@@ -79,6 +123,15 @@ class DROBaseWidget(VCPWidget):
         self._fmt = self._in_fmt
         self._input_type = 'number:float'
 
+        # display
+        self._text = None
+        self._updater = None
+        self._fixed_text_width = False
+        self._max_refresh_rate = 0
+        self._last_refresh = 0
+        self._pending_pos = None
+        self._refresh_timer = None
+
         self.updateValue()
 
         self.status.program_units.notify(self.updateUnits, 'string')
@@ -106,10 +159,12 @@ class DROBaseWidget(VCPWidget):
 
         # force update
         self.updateValue()
+        self.updateFixedSize()
 
     def initialize(self):
-        getattr(self.pos, self._ref_typ.name).notify(self.updateValue)
+        self.connectPosition()
         self.updateValue()
+        self.updateFixedSize()
 
         if self._is_lathe:
             self.status.gcodes.notify(self.updateDiameterMode)
@@ -130,6 +185,63 @@ class DROBaseWidget(VCPWidget):
             except AttributeError:  # settings not found
                 pass
 
+    def connectPosition(self):
+        """(Re)register with the updater for the current reference type."""
+        if self._updater is not None:
+            self._updater.unregister(self)
+        else:
+            self.destroyed.connect(lambda: self._updater.unregister(self))
+
+        channel = getattr(self.pos, self._ref_typ.name)
+        self._updater = DROUpdater.forChannel(channel)
+        self._updater.register(self, self._anum)
+
+    def positionChanged(self, pos):
+        """Called by the DROUpdater when the position of our axis changes."""
+        if self._max_refresh_rate > 0:
+            interval = 1.0 / self._max_refresh_rate
+            elapsed = time.time() - self._last_refresh
+            if elapsed < interval:
+                # show the latest position at the end of the interval
+                self._pending_pos = pos
+                if not self._refresh_timer.isActive():
+                    self._refresh_timer.start(int((interval - elapsed) * 1000) + 1)
+                return
+
+            self._refresh_timer.stop()
+            self._pending_pos = None
+            self._last_refresh = time.time()
+
+        self.updateValue(pos)
+
+    def _refreshPending(self):
+        pos, self._pending_pos = self._pending_pos, None
+        if pos is not None:
+            self._last_refresh = time.time()
+            self.updateValue(pos)
+
+    def setDisplayText(self, text):
+        """Set the text, skipping the redraw if it has not changed."""
+        if text != self._text:
+            self._text = text
+            self.setText(text)
+
+    def updateFixedSize(self):
+        """Fix the widget size to fit the widest value of the current format.
+
+        With a fixed size value changes do not make the parent layout
+        recalculate. Only done if `fixedTextWidth` is set.
+        """
+        if not self._fixed_text_width:
+            return
+
+        self.ensurePolished()
+        text = self.text()
+        self.setText(re.sub(r'\d', '8', self._fmt % -88888.88888))
+        hint = self.sizeHint()
+        self.setText(text)
+        self.setFixedSize(hint)
+
     def updateDiameterMode(self, gcodes):
         self._g7_active = 'G7' in gcodes
         self.updateValue()
@@ -142,12 +254,12 @@ class DROBaseWidget(VCPWidget):
         if self._is_lathe and self._anum == Axis.X:
             if self._lathe_mode == LatheMode.Diameter or \
                     (self._lathe_mode == LatheMode.Auto and self._g7_active):
-                self.setText(self._fmt % (pos[self._anum] * 2))
+                self.setDisplayText(self._fmt % (pos[self._anum] * 2))
             else:
-                self.setText(self._fmt % pos[self._anum])
+                self.setDisplayText(self._fmt % pos[self._anum])
 
         else:
-            self.setText(self._fmt % pos[self._anum])
+            self.setDisplayText(self._fmt % pos[self._anum])
 
     @Property(int)
     def referenceType(self):
@@ -156,6 +268,8 @@ class DROBaseWidget(VCPWidget):
     @referenceType.setter
     def referenceType(self, ref_type):
         self._ref_typ = RefType(ref_type)
+        if self._updater is not None:
+            self.connectPosition()
         self.updateValue()
 
     @Property(int)
@@ -168,7 +282,10 @@ class DROBaseWidget(VCPWidget):
         if axis in [3, 4, 5]:
             self._angular_axis = True
             self._fmt = self._deg_fmt
+        if self._updater is not None:
+            self.connectPosition()
         self.updateValue()
+        self.updateFixedSize()
 
     @Property(str)
     def inchFormat(self):
@@ -253,6 +370,44 @@ class DROBaseWidget(VCPWidget):
     def useGlobalDroFormatSettings(self, use_fmt_settings):
         self._use_global_fmt_settings = use_fmt_settings
 
+    @Property(bool)
+    def fixedTextWidth(self):
+        """Fix the widget size to fit the widest value of the current format.
+
+        Avoids relayouts of the parent as the value changes.
+        """
+        return self._fixed_text_width
+
+    @fixedTextWidth.setter
+    def fixedTextWidth(self, fixed):
+        self._fixed_text_width = fixed
+        if fixed:
+            self.updateFixedSize()
+        else:
+            self.setMinimumSize(0, 0)
+            self.setMaximumSize(QWIDGETSIZE_MAX, QWIDGETSIZE_MAX)
+
+    @Property(int)
+    def maxRefreshRate(self):
+        """Maximum position display updates per second, 0 for no limit.
+
+        Limits how often the value is redrawn, independent of the status
+        poll rate. The last position is always shown.
+        """
+        return self._max_refresh_rate
+
+    @maxRefreshRate.setter
+    def maxRefreshRate(self, rate):
+        self._max_refresh_rate = max(0, rate)
+        if self._refresh_timer is None:
+            self._refresh_timer = QTimer(self)
+            self._refresh_timer.setSingleShot(True)
+            self._refresh_timer.timeout.connect(self._refreshPending)
+
+        if not self._max_refresh_rate:
+            self._refresh_timer.stop()
+            self._refreshPending()
+
     @Property(int)
     def latheMode(self):
         return self._lathe_mode
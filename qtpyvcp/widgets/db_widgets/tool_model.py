@@ -7,7 +7,7 @@ from qtpy.QtCore import Slot
 from qtpy.QtWidgets import QWidget, QLineEdit, QHBoxLayout, QPushButton, QFileDialog, QDialog, QLabel
 
 
-from qtpyvcp.lib.db_tool.base import Session, Base, engine
+from qtpyvcp.lib.db_tool.base import Session, Base, getEngine
 from qtpyvcp.lib.db_tool.tool_table import ToolTable, Tool, ToolModel
 
 from qtpyvcp.utilities.logger import getLogger
@@ -1 +1,21 @@
-from .vtk_backplot.vtk_backplot import VTKBackPlot
\ No newline at end of file
+"""Display Widgets
+
+VTKBackPlot is resolved by the vtk_backplot package, which imports it on
+first access, so importing this package does not pull in heavy dependencies
+that the VCP may not use.
+"""
+
+from . import vtk_backplot
+
+
+def __getattr__(name):
+    if name not in vtk_backplot._LAZY_IMPORTS:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+    obj = getattr(vtk_backplot, name)
+    globals()[name] = obj
+    return obj
+
+
+def __dir__():
+    return sorted(set(globals()) | set(vtk_backplot._LAZY_IMPORTS))
@@ -1 +1,26 @@
-from .vtk_backplot import VTKBackPlot
\ No newline at end of file
+"""VTK BackPlot
+
+Widget classes are imported on first access, so importing this package does
+not pull in heavy dependencies that the VCP may not use.
+"""
+
+import importlib
+
+# name: module, relative to this package
+_LAZY_IMPORTS = {
+    'VTKBackPlot': '.vtk_backplot',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+    module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+    obj = getattr(module, name)
+    globals()[name] = obj
+    return obj
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 
 from math import cos, sin, radians
 
@@ -16,20 +17,24 @@ from qtpyvcp.utilities import logger
 from qtpyvcp.utilities.settings import getSetting
 
 from qtpyvcp.plugins import iterPlugins, getPlugin
-from qtpyvcp.plugins.db_tool_table import DBToolTable
-
-from qtpyvcp.lib.db_tool.base import Session, Base, engine
-from qtpyvcp.lib.db_tool.tool_table import ToolTable, Tool, ToolModel
 
 LOG = logger.getLogger(__name__)
 
+
+def isDBToolTable(plugin):
+    """Check if plugin is a DBToolTable, without importing the DB tool table
+    module (and SQLAlchemy) if it is not being used."""
+    db_tool_table = sys.modules.get('qtpyvcp.plugins.db_tool_table')
+    return db_tool_table is not None and isinstance(plugin, db_tool_table.DBToolTable)
+
+
 class ToolActor(vtk.vtkActor):
     def __init__(self, linuxcncDataSource):
         super(ToolActor, self).__init__()
         self._datasource = linuxcncDataSource
         self._tool_table = self._datasource.getToolTable()
 
-        self.session = Session()
+        self.session = None
 
         tool = self._tool_table[0]
 
@@ -406,14 +411,19 @@ class ToolActor(vtk.vtkActor):
                 mapper = vtk.vtkPolyDataMapper()
                 mapper.SetInputConnection(transform_filter.GetOutputPort())
             else:
-                plugins = dict(iterPlugins())
-                tool_table_plugin = plugins["tooltable"]
+                tool_table_plugin = getPlugin("tooltable")
 
                 transform = vtk.vtkTransform()
                 # Create a mapper
                 mapper = vtk.vtkPolyDataMapper()
 
-                if isinstance(tool_table_plugin, DBToolTable):
+                if isDBToolTable(tool_table_plugin):
+                    from qtpyvcp.lib.db_tool.base import Session
+                    from qtpyvcp.lib.db_tool.tool_table import ToolModel
+
+                    if self.session is None:
+                        self.session = Session()
+
                     tool_data = self.session.query(ToolModel).filter(ToolModel.tool_no == tool.id).first()
 
                     if tool_data:
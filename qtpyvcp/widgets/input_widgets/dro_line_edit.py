@@ -66,6 +66,7 @@ class DROLineEdit(EvalLineEdit, DROBaseWidget):
     def setCurrentPos(self):
         # Run once user starts editing field.
         self.isEdited = True
+        self._text = None  # displayed text no longer matches the cache
         self.last_commanded_pos = self.status.stat.position[self._anum]
     
     def keyPressEvent(self, e):
@@ -74,6 +74,12 @@ class MDIEntry(QLineEdit, CMDWidget):
             self.setText('')
             STATUS.mdi_history.setValue(cmd)
 
+    @Slot(str)
+    def updateCompletions(self, text):
+        # offer matches from the whole history, not just the recent commands
+        self.model.setStringList(STATUS.searchMdiHistory(text, prefix=True,
+                                                         limit=self.mdi_history_size))
+
     @Slot(QListWidgetItem)
     def setMDIText(self, listItem):
         if listItem is not None:
@@ -111,6 +117,7 @@ class MDIEntry(QLineEdit, CMDWidget):
             self.setCompleter(completer)
             self.model.setStringList(history)
             STATUS.mdi_history.notify(self.model.setStringList)
+            self.textEdited.connect(self.updateCompletions)
 
         STATUS.max_mdi_history_length = self.mdi_history_size
 
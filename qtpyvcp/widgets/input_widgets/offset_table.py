@@ -78,6 +78,7 @@ class OffsetModel(QStandardItemModel):
         self._row_labels = self.ot.ROW_LABELS
 
         self._offset_table = self.ot.getOffsetTable()
+        self._edited_rows = set()
 
         self.setColumnCount(self.columnCount())
         self.setRowCount(len(self._rows))  # (self.rowCount())
@@ -93,6 +94,7 @@ class OffsetModel(QStandardItemModel):
         # update model with new data
         self.beginResetModel()
         self._offset_table = offset_table
+        self._edited_rows.clear()
         self.endResetModel()
 
     def setColumns(self, columns):
@@ -149,6 +151,7 @@ class OffsetModel(QStandardItemModel):
         index_column = self._column_labels.index(column_index)
 
         self._offset_table[rows_index][index_column] = value
+        self._edited_rows.add(rows_index)
 
         return True
 
@@ -158,6 +161,7 @@ class OffsetModel(QStandardItemModel):
             index_column = self._column_labels.index(self._columns[col])
             self._offset_table[row][index_column] = 0.0
 
+        self._edited_rows.add(row)
         self.refreshModel()
 
     def clearRows(self):
@@ -167,6 +171,7 @@ class OffsetModel(QStandardItemModel):
                 index_column = self._column_labels.index(self._columns[col])
                 self._offset_table[row][index_column] = 0.0
 
+        self._edited_rows.update(range(len(self._rows)))
         self.refreshModel()
 
     def offsetDataFromRow(self, row):
@@ -174,7 +179,9 @@ class OffsetModel(QStandardItemModel):
         return self._offset_table[o_num]
 
     def saveOffsetTable(self):
-        self.ot.saveOffsetTable(self._offset_table, columns=self._columns)
+        self.ot.saveOffsetTable(self._offset_table, columns=self._columns,
+                                rows=self._edited_rows)
+        self._edited_rows.clear()
         return True
 
     def loadOffsetTable(self):
@@ -94,22 +94,57 @@ class ToolModel(QStandardItemModel):
 
         self._tool_table = self.tt.getToolTable()
 
+        # sorted tool numbers, and tool number to row, so that data() does
+        # not have to sort the tool table for every cell it is asked for.
+        # Only rebuilt when tools are added or removed.
+        self._tnums = []
+        self._rows = {}
+        self._rebuildIndex()
+
+        self._spindle_tnum = self.stat.tool_in_spindle
+
         self.setColumnCount(self.columnCount())
         self.setRowCount(1000)  # (self.rowCount())
 
         self.status.tool_in_spindle.notify(self.refreshModel)
         self.tt.tool_table_changed.connect(self.updateModel)
 
-    def refreshModel(self):
-        # refresh model so current tool gets highlighted
-        self.beginResetModel()
-        self.endResetModel()
+    def _rebuildIndex(self):
+        # the T0 (no tool) entry is not shown in the table
+        self._tnums = sorted(self._tool_table)[1:]
+        self._rows = {tnum: row for row, tnum in enumerate(self._tnums)}
+
+    def _emitRowChanged(self, row, roles=None):
+        if 0 <= row < len(self._tnums):
+            self.dataChanged.emit(self.index(row, 0),
+                                  self.index(row, self.columnCount() - 1),
+                                  roles or [])
+
+    def refreshModel(self, tnum=None):
+        # re-highlight the rows of the previous and the new spindle tool
+        if tnum is None:
+            tnum = self.stat.tool_in_spindle
+
+        previous, self._spindle_tnum = self._spindle_tnum, tnum
+        roles = [Qt.TextColorRole, Qt.BackgroundRole]
+        for t in {previous, tnum}:
+            self._emitRowChanged(self._rows.get(t, -1), roles)
 
     def updateModel(self, tool_table):
         # update model with new data
-        self.beginResetModel()
+        old_table = self._tool_table
+        if tool_table is old_table or sorted(tool_table) != sorted(old_table):
+            # tools added or removed, or changed in place
+            self.beginResetModel()
+            self._tool_table = tool_table
+            self._rebuildIndex()
+            self.endResetModel()
+            return
+
         self._tool_table = tool_table
-        self.endResetModel()
+        for row, tnum in enumerate(self._tnums):
+            if tool_table[tnum] != old_table[tnum]:
+                self._emitRowChanged(row)
 
     def setColumns(self, columns):
         self._columns = columns
@@ -133,7 +168,7 @@ class ToolModel(QStandardItemModel):
     def data(self, index, role=Qt.DisplayRole):
         if role == Qt.DisplayRole or role == Qt.EditRole:
             key = self._columns[index.column()]
-            tnum = sorted(self._tool_table)[index.row() + 1]
+            tnum = self._tnums[index.row()]
             return self._tool_table[tnum][key]
 
         elif role == Qt.TextAlignmentRole:
@@ -146,15 +181,15 @@ class ToolModel(QStandardItemModel):
                 return Qt.AlignVCenter | Qt.AlignRight
 
         elif role == Qt.TextColorRole:
-            tnum = sorted(self._tool_table)[index.row() + 1]
-            if self.stat.tool_in_spindle == tnum:
+            tnum = self._tnums[index.row()]
+            if self._spindle_tnum == tnum:
                 return QBrush(self.current_tool_color)
             else:
                 return QStandardItemModel.data(self, index, role)
 
         elif role == Qt.BackgroundRole and self.current_tool_bg is not None:
-            tnum = sorted(self._tool_table)[index.row() + 1]
-            if self.stat.tool_in_spindle == tnum:
+            tnum = self._tnums[index.row()]
+            if self._spindle_tnum == tnum:
                 return QBrush(self.current_tool_bg)
             else:
                 return QStandardItemModel.data(self, index, role)
@@ -163,21 +198,23 @@ class ToolModel(QStandardItemModel):
 
     def setData(self, index, value, role):
         key = self._columns[index.column()]
-        tnum = sorted(self._tool_table)[index.row() + 1]
+        tnum = self._tnums[index.row()]
         self._tool_table[tnum][key] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
         return True
 
     def removeTool(self, row):
         self.beginRemoveRows(QModelIndex(), row, row)
-        tnum = sorted(self._tool_table)[row + 1]
+        tnum = self._tnums[row]
         del self._tool_table[tnum]
+        self._rebuildIndex()
         self.endRemoveRows()
         return True
 
     def addTool(self):
         try:
-            tnum = sorted(self._tool_table)[-1] + 1
-        except IndexError:
+            tnum = max(self._tool_table) + 1
+        except ValueError:
             tnum = 1
 
         row = len(self._tool_table) - 1
@@ -188,12 +225,13 @@ class ToolModel(QStandardItemModel):
 
         self.beginInsertRows(QModelIndex(), row, row)
         self._tool_table[tnum] = self.tt.newTool(tnum=tnum)
+        self._rebuildIndex()
         self.endInsertRows()
         return True
 
     def toolDataFromRow(self, row):
         """Returns dictionary of tool data"""
-        tnum = sorted(self._tool_table)[row + 1]
+        tnum = self._tnums[row]
         return self._tool_table[tnum]
 
     def saveToolTable(self):
@@ -204,6 +242,7 @@ class ToolModel(QStandardItemModel):
         self.beginRemoveRows(QModelIndex(), 0, 100)
         # delete all but the spindle, which can't be deleted
         self._tool_table = {0: self._tool_table[0]}
+        self._rebuildIndex()
         self.endRemoveRows()
         return True
 